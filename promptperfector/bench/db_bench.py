@@ -0,0 +1,88 @@
+"""
+Micro-benchmark for the SQLite layer: autosave throughput and version load
+latency with the persistent WAL connection versus a fresh connection per call
+(the way db.py worked before).
+
+Run: python -m promptperfector.bench.db_bench [--saves N] [--nodes N]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from promptperfector.logic import db
+
+
+def make_flowchart(node_count, rng):
+    nodes = []
+    for i in range(node_count):
+        nodes.append({
+            'id': f'node_{i}',
+            'subject': f'Step {i}',
+            'text': ' '.join(rng.choice(('summarize', 'the', 'input', 'and', 'extract', 'entities')) for _ in range(20)),
+            'connectsTo': [f'node_{i + 1}'] if i + 1 < node_count else None,
+            'connectsFrom': [f'node_{i - 1}'] if i > 0 else None,
+            'pos': [float(i * 150), 0.0],
+        })
+    return {'nodes': nodes}
+
+
+def edit(flowchart, rng):
+    # Simulates a drag: one node gets a new position
+    nodes = [dict(n) for n in flowchart['nodes']]
+    n = rng.randrange(len(nodes))
+    nodes[n]['pos'] = [rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)]
+    return {'nodes': nodes}
+
+
+def run(label, saves, node_count):
+    rng = random.Random(42)
+    db._head_cache.clear()
+    db.init_db()
+    pid = db.create_project('bench')
+    flowchart = make_flowchart(node_count, rng)
+
+    t0 = time.perf_counter()
+    for _ in range(saves):
+        flowchart = edit(flowchart, rng)
+        db.save_flowchart_version(pid, flowchart)
+        db.list_flowchart_versions(pid)
+    save_time = time.perf_counter() - t0
+
+    loads = min(saves, 200)
+    t0 = time.perf_counter()
+    for _ in range(loads):
+        db.get_flowchart_version(pid, rng.randint(1, saves))
+    load_time = time.perf_counter() - t0
+
+    print(f"{label:<12} {saves / save_time:>10.1f} saves/s {1000 * load_time / loads:>10.3f} ms/load")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--saves', type=int, default=500)
+    parser.add_argument('--nodes', type=int, default=50)
+    args = parser.parse_args()
+
+    original_path = db.DB_PATH
+    original_get_connection = db.get_connection
+    tmp = tempfile.mkdtemp()
+    try:
+        # Before: a new connection (and statement cache) for every call
+        db.DB_PATH = os.path.join(tmp, 'per_call.db')
+        db.get_connection = lambda: sqlite3.connect(db.DB_PATH)
+        run('per-call', args.saves, args.nodes)
+
+        db.get_connection = original_get_connection
+        db.DB_PATH = os.path.join(tmp, 'persistent.db')
+        run('persistent', args.saves, args.nodes)
+        db.close_connection()
+    finally:
+        db.DB_PATH = original_path
+        db.get_connection = original_get_connection
+
+
+if __name__ == '__main__':
+    main()
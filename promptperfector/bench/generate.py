@@ -0,0 +1,76 @@
+"""
+Synthetic flowcharts in the canvas JSON schema, for benchmarks.
+
+Nodes are laid out on a grid and linked mostly to nearby nodes (the way
+flowcharts drawn by hand look). `density` is the average number of outgoing
+edges per node; a 'dag' has every edge pointing forward, a 'cyclic' chart
+turns `back_edge_ratio` of them around.
+
+Run: python -m promptperfector.bench.generate --nodes N [--density D] [--shape dag|cyclic] [-o FILE]
+"""
+import argparse
+import json
+import random
+import sys
+
+SHAPES = ('dag', 'cyclic')
+WORDS = ('summarize', 'the', 'input', 'and', 'extract', 'entities', 'then', 'rank', 'each',
+         'result', 'by', 'relevance', 'rewrite', 'answer', 'in', 'a', 'formal', 'tone')
+# Edges connect nodes at most this many positions apart
+LINK_WINDOW = 50
+GRID_SPACING = (180.0, 120.0)
+
+
+def generate_flowchart(node_count, density=1.5, text_words=12, shape='dag', back_edge_ratio=0.05, seed=0):
+    """Return {'nodes': [...]} with `node_count` nodes and about `density * node_count` edges."""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {SHAPES}")
+    rng = random.Random(seed)
+    ids = [f'node_{i + 1}' for i in range(node_count)]
+    links_to = [[] for _ in range(node_count)]
+    links_from = [[] for _ in range(node_count)]
+    seen = set()
+    if node_count > 1:
+        for _ in range(int(density * node_count)):
+            target = rng.randrange(1, node_count)
+            source = rng.randrange(max(0, target - LINK_WINDOW), target)
+            if shape == 'cyclic' and rng.random() < back_edge_ratio:
+                source, target = target, source
+            if (source, target) in seen:
+                continue
+            seen.add((source, target))
+            links_to[source].append(ids[target])
+            links_from[target].append(ids[source])
+    columns = max(1, int(node_count ** 0.5))
+    nodes = []
+    for i, node_id in enumerate(ids):
+        nodes.append({
+            'id': node_id,
+            'subject': f'Step {i + 1}',
+            'text': ' '.join(rng.choice(WORDS) for _ in range(text_words)),
+            'connectsTo': links_to[i] or None,
+            'connectsFrom': links_from[i] or None,
+            'pos': [(i % columns) * GRID_SPACING[0], (i // columns) * GRID_SPACING[1]],
+        })
+    return {'nodes': nodes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=1000)
+    parser.add_argument('--density', type=float, default=1.5)
+    parser.add_argument('--text-words', type=int, default=12)
+    parser.add_argument('--shape', choices=SHAPES, default='dag')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='write to this file instead of stdout')
+    args = parser.parse_args()
+    flowchart = generate_flowchart(args.nodes, args.density, args.text_words, args.shape, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(flowchart, f)
+    else:
+        json.dump(flowchart, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
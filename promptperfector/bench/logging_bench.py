@@ -0,0 +1,122 @@
+"""
+Cost of logging on the UI hot paths: node hover, press and drag events with
+debug logging on (written by the background writer), off, and through the
+old logger that opened debug.log and formatted a timestamp on every call.
+
+Plain log_debug calls are always measured; the event cases need PySide6
+(offscreen platform) and are skipped without it.
+
+Run: python -m promptperfector.bench.logging_bench [--calls N] [--events N] [--nodes N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic import logger
+
+MODES = ('legacy', 'debug', 'off')
+
+
+def legacy_log_debug(msg, *args):
+    # The logger before: eager formatting, one open/append/close per call
+    if args:
+        msg = msg % args
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with open(logger.LOG_FILE, 'a', encoding='utf-8') as f:
+        f.write(f"[{timestamp}] [DEBUG] {msg}\n")
+
+
+def timed(fn, count):
+    # Microseconds per call, including writing out what was logged
+    t0 = time.perf_counter()
+    fn()
+    logger.flush()
+    return 1e6 * (time.perf_counter() - t0) / count
+
+
+def call_case(calls, mode):
+    log_debug = legacy_log_debug if mode == 'legacy' else logger.log_debug
+
+    def calls_fn():
+        for i in range(calls):
+            log_debug("[Node %s] hoverEnterEvent", i)
+    return timed(calls_fn, calls)
+
+
+def event_cases(node_count, events, mode):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication, QGraphicsSceneHoverEvent, QGraphicsSceneMouseEvent
+    from PySide6.QtCore import QEvent, QPointF, Qt
+    from promptperfector.ui import flowchart_canvas
+    app = QApplication.instance() or QApplication([])
+    canvas = flowchart_canvas.FlowchartCanvas()
+    canvas.import_from_model(generate_flowchart(node_count), progressive=False)
+    nodes = list(canvas.nodes.values())
+    enter = QGraphicsSceneHoverEvent(QEvent.GraphicsSceneHoverEnter)
+    leave = QGraphicsSceneHoverEvent(QEvent.GraphicsSceneHoverLeave)
+    press = QGraphicsSceneMouseEvent(QEvent.GraphicsSceneMousePress)
+    press.setButton(Qt.LeftButton)
+
+    def hover():
+        for i in range(events):
+            node = nodes[i % len(nodes)]
+            node.hoverEnterEvent(enter)
+            node.hoverLeaveEvent(leave)
+
+    def drag():
+        node = nodes[len(nodes) // 2]
+        start = node.pos()
+        for i in range(events):
+            node.mousePressEvent(press)
+            node.setPos(start + QPointF(i % 50, i % 30))
+            canvas.update_connector_geometry()
+
+    original = flowchart_canvas.log_debug
+    if mode == 'legacy':
+        flowchart_canvas.log_debug = legacy_log_debug
+    try:
+        # A hover is an enter and a leave event
+        results = {'hover': timed(hover, 2 * events), 'press+drag': timed(drag, events)}
+    finally:
+        flowchart_canvas.log_debug = original
+    canvas.deleteLater()
+    app.processEvents()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--nodes', type=int, default=1000)
+    args = parser.parse_args()
+
+    original_file = logger.LOG_FILE
+    original_level = logger.get_level()
+    tmp = tempfile.mkdtemp()
+    logger.set_log_file(os.path.join(tmp, 'bench.log'))
+    try:
+        rows = []
+        for mode in MODES:
+            logger.set_level(logger.OFF if mode == 'off' else logger.DEBUG)
+            rows.append((mode, 'log_debug', call_case(args.calls, mode)))
+        try:
+            for mode in MODES:
+                logger.set_level(logger.OFF if mode == 'off' else logger.DEBUG)
+                for case, us in event_cases(args.nodes, args.events, mode).items():
+                    rows.append((mode, case, us))
+        except ImportError as e:
+            print(f"Event cases skipped: {e}", file=sys.stderr)
+    finally:
+        logger.set_log_file(original_file)
+        logger.set_level(original_level)
+    for mode, case, us in rows:
+        print(f"{mode:<8} {case:<12} {us:>10.3f} us/event")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Throughput benchmark for the binary snapshot codec against the JSON path:
+encode, decode and FlowchartModel construction, raw and zlib-compressed (as
+stored in the database).
+
+Run: python -m promptperfector.bench.snapshot_bench [--nodes N] [--repeat N]
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+
+from promptperfector.bench.db_bench import make_flowchart
+from promptperfector.logic.flowchart import FlowchartModel
+from promptperfector.logic.snapshot_codec import encode_snapshot, decode_snapshot, decode_model
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def short_flowchart(node_count, rng):
+    # Canvas-like nodes: default text and scattered positions
+    flowchart = make_flowchart(node_count, rng)
+    for node in flowchart['nodes']:
+        node['subject'] = ''
+        node['text'] = 'Editable text box'
+        node['pos'] = [rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)]
+    return flowchart
+
+
+def run(label, flowchart, repeat):
+    text = json.dumps(flowchart).encode('utf-8')
+    binary = encode_snapshot(flowchart)
+    text_z = zlib.compress(text, 6)
+    binary_z = zlib.compress(binary, 6)
+    mb = len(text) / 1e6
+    rows = [
+        ('encode', lambda: json.dumps(flowchart).encode('utf-8'), lambda: encode_snapshot(flowchart)),
+        ('decode', lambda: json.loads(text), lambda: decode_snapshot(binary)),
+        ('model', lambda: FlowchartModel.from_json(json.loads(text)), lambda: decode_model(binary)),
+        ('encode+zlib', lambda: zlib.compress(json.dumps(flowchart).encode('utf-8'), 6),
+         lambda: zlib.compress(encode_snapshot(flowchart), 6)),
+        ('decode+zlib', lambda: json.loads(zlib.decompress(text_z)), lambda: decode_snapshot(zlib.decompress(binary_z))),
+    ]
+    print(f"{label}: {len(flowchart['nodes'])} nodes, json {len(text)} B ({len(text_z)} B zlib), "
+          f"binary {len(binary)} B ({len(binary_z)} B zlib)")
+    for name, json_fn, binary_fn in rows:
+        json_time = best_of(repeat, json_fn)
+        binary_time = best_of(repeat, binary_fn)
+        print(f"  {name:<12} json {mb / json_time:>8.1f} MB/s  binary {mb / binary_time:>8.1f} MB/s  "
+              f"({json_time / binary_time:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    run('wordy', make_flowchart(args.nodes, rng), args.repeat)
+    run('short', short_flowchart(args.nodes, rng), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Scaling benchmark suite: times the hot paths on synthetic flowcharts of
+increasing size and writes the results as JSON, so runs can be compared.
+
+Covers FlowchartModel.from_json/to_json, the auto layouts, save_flowchart_version,
+list_flowchart_versions and get_flowchart_version against a scratch
+database, and (with PySide6, on the offscreen platform) the canvas
+import/export, a repaint of the fitted chart and the version switch in
+FlowchartWidget.on_version_changed.
+With --baseline, cases slower than the baseline by more than --threshold are
+reported and the exit status is 1.
+
+Run: python -m promptperfector.bench.suite [--sizes 100,1000,10000,50000] [-o results.json] [--baseline old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from promptperfector.bench.generate import generate_flowchart, SHAPES
+from promptperfector.logic.autosave import AutosaveQueue
+from promptperfector.logic import db
+from promptperfector.logic.flowchart import FlowchartModel
+from promptperfector.logic.layout import layered_layout, force_layout
+
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+# Versions saved per size before listing/loading them
+DEFAULT_SAVES = 20
+# Force layouts are all-pairs; larger charts are left out
+FORCE_LAYOUT_MAX_NODES = 5000
+
+
+def measure(repeat, fn, setup=None):
+    """Run `fn` `repeat` times (calling `setup` untimed before each) and return the timings in seconds."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return runs
+
+
+def moved(flowchart, rng):
+    # The common autosave: one node dragged somewhere else
+    nodes = list(flowchart['nodes'])
+    i = rng.randrange(len(nodes))
+    nodes[i] = dict(nodes[i], pos=[rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)])
+    return {'nodes': nodes}
+
+
+def model_cases(flowchart, repeat):
+    model = FlowchartModel.from_json(flowchart)
+    return [
+        ('model.from_json', measure(repeat, lambda: FlowchartModel.from_json(flowchart))),
+        ('model.to_json', measure(repeat, model.to_json)),
+    ]
+
+
+def layout_cases(flowchart, repeat):
+    nodes = [n['id'] for n in flowchart['nodes']]
+    edges = [(n['id'], to_id) for n in flowchart['nodes'] for to_id in n.get('connectsTo') or []]
+    cases = [('layout.layered', measure(repeat, lambda: layered_layout(nodes, edges)))]
+    if len(nodes) <= FORCE_LAYOUT_MAX_NODES:
+        cases.append(('layout.force', measure(1, lambda: force_layout(nodes, edges))))
+    return cases
+
+
+def db_cases(flowchart, repeat, saves, rng):
+    pid = db.create_project(f"bench {len(flowchart['nodes'])}")
+    versions = [flowchart]
+    for _ in range(saves - 1):
+        versions.append(moved(versions[-1], rng))
+    pending = iter(versions)
+    cases = [
+        ('db.save_flowchart_version', measure(saves, lambda: db.save_flowchart_version(pid, next(pending)))),
+        ('db.list_flowchart_versions', measure(repeat, lambda: db.list_flowchart_versions(pid, limit=10))),
+        # Loads go through the decode path, not the head cache
+        ('db.get_flowchart_version', measure(repeat, lambda: db.get_flowchart_version(pid, rng.randint(1, saves)),
+                                             setup=db._head_cache.clear)),
+    ]
+    return pid, cases
+
+
+class QtCases:
+    """Canvas and widget cases; needs PySide6 and is skipped without it."""
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide6.QtWidgets import QApplication
+        self.app = QApplication.instance() or QApplication([])
+
+    def canvas(self, flowchart, repeat):
+        from promptperfector.ui.flowchart_canvas import FlowchartCanvas
+        canvas = FlowchartCanvas()
+        yield 'canvas.import_from_model', measure(repeat, lambda: canvas.import_from_model(flowchart, progressive=False))
+        # Time until a progressive import hands control back to the event loop
+        yield 'canvas.import_first_batch', measure(repeat, lambda: canvas.import_from_model(flowchart),
+                                                   setup=canvas.finish_load)
+        canvas.finish_load()
+        yield 'canvas.export_to_model', measure(repeat, canvas.export_to_model)
+        # One full repaint of the whole chart fitted into a typical window
+        canvas.resize(1280, 800)
+        canvas.fit_to_view()
+        yield 'canvas.paint_fit_view', measure(repeat, canvas.viewport().grab)
+        canvas.deleteLater()
+
+    def widget(self, pid, repeat):
+        from promptperfector.ui.flowchart_widget import FlowchartWidget
+        autosaver = AutosaveQueue()
+        widget = FlowchartWidget(FlowchartModel(), pid, autosaver)
+        dropdown = widget.version_dropdown
+        indexes = [i for i in range(dropdown.count()) if isinstance(dropdown.itemData(i), int)]
+        rng = random.Random(0)
+        # Cold switches: the version has to be read and decoded
+        yield 'widget.on_version_changed', measure(repeat, lambda: widget.on_version_changed(rng.choice(indexes)),
+                                                   setup=widget.version_cache.clear)
+        autosaver.close()
+        widget.deleteLater()
+        self.app.processEvents()
+
+
+def run_size(size, args, qt):
+    rng = random.Random(args.seed)
+    flowchart = generate_flowchart(size, args.density, args.text_words, args.shape, seed=args.seed)
+    cases = model_cases(flowchart, args.repeat)
+    cases.extend(layout_cases(flowchart, args.repeat))
+    pid, saved = db_cases(flowchart, args.repeat, args.saves, rng)
+    cases.extend(saved)
+    if qt is not None:
+        cases.extend(qt.canvas(flowchart, args.repeat))
+        cases.extend(qt.widget(pid, args.repeat))
+    results = []
+    for name, runs in cases:
+        results.append({'case': name, 'nodes': size, 'best': min(runs), 'mean': sum(runs) / len(runs), 'runs': runs})
+        print(f"{size:>7} {name:<28} best {1000 * min(runs):>10.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the (case, nodes, ratio) entries that got slower than `threshold` times the baseline."""
+    previous = {(r['case'], r['nodes']): r['best'] for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        before = previous.get((r['case'], r['nodes']))
+        if before:
+            ratio = r['best'] / before
+            print(f"{r['nodes']:>7} {r['case']:<28} {ratio:>6.2f}x baseline", file=sys.stderr)
+            if ratio > threshold:
+                regressions.append((r['case'], r['nodes'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated node counts')
+    parser.add_argument('--density', type=float, default=1.5, help='average outgoing edges per node')
+    parser.add_argument('--text-words', type=int, default=12)
+    parser.add_argument('--shape', choices=SHAPES, default='dag')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--saves', type=int, default=DEFAULT_SAVES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-ui', action='store_true', help='skip the Qt canvas/widget cases')
+    parser.add_argument('-o', '--output', help='write JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio counted as a regression')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    qt = None
+    skipped = None
+    if not args.no_ui:
+        try:
+            qt = QtCases()
+        except ImportError as e:
+            skipped = f"Qt cases skipped: {e}"
+            print(skipped, file=sys.stderr)
+
+    original_path = db.DB_PATH
+    tmp = tempfile.mkdtemp()
+    results = []
+    try:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        db._head_cache.clear()
+        db.init_db()
+        for size in sizes:
+            results.extend(run_size(size, args, qt))
+    finally:
+        db.close_connection()
+        db.DB_PATH = original_path
+        db._head_cache.clear()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {k: getattr(args, k) for k in ('density', 'text_words', 'shape', 'repeat', 'saves', 'seed')},
+            'sizes': sizes,
+            'skipped': skipped,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for case, nodes, ratio in regressions:
+            print(f"Regression: {case} at {nodes} nodes is {ratio:.2f}x slower", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,84 @@
+import argparse
+
+from . import db, archive
 from .db import init_db
 
-def main():
+def compress(args):
+    init_db()
+    size_before = db.database_size()
+    before, after = db.recompress_blobs(args.codec)
+    size_after = db.database_size()
+    print(f"Flowchart data: {before} -> {after} bytes")
+    print(f"Database file: {size_before} -> {size_after} bytes ({size_before - size_after} bytes saved)")
+
+def compact(args):
     init_db()
-    print("Database initialized.")
+    size_before = db.database_size()
+    project_ids = [args.project] if args.project else [pid for pid, _ in db.list_projects()]
+    versions = blobs = 0
+    for project_id in project_ids:
+        removed_versions, removed_blobs = db.compact_project(project_id)
+        versions += removed_versions
+        blobs += removed_blobs
+    db.vacuum()
+    size_after = db.database_size()
+    print(f"Removed {versions} versions and {blobs} blobs from {len(project_ids)} project(s)")
+    print(f"Database file: {size_before} -> {size_after} bytes ({size_before - size_after} bytes saved)")
+
+def retention(args):
+    init_db()
+    if args.keep_hours is None and args.granularity is None:
+        keep_hours, granularity = db.get_retention_policy(args.project)
+    else:
+        current_hours, current_granularity = db.get_retention_policy(args.project)
+        keep_hours = current_hours if args.keep_hours is None else args.keep_hours
+        granularity = current_granularity if args.granularity is None else args.granularity
+        if granularity == 'none':
+            granularity = None
+        db.set_retention_policy(args.project, keep_hours, granularity)
+    print(f"Project {args.project}: keep all versions from the last {keep_hours} hours, then one per {granularity or 'none (keep everything)'}")
+
+def export(args):
+    init_db()
+    projects, versions = archive.export_projects(args.file, args.project or None)
+    if args.file != '-':
+        print(f"Exported {projects} project(s), {versions} version(s) to {args.file}")
+
+def import_(args):
+    init_db()
+    projects, versions = archive.import_projects(args.file)
+    print(f"Imported {projects} project(s), {versions} version(s) from {args.file}")
+
+def main():
+    parser = argparse.ArgumentParser(prog='promptperfector-initdb', description='Initialize and maintain the Prompt Perfector database.')
+    subparsers = parser.add_subparsers(dest='command')
+    compress_parser = subparsers.add_parser('compress', help='Rewrite stored flowcharts with a compression codec and report the space saved')
+    compress_parser.add_argument('--codec', choices=['json', *db.CODECS], default=None,
+                                 help=f"'json' stores blobs uncompressed (default: {db.COMPRESSION})")
+    compress_parser.set_defaults(func=compress)
+    compact_parser = subparsers.add_parser('compact', help='Thin old version history according to the retention policies, then VACUUM')
+    compact_parser.add_argument('--project', help='Only compact this project id')
+    compact_parser.set_defaults(func=compact)
+    retention_parser = subparsers.add_parser('retention', help="Show or set a project's retention policy")
+    retention_parser.add_argument('project', help='Project id')
+    retention_parser.add_argument('--keep-hours', type=float, help='Keep every version younger than this')
+    retention_parser.add_argument('--granularity', choices=[*db.GRANULARITY_FORMATS, 'none'],
+                                  help="Keep one version per minute/hour/day beyond that ('none' keeps everything)")
+    retention_parser.set_defaults(func=retention)
+    export_parser = subparsers.add_parser('export', help='Export projects with their full version history to an NDJSON archive')
+    export_parser.add_argument('file', help="Archive path ('.gz' to compress, '-' for stdout)")
+    export_parser.add_argument('--project', action='append', help='Project id to export (repeatable, default: all)')
+    export_parser.set_defaults(func=export)
+    import_parser = subparsers.add_parser('import', help='Import projects from an NDJSON archive')
+    import_parser.add_argument('file', help="Archive path ('.gz' if compressed, '-' for stdin)")
+    import_parser.set_defaults(func=import_)
+    args = parser.parse_args()
+
+    if args.command is None:
+        init_db()
+        print("Database initialized.")
+        return
+    args.func(args)
 
 if __name__ == "__main__":
     main()
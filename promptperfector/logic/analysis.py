@@ -0,0 +1,341 @@
+"""
+Incremental structure analysis for a FlowchartModel.
+
+GraphAnalysis subscribes to the model and keeps a topological order up to date
+with the Pearce-Kelly algorithm: adding an edge that already agrees with the
+order is O(1), otherwise only the nodes between its endpoints in the order are
+searched and reshuffled. An edge that would close a cycle is left out of the
+order and remembered as a cycle edge, so the graph has a cycle exactly when
+there are cycle edges. A cycle edge a -> b stays out because b reaches a over
+ordered edges; removing an ordered edge u -> v can only change that when
+b reaches u and v reaches a, so only those cycle edges are offered again. Finding
+them is one ordinal comparison per cycle edge plus two searches confined to the
+ordinal window between the removed edge and the candidates.
+
+Roots and leaves are tracked from degree changes. Strongly connected
+components, the edges on cycles and nodes unreachable from any root are
+computed lazily, only around the cycle edges, and cached until the next change.
+"""
+
+from collections import deque
+
+from promptperfector.logic.flowchart import FlowchartModel
+
+
+class GraphAnalysis:
+    def __init__(self, model):
+        self.model = model
+        self._ord = {}
+        self._next_ord = 0
+        self._cycle_edges = {}
+        self._roots = {}
+        self._leaves = {}
+        self._invalidate()
+        self._build()
+        model.subscribe(self)
+
+    def close(self):
+        self.model.unsubscribe(self)
+
+    def _invalidate(self):
+        self._order = None
+        self._components = None
+        self._cyclic_edges = None
+        self._unreachable = None
+
+    def _build(self):
+        # Reverse DFS postorder is a topological order once the back edges
+        # (each of which closes a cycle along the DFS tree) are set aside
+        model = self.model
+        postorder = []
+        state = {}
+        for root in model._nodes:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(model.successors(root)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    seen = state.get(child)
+                    if seen is None:
+                        state[child] = 1
+                        stack.append((child, iter(model.successors(child))))
+                        break
+                    if seen == 1:
+                        self._cycle_edges[(node, child)] = None
+                else:
+                    stack.pop()
+                    state[node] = 2
+                    postorder.append(node)
+        for i, node in enumerate(reversed(postorder)):
+            self._ord[node] = i
+        self._next_ord = len(postorder)
+        for node in model._nodes:
+            if not model.in_degree(node):
+                self._roots[node] = None
+            if not model.out_degree(node):
+                self._leaves[node] = None
+
+    # --- Model listener ---
+    def node_added(self, node_id):
+        self._ord[node_id] = self._next_ord
+        self._next_ord += 1
+        self._roots[node_id] = None
+        self._leaves[node_id] = None
+        self._invalidate()
+
+    def node_removed(self, node_id):
+        # Its edges have already been reported as removed
+        self._ord.pop(node_id, None)
+        self._roots.pop(node_id, None)
+        self._leaves.pop(node_id, None)
+        self._invalidate()
+
+    def edge_added(self, from_id, to_id):
+        self._roots.pop(to_id, None)
+        self._leaves.pop(from_id, None)
+        if not self._insert_edge(from_id, to_id):
+            self._cycle_edges[(from_id, to_id)] = None
+        self._invalidate()
+
+    def edge_removed(self, from_id, to_id):
+        if not self.model.in_degree(to_id):
+            self._roots[to_id] = None
+        if not self.model.out_degree(from_id):
+            self._leaves[from_id] = None
+        if (from_id, to_id) in self._cycle_edges:
+            del self._cycle_edges[(from_id, to_id)]
+        elif self._cycle_edges:
+            # Removing an edge never breaks the order, but it may open up a cycle edge
+            for edge in self._reopened_candidates(from_id, to_id):
+                if self._insert_edge(*edge):
+                    del self._cycle_edges[edge]
+        self._invalidate()
+
+    def _reopened_candidates(self, from_id, to_id):
+        # Cycle edges a -> b whose ordered path b ~> a may have run through the
+        # removed from_id -> to_id: that needs b ~> from_id and to_id ~> a, and
+        # with it ord[b] <= ord[from_id] < ord[to_id] <= ord[a]
+        ordinal = self._ord
+        low, high = ordinal[from_id], ordinal[to_id]
+        candidates = [(a, b) for a, b in self._cycle_edges
+                      if ordinal[b] <= low and ordinal[a] >= high]
+        if not candidates:
+            return []
+        forward = set(self._search(to_id, max(ordinal[a] for a, _ in candidates), True))
+        backward = set(self._search(from_id, min(ordinal[b] for _, b in candidates), False))
+        return [(a, b) for a, b in candidates if a in forward and b in backward]
+
+    # --- Pearce-Kelly ---
+    def _insert_edge(self, from_id, to_id):
+        """Fit from_id -> to_id into the order; False if it would close a cycle."""
+        if from_id == to_id:
+            return False
+        lower, upper = self._ord[to_id], self._ord[from_id]
+        if lower > upper:
+            return True
+        forward = self._search(to_id, upper, True, from_id)
+        if forward is None:
+            return False
+        backward = self._search(from_id, lower, False)
+        ordinals = sorted(self._ord[n] for n in backward + forward)
+        moved = sorted(backward, key=self._ord.get) + sorted(forward, key=self._ord.get)
+        for node, ordinal in zip(moved, ordinals):
+            self._ord[node] = ordinal
+        return True
+
+    def _search(self, start, bound, forward, target=None):
+        # Nodes reachable from start over ordered edges whose ordinal stays within
+        # bound (at most it going forward, at least it going backward); None if
+        # target is reached
+        ordinal = self._ord
+        neighbours = self.model.successors if forward else self.model.predecessors
+        cycle_edges = self._cycle_edges
+        visited = {start: None}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for other in neighbours(node):
+                if other in visited:
+                    continue
+                if (node, other) in cycle_edges if forward else (other, node) in cycle_edges:
+                    continue
+                if forward:
+                    if other == target:
+                        return None
+                    if ordinal[other] > bound:
+                        continue
+                elif ordinal[other] < bound:
+                    continue
+                visited[other] = None
+                stack.append(other)
+        return list(visited)
+
+    # --- Queries ---
+    def topological_order(self):
+        """Node ids in execution order. Edges that close a cycle are ignored."""
+        if self._order is None:
+            self._order = sorted(self._ord, key=self._ord.get)
+        return list(self._order)
+
+    def position(self, node_id):
+        return self._ord[node_id]
+
+    def has_cycles(self):
+        return bool(self._cycle_edges)
+
+    def cycle_edges(self):
+        """Edges left out of the topological order; every cycle contains at least one."""
+        return list(self._cycle_edges)
+
+    def roots(self):
+        return sorted(self._roots, key=self._ord.get)
+
+    def leaves(self):
+        return sorted(self._leaves, key=self._ord.get)
+
+    def strongly_connected_components(self):
+        """Components that contain a cycle, as lists of node ids (singletons only with a self-loop)."""
+        if self._components is None:
+            self._components = self._find_components()
+        return [list(c) for c in self._components]
+
+    def component_of(self, node_id):
+        for component in self.strongly_connected_components():
+            if node_id in component:
+                return component
+        return [node_id]
+
+    def cyclic_edges(self):
+        """Set of (from_id, to_id) edges that lie on some cycle."""
+        if self._cyclic_edges is None:
+            edges = set()
+            for component in self.strongly_connected_components():
+                members = set(component)
+                for node in component:
+                    for other in self.model.successors(node):
+                        if other in members:
+                            edges.add((node, other))
+            self._cyclic_edges = edges
+        return set(self._cyclic_edges)
+
+    def unreachable(self):
+        """Nodes that can't be reached from any root (they only hang off cycles)."""
+        if self._unreachable is None:
+            if not self._cycle_edges:
+                # Every node of a DAG descends from a root
+                self._unreachable = []
+            else:
+                reached = self._walk(self._roots, self.model.successors)
+                self._unreachable = [n for n in self.topological_order() if n not in reached]
+        return list(self._unreachable)
+
+    def reaches(self, from_id, to_id):
+        if from_id == to_id:
+            return True
+        ordinal = self._ord
+        bound = ordinal[to_id]
+        acyclic = not self._cycle_edges
+        # In a DAG nothing later in the order leads back to an earlier node
+        if acyclic and ordinal[from_id] > bound:
+            return False
+        visited = {from_id}
+        stack = [from_id]
+        while stack:
+            for other in self.model.successors(stack.pop()):
+                if other == to_id:
+                    return True
+                if other in visited or (acyclic and ordinal[other] > bound):
+                    continue
+                visited.add(other)
+                stack.append(other)
+        return False
+
+    def descendants(self, node_id):
+        reached = self._walk([node_id], self.model.successors)
+        reached.discard(node_id)
+        return reached
+
+    def ancestors(self, node_id):
+        reached = self._walk([node_id], self.model.predecessors)
+        reached.discard(node_id)
+        return reached
+
+    def _walk(self, starts, neighbours):
+        reached = set(starts)
+        queue = deque(reached)
+        while queue:
+            for other in neighbours(queue.popleft()):
+                if other not in reached:
+                    reached.add(other)
+                    queue.append(other)
+        return reached
+
+    def _find_components(self):
+        if not self._cycle_edges:
+            return []
+        # Every cycle passes through a cycle edge, so it lies within what the
+        # cycle edges' heads reach and their tails are reached from
+        region = self._walk({to_id for _, to_id in self._cycle_edges}, self.model.successors)
+        region &= self._walk({from_id for from_id, _ in self._cycle_edges}, self.model.predecessors)
+        components = []
+        index = {}
+        low = {}
+        on_stack = set()
+        component_stack = []
+        counter = 0
+        for root in sorted(region, key=self._ord.get):
+            if root in index:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            component_stack.append(root)
+            on_stack.add(root)
+            stack = [(root, iter(self.model.successors(root)))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in region:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        component_stack.append(child)
+                        on_stack.add(child)
+                        stack.append((child, iter(self.model.successors(child))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = component_stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or self.model.has_edge(node, node):
+                            component.sort(key=self._ord.get)
+                            components.append(component)
+        return components
+
+
+def execution_order(flowchart_json):
+    """Return the snapshot with its nodes sorted into execution order.
+
+    Only the first node with a given id is kept.
+    """
+    nodes = flowchart_json.get('nodes') or []
+    analysis = GraphAnalysis(FlowchartModel.from_json(flowchart_json))
+    by_id = {}
+    for n in nodes:
+        by_id.setdefault(n['id'], n)
+    result = dict(flowchart_json)
+    result['nodes'] = [by_id[node_id] for node_id in analysis.topological_order()]
+    return result
@@ -0,0 +1,137 @@
+"""
+Streaming export/import of projects and their full version history.
+
+Archives are NDJSON, one record per line, gzip-compressed when the file name
+ends in .gz:
+
+    {"type": "header", "format": "promptperfector-archive", "version": 1}
+    {"type": "project", "id": "...", "name": "..."}
+    {"type": "version", "project_id": "...", "version": 3, "created_at": "...",
+     "name": null, "source": "autosave", "flowchart": {"nodes": [...]}}
+
+Version records of a project follow its project record, oldest first. Both
+directions work page by page, so memory use doesn't grow with history size.
+"""
+import gzip
+import io
+import json
+import sys
+from contextlib import contextmanager
+
+from promptperfector.logic import db
+from promptperfector.logic.logger import log_info
+
+ARCHIVE_FORMAT = 'promptperfector-archive'
+ARCHIVE_VERSION = 1
+# Versions read from the db per page on export, and saved per transaction on import
+BATCH_SIZE = 1000
+
+
+@contextmanager
+def _std_stream(mode):
+    # Text view of stdout/stdin that leaves the underlying stream open on exit
+    stream = sys.stdout.buffer if mode == 'w' else sys.stdin.buffer
+    wrapper = io.TextIOWrapper(stream, encoding='utf-8', write_through=True)
+    try:
+        yield wrapper
+    finally:
+        if mode == 'w':
+            wrapper.flush()
+        wrapper.detach()
+
+
+def _open(path, mode):
+    if path == '-':
+        return _std_stream(mode)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+def export_projects(path, project_ids=None):
+    """Write the given projects (default: all) to an archive. Returns (projects, versions) written."""
+    projects = [(pid, name) for pid, name in db.list_projects() if project_ids is None or pid in project_ids]
+    version_count = 0
+    with _open(path, 'w') as out:
+        out.write(json.dumps({'type': 'header', 'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION}) + '\n')
+        for pid, name in projects:
+            out.write(json.dumps({'type': 'project', 'id': pid, 'name': name}, ensure_ascii=False) + '\n')
+            after = None
+            while True:
+                page = db.list_flowchart_versions(pid, limit=BATCH_SIZE, after_version=after, oldest_first=True)
+                if not page:
+                    break
+                # Neighbouring versions share delta chains, so load the page in one go
+                snapshots = db.get_flowchart_versions(pid, page[0][0], page[-1][0])
+                encoded_nodes = {}
+                lines = []
+                for version, created_at, version_name, source in page:
+                    record = json.dumps({
+                        'type': 'version', 'project_id': pid, 'version': version, 'created_at': created_at,
+                        'name': version_name, 'source': source,
+                    }, ensure_ascii=False, separators=(',', ':'))
+                    lines.append(record[:-1] + ',"flowchart":' + _encode_flowchart(snapshots[version], encoded_nodes) + '}')
+                out.write('\n'.join(lines) + '\n')
+                version_count += len(page)
+                after = page[-1][0]
+    log_info("Exported %s projects, %s versions to %s", len(projects), version_count, path)
+    return len(projects), version_count
+
+
+def _encode_flowchart(snapshot, encoded_nodes):
+    # Snapshots loaded together share the dicts of unchanged nodes, so each
+    # node object only has to be serialized once per page
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get('nodes'), list):
+        return json.dumps(snapshot, ensure_ascii=False, separators=(',', ':'))
+    parts = []
+    for node in snapshot['nodes']:
+        cached = encoded_nodes.get(id(node))
+        if cached is None or cached[0] is not node:
+            cached = encoded_nodes[id(node)] = (node, json.dumps(node, ensure_ascii=False, separators=(',', ':')))
+        parts.append(cached[1])
+    meta = {k: v for k, v in snapshot.items() if k != 'nodes'}
+    head = json.dumps(meta, ensure_ascii=False, separators=(',', ':'))[:-1]
+    return head + (',' if meta else '') + '"nodes":[' + ','.join(parts) + ']}'
+
+
+def import_projects(path):
+    """Restore projects from an archive. Projects whose id already exists get a
+    new id. Returns (projects, versions) imported."""
+    existing = {pid for pid, _ in db.list_projects()}
+    id_map = {}
+    batch = []
+    project_count = version_count = 0
+    with _open(path, 'r') as src:
+        for line_no, line in enumerate(src, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.get('type')
+            if kind == 'header':
+                if record.get('format') != ARCHIVE_FORMAT or record.get('version', 0) > ARCHIVE_VERSION:
+                    raise ValueError(f"{path}: not a supported Prompt Perfector archive")
+            elif kind == 'project':
+                pid = record['id']
+                new_pid = db.create_project(record['name'], None if pid in existing else pid)
+                id_map[pid] = new_pid
+                existing.add(new_pid)
+                project_count += 1
+            elif kind == 'version':
+                batch.append((id_map[record['project_id']], record['flowchart'], record.get('source') or 'autosave',
+                              record['version'], record.get('created_at'), record.get('name')))
+                if len(batch) >= BATCH_SIZE:
+                    version_count += _flush(batch)
+            else:
+                raise ValueError(f"{path}:{line_no}: unknown record type {kind!r}")
+    version_count += _flush(batch)
+    log_info("Imported %s projects, %s versions from %s", project_count, version_count, path)
+    return project_count, version_count
+
+
+def _flush(batch):
+    if not batch:
+        return 0
+    db.save_flowchart_versions(batch)
+    count = len(batch)
+    batch.clear()
+    return count
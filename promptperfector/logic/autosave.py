@@ -0,0 +1,72 @@
+import queue
+import threading
+
+from promptperfector.logic import db
+from promptperfector.logic.logger import log_debug, log_error
+
+
+class AutosaveQueue:
+    """
+    Write-behind autosave. Snapshots are handed over with submit() and committed
+    by a background writer thread; everything queued at the time the writer wakes
+    up is saved in a single transaction. flush() blocks until all submitted
+    snapshots are in the database.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='autosave-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, project_id, flowchart_json, on_saved=None, source='autosave'):
+        # on_saved(version) is called from the writer thread once the snapshot is committed
+        self._queue.put((project_id, flowchart_json, source, on_saved))
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            items = [item for item in batch if item is not None]
+            try:
+                if items:
+                    self._save(items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                db.close_connection()
+                return
+
+    def _save(self, items):
+        try:
+            versions = db.save_flowchart_versions([item[:3] for item in items])
+            log_debug("Autosave writer committed %d snapshot(s)", len(items))
+        except Exception as e:
+            # Don't let one bad snapshot take the rest of the batch with it
+            log_error("Autosave batch of %s snapshot(s) failed, retrying one by one: %s", len(items), e)
+            versions = []
+            for project_id, flowchart_json, source, _ in items:
+                try:
+                    versions.append(db.save_flowchart_version(project_id, flowchart_json, source))
+                except Exception as e:
+                    log_error("Autosave failed for project %s: %s", project_id, e)
+                    versions.append(None)
+        for (project_id, _, _, on_saved), version in zip(items, versions):
+            if on_saved is None or version is None:
+                continue
+            try:
+                on_saved(version)
+            except Exception as e:
+                log_error("Autosave callback failed for project %s: %s", project_id, e)
@@ -0,0 +1,48 @@
+import threading
+
+from promptperfector.logic import db
+from promptperfector.logic.logger import log_debug, log_error
+
+
+class BackgroundCompactor:
+    """
+    Periodically applies each project's retention policy in small batches on a
+    background thread, so history never has to be compacted in one long
+    transaction that would stall autosave. Freed pages are reused by SQLite;
+    `promptperfector-initdb compact` additionally runs a VACUUM.
+    """
+    def __init__(self, interval=600.0, batch_size=200, pause=0.05):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='history-compactor', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact_once()
+            except Exception as e:
+                log_error("Background compaction failed: %s", e)
+        db.close_connection()
+
+    def compact_once(self):
+        total = 0
+        for project_id, _ in db.list_projects():
+            while not self._stop.is_set():
+                removed, _ = db.compact_project(project_id, batch_size=self.batch_size)
+                total += removed
+                if removed < self.batch_size:
+                    break
+                # Give the autosave writer a chance between batches
+                self._stop.wait(self.pause)
+        log_debug("Background compaction pass removed %d versions", total)
+        return total
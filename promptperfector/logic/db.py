@@ -1,13 +1,93 @@
 from promptperfector.logic.logger import log_info, log_debug
+from promptperfector.logic.delta import can_diff, make_delta, apply_delta, delta_size, copy_snapshot
+from promptperfector.logic.snapshot_codec import encode_snapshot, decode_snapshot
+import bisect
+import hashlib
+import lzma
 import sqlite3
+import threading
 import uuid
+import zlib
 import json
 from pathlib import Path
+from datetime import datetime, timedelta, timezone
 
 DB_PATH = str(Path(__file__).parent.parent / 'promptperfector.db')
 
+# Snapshots live in flowchart_blobs, keyed by the hash of their canonical JSON;
+# version rows in flowcharts point at a blob, so identical snapshots are stored
+# once. A blob is either a full keyframe or a delta against the blob of the
+# version it followed. Delta chains are at most KEYFRAME_INTERVAL - 1 long,
+# which bounds the replay cost of loading any version.
+KEYFRAME_INTERVAL = 50
+
+# project_id -> (version, blob_hash, snapshot, depth) of the most recently saved
+# or loaded head, so autosave doesn't have to rebuild the previous version
+_head_cache = {}
+
+# project_id -> number of compactions that removed versions from it; caches of
+# decoded versions (logic/version_cache.py) compare it to drop what may be gone
+_compactions = {}
+
+# Codec used for newly written blobs ('zlib', 'lzma', or None for plain JSON).
+# The encoding is recorded per blob, so changing this never affects old rows.
+COMPRESSION = 'zlib'
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+# Keyframes are written as JSON ('json') or with logic/snapshot_codec.py
+# ('binary', recorded as 'snapshot' or 'snapshot+<codec>'); deltas are always
+# JSON. The binary format only pays off for large, label-light charts, and is
+# slower than JSON on short text, so it is opt-in.
+KEYFRAME_FORMAT = 'json'
+SNAPSHOT_ENCODING = 'snapshot'
+
+# Versions younger than keep_hours are always kept; older history is thinned to
+# the newest version per minute, hour or day (granularity None keeps everything).
+# Named and LLM-generated versions, and each project's latest version, are never
+# thinned. Projects without a row in retention_policies use DEFAULT_RETENTION.
+DEFAULT_RETENTION = (24.0, 'minute')
+GRANULARITY_FORMATS = {'minute': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H', 'day': '%Y-%m-%d'}
+
+# One long-lived connection per thread. sqlite3 keeps a per-connection cache of
+# prepared statements, so reusing the connection also reuses the statements.
+_local = threading.local()
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA temp_store=MEMORY',
+)
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=5.0, cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    log_debug("Opened database connection: %s", path)
+    return conn
+
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _open_connection(DB_PATH)
+        _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+def _begin_write(conn):
+    # Take the write lock before the first read, so nothing (e.g. the background
+    # compactor collecting a blob this save dedups against) commits in between
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
 
 def init_db():
     with get_connection() as conn:
@@ -16,49 +96,563 @@ def init_db():
             id TEXT PRIMARY KEY,
             name TEXT NOT NULL
         )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS flowcharts (
-            id TEXT PRIMARY KEY,
-            project_id TEXT NOT NULL,
-            version INTEGER NOT NULL,
-            flowchart_json TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        c.execute('''CREATE TABLE IF NOT EXISTS flowchart_blobs (
+            hash TEXT PRIMARY KEY,
+            storage TEXT NOT NULL,
+            base_hash TEXT,
+            depth INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL,
+            encoding TEXT NOT NULL DEFAULT 'json'
+        )''')
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='flowcharts'").fetchone():
+            _create_flowcharts_table(conn, 'flowcharts')
+        c.execute('''CREATE TABLE IF NOT EXISTS retention_policies (
+            project_id TEXT PRIMARY KEY,
+            keep_hours REAL NOT NULL,
+            granularity TEXT,
             FOREIGN KEY(project_id) REFERENCES projects(id)
         )''')
+        migrate(conn)
+        _create_node_index(conn)
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_flowcharts_project_version ON flowcharts (project_id, version)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_flowcharts_blob_hash ON flowcharts (blob_hash)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_flowchart_blobs_base_hash ON flowchart_blobs (base_hash)''')
         conn.commit()
 
-def create_project(name):
-    pid = str(uuid.uuid4())
+def _create_flowcharts_table(conn, name):
+    conn.execute(f'''CREATE TABLE {name} (
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        blob_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        name TEXT,
+        source TEXT NOT NULL DEFAULT 'autosave',
+        FOREIGN KEY(project_id) REFERENCES projects(id),
+        FOREIGN KEY(blob_hash) REFERENCES flowchart_blobs(hash)
+    )''')
+
+def migrate(conn):
+    blob_columns = {row[1] for row in conn.execute('PRAGMA table_info(flowchart_blobs)')}
+    if 'encoding' not in blob_columns:
+        conn.execute("ALTER TABLE flowchart_blobs ADD COLUMN encoding TEXT NOT NULL DEFAULT 'json'")
+        log_info("Migrated flowchart_blobs table: added encoding column")
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(flowcharts)')}
+    if 'blob_hash' not in columns:
+        _migrate_to_blobs(conn, 'storage' in columns)
+    elif 'source' not in columns:
+        conn.execute('ALTER TABLE flowcharts ADD COLUMN name TEXT')
+        conn.execute("ALTER TABLE flowcharts ADD COLUMN source TEXT NOT NULL DEFAULT 'autosave'")
+        log_info("Migrated flowcharts table: added name and source columns")
+
+def _migrate_to_blobs(conn, has_storage):
+    # Older databases keep the snapshot (or, with a storage column, a delta
+    # against the previous version) inline in flowcharts.flowchart_json.
+    # Rebuild each version and move its content into flowchart_blobs.
+    _create_flowcharts_table(conn, 'flowcharts_new')
+    storage_col = 'storage' if has_storage else "'full'"
+    rows = conn.execute(f'''SELECT id, project_id, version, created_at, {storage_col}, flowchart_json
+        FROM flowcharts ORDER BY project_id, version''')
+    heads = {}
+    count = 0
+    for fid, project_id, version, created_at, storage, payload in rows.fetchall():
+        data = json.loads(payload)
+        snapshot = data if storage == 'full' else apply_delta(heads[project_id][0], data)
+        head = heads.get(project_id)
+        blob_hash, depth = _store_blob(conn, snapshot, head)
+        conn.execute('''INSERT INTO flowcharts_new (id, project_id, version, blob_hash, created_at) VALUES (?, ?, ?, ?, ?)''',
+                     (fid, project_id, version, blob_hash, created_at))
+        heads[project_id] = (snapshot, blob_hash, depth)
+        count += 1
+    conn.execute('DROP TABLE flowcharts')
+    conn.execute('ALTER TABLE flowcharts_new RENAME TO flowcharts')
+    log_info("Migrated %s flowchart versions to content-addressed blob storage", count)
+
+def _create_node_index(conn):
+    # node_index has one row per (node, subject/text revision): the row is valid
+    # from version_from to version_to inclusive, version_to is NULL while it is
+    # still current. node_search is an external-content FTS5 index over it,
+    # kept in sync by triggers.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='node_index'").fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS node_index (
+        id INTEGER PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        node_id TEXT NOT NULL,
+        version_from INTEGER NOT NULL,
+        version_to INTEGER,
+        subject TEXT,
+        text TEXT,
+        FOREIGN KEY(project_id) REFERENCES projects(id)
+    )''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_node_index_current ON node_index (project_id, node_id) WHERE version_to IS NULL''')
+    try:
+        conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS node_search USING fts5(
+            subject, text, content='node_index', content_rowid='id', tokenize='porter unicode61')''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS node_index_ai AFTER INSERT ON node_index BEGIN
+            INSERT INTO node_search (rowid, subject, text) VALUES (new.id, new.subject, new.text);
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS node_index_ad AFTER DELETE ON node_index BEGIN
+            INSERT INTO node_search (node_search, rowid, subject, text) VALUES ('delete', old.id, old.subject, old.text);
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS node_index_au AFTER UPDATE OF subject, text ON node_index BEGIN
+            INSERT INTO node_search (node_search, rowid, subject, text) VALUES ('delete', old.id, old.subject, old.text);
+            INSERT INTO node_search (rowid, subject, text) VALUES (new.id, new.subject, new.text);
+        END''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search_nodes falls back to LIKE over node_index
+        log_info("FTS5 unavailable, node search will not be indexed: %s", e)
+    if not exists:
+        _backfill_node_index(conn)
+
+def _backfill_node_index(conn):
+    count = 0
+    for (project_id,) in conn.execute('SELECT DISTINCT project_id FROM flowcharts').fetchall():
+        prev = None
+        for version, blob_hash in conn.execute('''SELECT version, blob_hash FROM flowcharts WHERE project_id=? ORDER BY version''', (project_id,)).fetchall():
+            snapshot, _ = _load_blob(conn, blob_hash)
+            _index_nodes(conn, project_id, version, prev, snapshot)
+            prev = snapshot
+            count += 1
+    if count:
+        log_info("Indexed nodes of %s existing flowchart versions for search", count)
+
+def _node_texts(snapshot):
+    nodes = snapshot.get('nodes', []) if isinstance(snapshot, dict) else []
+    return {n['id']: (n.get('subject') or '', n.get('text') or '') for n in nodes if isinstance(n, dict) and 'id' in n}
+
+def _index_nodes(conn, project_id, version, prev, snapshot):
+    # Close the rows of nodes that were removed or whose subject/text changed
+    # and open new rows for changed or added nodes
+    old = _node_texts(prev) if prev else {}
+    new = _node_texts(snapshot)
+    closed = [nid for nid, texts in old.items() if new.get(nid) != texts]
+    opened = [(nid, texts) for nid, texts in new.items() if old.get(nid) != texts]
+    if closed:
+        conn.executemany('''UPDATE node_index SET version_to=? WHERE project_id=? AND node_id=? AND version_to IS NULL''',
+                         [(version - 1, project_id, nid) for nid in closed])
+    if opened:
+        conn.executemany('''INSERT INTO node_index (project_id, node_id, version_from, subject, text) VALUES (?, ?, ?, ?, ?)''',
+                         [(project_id, nid, version, subject, text) for nid, (subject, text) in opened])
+
+def search_nodes(query, limit=50, project_id=None):
+    """Full-text search over node subjects and text across all projects and versions.
+
+    Returns (project_id, project_name, node_id, subject, snippet, version_from,
+    version_to) rows, best match first; version_to is None if the node still
+    reads that way in the latest version. The last word is matched as a prefix.
+    """
+    words = query.split()
+    if not words:
+        return []
+    with get_connection() as conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name='node_search'").fetchone():
+            match = ' '.join('"' + w.replace('"', '""') + '"' for w in words) + '*'
+            sql = '''SELECT n.project_id, p.name, n.node_id, n.subject,
+                    snippet(node_search, 1, '[', ']', '...', 12), n.version_from, n.version_to
+                FROM node_search JOIN node_index n ON n.id=node_search.rowid
+                JOIN projects p ON p.id=n.project_id
+                WHERE node_search MATCH ?'''
+            params = [match]
+            if project_id:
+                sql += ' AND n.project_id=?'
+                params.append(project_id)
+            sql += ' ORDER BY rank LIMIT ?'
+        else:
+            sql = '''SELECT n.project_id, p.name, n.node_id, n.subject, substr(n.text, 1, 80), n.version_from, n.version_to
+                FROM node_index n JOIN projects p ON p.id=n.project_id WHERE '''
+            sql += ' AND '.join(["(n.subject LIKE ? ESCAPE '\\' OR n.text LIKE ? ESCAPE '\\')"] * len(words))
+            # Words are matched literally, so escape LIKE's own wildcards
+            params = ['%' + w.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%' for w in words for _ in (0, 1)]
+            if project_id:
+                sql += ' AND n.project_id=?'
+                params.append(project_id)
+            sql += ' ORDER BY n.version_from DESC LIMIT ?'
+        params.append(limit)
+        hits = conn.execute(sql, params).fetchall()
+    log_debug("Node search %r: %d hits", query, len(hits))
+    return hits
+
+def create_project(name, project_id=None):
+    pid = project_id or str(uuid.uuid4())
     with get_connection() as conn:
         conn.execute('INSERT INTO projects (id, name) VALUES (?, ?)', (pid, name))
         conn.commit()
-    log_info(f"Created new project: {pid}, name: {name}")
+    log_info("Created new project: %s, name: %s", pid, name)
     return pid
 
 def list_projects():
     with get_connection() as conn:
         return conn.execute('SELECT id, name FROM projects').fetchall()
 
+def encode_payload(payload, codec=None, binary=False):
+    """Serialize a blob payload. Returns (encoding, data); falls back to the
+    uncompressed form when compression doesn't make it smaller. `binary` writes
+    a snapshot with the binary snapshot codec instead of JSON."""
+    codec = COMPRESSION if codec is None else codec
+    if binary:
+        raw = encode_snapshot(payload)
+        if codec and codec != 'json':
+            data = CODECS[codec][0](raw)
+            if len(data) < len(raw):
+                return f'{SNAPSHOT_ENCODING}+{codec}', data
+        return SNAPSHOT_ENCODING, raw
+    text = json.dumps(payload)
+    if codec and codec != 'json':
+        data = CODECS[codec][0](text.encode('utf-8'))
+        if len(data) < len(text):
+            return codec, data
+    return 'json', text
+
+def decode_payload(encoding, data):
+    if encoding == 'json':
+        return json.loads(data)
+    if encoding.startswith(SNAPSHOT_ENCODING):
+        codec = encoding[len(SNAPSHOT_ENCODING) + 1:]
+        return decode_snapshot(CODECS[codec][1](data) if codec else data)
+    return json.loads(CODECS[encoding][1](data).decode('utf-8'))
+
+def content_hash(flowchart_json):
+    canonical = json.dumps(flowchart_json, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _chain_rows(conn, blob_hash):
+    # The blob and its delta chain back to the keyframe, keyframe first, in one query
+    return conn.execute('''WITH RECURSIVE chain(hash, storage, base_hash, depth, encoding, data, n) AS (
+            SELECT hash, storage, base_hash, depth, encoding, data, 0 FROM flowchart_blobs WHERE hash=?
+            UNION ALL
+            SELECT b.hash, b.storage, b.base_hash, b.depth, b.encoding, b.data, chain.n + 1
+            FROM flowchart_blobs b JOIN chain ON b.hash=chain.base_hash
+        )
+        SELECT hash, depth, encoding, data FROM chain ORDER BY n DESC''', (blob_hash,)).fetchall()
+
+def _load_blob(conn, blob_hash):
+    # Returns (snapshot, depth)
+    rows = _chain_rows(conn, blob_hash)
+    if not rows:
+        return None, 0
+    snapshot = decode_payload(rows[0][2], rows[0][3])
+    for _, _, encoding, data in rows[1:]:
+        snapshot = apply_delta(snapshot, decode_payload(encoding, data))
+    return snapshot, len(rows) - 1
+
+def _store_blob(conn, flowchart_json, head=None, blob_hash=None):
+    """Store a snapshot unless a blob with the same content already exists.
+
+    `head` is (snapshot, blob_hash, depth) of the version this one follows; new
+    blobs are written as a delta against it while the chain is short enough.
+    Returns (blob_hash, depth).
+    """
+    blob_hash = blob_hash or content_hash(flowchart_json)
+    row = conn.execute('SELECT depth FROM flowchart_blobs WHERE hash=?', (blob_hash,)).fetchone()
+    if row:
+        return blob_hash, row[0]
+
+    storage, base_hash, depth, encoding, data = _encode_blob(flowchart_json, head)
+    conn.execute('''INSERT INTO flowchart_blobs (hash, storage, base_hash, depth, encoding, data) VALUES (?, ?, ?, ?, ?, ?)''',
+                 (blob_hash, storage, base_hash, depth, encoding, data))
+    return blob_hash, depth
+
+def _encode_blob(flowchart_json, head):
+    # Returns (storage, base_hash, depth, encoding, data) for a new blob
+    storage, payload, base_hash, depth = 'full', flowchart_json, None, 0
+    if head is not None:
+        prev, prev_hash, prev_depth = head
+        if prev_depth + 1 < KEYFRAME_INTERVAL and can_diff(prev, flowchart_json):
+            delta = make_delta(prev, flowchart_json)
+            # A delta touching most of the graph is no cheaper than a keyframe
+            if delta_size(delta) <= len(flowchart_json.get('nodes', [])) // 2:
+                storage, payload, base_hash, depth = 'delta', delta, prev_hash, prev_depth + 1
+    encoding, data = encode_payload(payload, binary=storage == 'full' and KEYFRAME_FORMAT == 'binary' and isinstance(payload, dict))
+    return storage, base_hash, depth, encoding, data
+
+def get_flowchart_version(project_id, version):
+    with get_connection() as conn:
+        row = conn.execute('SELECT blob_hash FROM flowcharts WHERE project_id=? AND version=?', (project_id, version)).fetchone()
+        snapshot, depth = _load_blob(conn, row[0]) if row else (None, 0)
+        log_debug("Loaded flowchart version %s for project: %s, found: %s, deltas replayed: %s",
+                  version, project_id, snapshot is not None, depth)
+        return snapshot
+
+def get_flowchart_versions(project_id, first_version, last_version):
+    """Load every stored version in [first_version, last_version] as {version: snapshot}.
+
+    Neighbouring versions share most of their delta chain, so each blob in the
+    range is decoded once. Returned snapshots share node dicts; treat them as
+    read-only.
+    """
+    decoded = {}
+    result = {}
+    with get_connection() as conn:
+        rows = conn.execute('''SELECT version, blob_hash FROM flowcharts WHERE project_id=? AND version BETWEEN ? AND ?
+            ORDER BY version''', (project_id, first_version, last_version)).fetchall()
+        for version, blob_hash in rows:
+            if blob_hash not in decoded:
+                chain = _chain_rows(conn, blob_hash)
+                # Resume from the newest blob of the chain that was already decoded
+                start = max((i for i, row in enumerate(chain) if row[0] in decoded), default=-1)
+                snapshot = decoded[chain[start][0]] if start >= 0 else None
+                for h, _, encoding, data in chain[start + 1:]:
+                    payload = decode_payload(encoding, data)
+                    snapshot = payload if snapshot is None else apply_delta(snapshot, payload)
+                    decoded[h] = snapshot
+            result[version] = decoded[blob_hash]
+    log_debug("Loaded %d flowchart versions %s-%s for project: %s", len(result), first_version, last_version, project_id)
+    return result
+
 def get_latest_flowchart(project_id):
     with get_connection() as conn:
-        row = conn.execute('''SELECT flowchart_json FROM flowcharts WHERE project_id=? ORDER BY version DESC LIMIT 1''', (project_id,)).fetchone()
-        log_debug(f"Loaded latest flowchart for project: {project_id}, found: {bool(row)}")
-        return json.loads(row[0]) if row else None
+        row = conn.execute('''SELECT version, blob_hash FROM flowcharts WHERE project_id=? ORDER BY version DESC LIMIT 1''', (project_id,)).fetchone()
+        snapshot = None
+        if row:
+            snapshot, depth = _load_blob(conn, row[1])
+            _head_cache[project_id] = (row[0], row[1], copy_snapshot(snapshot), depth)
+        log_debug("Loaded latest flowchart for project: %s, found: %s", project_id, snapshot is not None)
+        return snapshot
+
+def _insert_version(conn, project_id, flowchart_json, source='autosave', version=None, created_at=None, name=None):
+    # version/created_at/name are only passed when restoring history (see logic/archive.py);
+    # an explicit version is always written, even if unchanged from the previous one
+    row = conn.execute('''SELECT version, blob_hash FROM flowcharts WHERE project_id=? ORDER BY version DESC LIMIT 1''', (project_id,)).fetchone()
+    blob_hash = content_hash(flowchart_json)
+    if version is None and row and row[1] == blob_hash:
+        log_debug("Skipped saving unchanged flowchart for project: %s (version %s)", project_id, row[0])
+        return row[0]
+
+    head = None
+    prev = None
+    if row:
+        cached = _head_cache.get(project_id)
+        if cached and cached[0] == row[0]:
+            head = cached[2], cached[1], cached[3]
+            prev = cached[2]
+        else:
+            prev, prev_depth = _load_blob(conn, row[1])
+            head = prev, row[1], prev_depth
+    blob_hash, depth = _store_blob(conn, flowchart_json, head, blob_hash)
+
+    new_version = version if version is not None else (row[0] if row else 0) + 1
+    fid = str(uuid.uuid4())
+    conn.execute('''INSERT INTO flowcharts (id, project_id, version, blob_hash, source, name, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))''',
+                 (fid, project_id, new_version, blob_hash, source, name, created_at))
+    _index_nodes(conn, project_id, new_version, prev, flowchart_json)
+    # Keep a copy as the head, so the caller is free to mutate what it saved
+    _head_cache[project_id] = (new_version, blob_hash, copy_snapshot(flowchart_json), depth)
+    log_info("Saved flowchart version %s for project: %s (blob %s)", new_version, project_id, blob_hash[:12])
+    return new_version
 
-def save_flowchart_version(project_id, flowchart_json):
+def save_flowchart_version(project_id, flowchart_json, source='autosave'):
+    # source is 'autosave' or 'llm'; LLM-generated versions are never thinned by compaction
     with get_connection() as conn:
-        c = conn.cursor()
-        c.execute('SELECT MAX(version) FROM flowcharts WHERE project_id=?', (project_id,))
-        max_version = c.fetchone()[0] or 0
-        new_version = max_version + 1
-        fid = str(uuid.uuid4())
-        c.execute('''INSERT INTO flowcharts (id, project_id, version, flowchart_json) VALUES (?, ?, ?, ?)''',
-                  (fid, project_id, new_version, json.dumps(flowchart_json)))
-        conn.commit()
-        log_info(f"Saved flowchart version {new_version} for project: {project_id}")
-        return new_version
+        try:
+            _begin_write(conn)
+            return _insert_version(conn, project_id, flowchart_json, source)
+        except Exception:
+            _head_cache.pop(project_id, None)
+            raise
 
-def list_flowchart_versions(project_id):
+def save_flowchart_versions(items):
+    """Save a batch of (project_id, flowchart_json[, source[, version, created_at, name]])
+    in one transaction. Returns the new version numbers."""
     with get_connection() as conn:
-        versions = conn.execute('''SELECT version, created_at FROM flowcharts WHERE project_id=? ORDER BY version DESC''', (project_id,)).fetchall()
-        log_debug(f"Listed {len(versions)} versions for project: {project_id}")
+        try:
+            _begin_write(conn)
+            return [_insert_version(conn, *item) for item in items]
+        except Exception:
+            # The transaction is rolled back, so cached heads may point at versions that were never written
+            for item in items:
+                _head_cache.pop(item[0], None)
+            raise
+
+def list_flowchart_versions(project_id, limit=None, before_version=None, after_version=None, oldest_first=False):
+    """List (version, created_at, name, source) newest first (or oldest first).
+
+    Keyset pagination: pass the oldest version of the previous page as
+    `before_version` to get the next (older) page, or the newest version you
+    have as `after_version` to get only newer ones. Each page is a range scan
+    on idx_flowcharts_project_version, so its cost doesn't depend on how much
+    history the project has.
+    """
+    query = 'SELECT version, created_at, name, source FROM flowcharts WHERE project_id=?'
+    params = [project_id]
+    if before_version is not None:
+        query += ' AND version<?'
+        params.append(before_version)
+    if after_version is not None:
+        query += ' AND version>?'
+        params.append(after_version)
+    query += ' ORDER BY version ASC' if oldest_first else ' ORDER BY version DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    with get_connection() as conn:
+        versions = conn.execute(query, params).fetchall()
+        log_debug("Listed %d versions for project: %s", len(versions), project_id)
         return versions
+
+def name_flowchart_version(project_id, version, name):
+    # Named versions are never thinned by compaction; pass None to clear the name
+    with get_connection() as conn:
+        conn.execute('UPDATE flowcharts SET name=? WHERE project_id=? AND version=?', (name or None, project_id, version))
+        conn.commit()
+    log_info("Named flowchart version %s for project: %s: %r", version, project_id, name)
+
+def count_flowchart_versions(project_id):
+    with get_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM flowcharts WHERE project_id=?', (project_id,)).fetchone()[0]
+
+def recompress_blobs(codec=None):
+    """Rewrite every stored blob with `codec` (default COMPRESSION, 'json' for
+    none) and VACUUM. Returns (bytes_before, bytes_after) of blob data."""
+    codec = COMPRESSION if codec is None else codec
+    before = after = rewritten = 0
+    last_hash = ''
+    conn = get_connection()
+    while True:
+        # Walk the table in hash order, one transaction per batch
+        with conn:
+            batch = conn.execute('''SELECT hash, storage, encoding, data FROM flowchart_blobs WHERE hash>? ORDER BY hash LIMIT 500''', (last_hash,)).fetchall()
+            if not batch:
+                break
+            updates = []
+            for blob_hash, storage, encoding, data in batch:
+                payload = decode_payload(encoding, data)
+                binary = storage == 'full' and KEYFRAME_FORMAT == 'binary' and isinstance(payload, dict)
+                new_encoding, new_data = encode_payload(payload, codec, binary)
+                before += _payload_size(data)
+                after += _payload_size(new_data)
+                if new_encoding != encoding or new_data != data:
+                    updates.append((new_encoding, new_data, blob_hash))
+            conn.executemany('UPDATE flowchart_blobs SET encoding=?, data=? WHERE hash=?', updates)
+            rewritten += len(updates)
+            last_hash = batch[-1][0]
+    vacuum()
+    log_info("Recompressed %s blobs with %s: %s -> %s bytes", rewritten, codec, before, after)
+    return before, after
+
+def _payload_size(data):
+    return len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+
+def database_size():
+    # Logical size in bytes, including pages still sitting in the WAL
+    with get_connection() as conn:
+        return conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+
+def vacuum():
+    conn = get_connection()
+    conn.execute('VACUUM')
+    # With WAL the vacuumed pages only reach the main file at a checkpoint
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+def get_retention_policy(project_id):
+    with get_connection() as conn:
+        row = conn.execute('SELECT keep_hours, granularity FROM retention_policies WHERE project_id=?', (project_id,)).fetchone()
+        return tuple(row) if row else DEFAULT_RETENTION
+
+def set_retention_policy(project_id, keep_hours, granularity):
+    if granularity is not None and granularity not in GRANULARITY_FORMATS:
+        raise ValueError(f"Unknown retention granularity: {granularity}")
+    with get_connection() as conn:
+        conn.execute('''INSERT OR REPLACE INTO retention_policies (project_id, keep_hours, granularity) VALUES (?, ?, ?)''',
+                     (project_id, keep_hours, granularity))
+        conn.commit()
+    log_info("Set retention policy for project %s: keep %sh, then one per %s", project_id, keep_hours, granularity)
+
+def compact_project(project_id, now=None, batch_size=None):
+    """Thin old history according to the project's retention policy.
+
+    Deletes at most `batch_size` version rows (all if None) in one transaction
+    and garbage-collects the blobs only they used, and clamps the node search
+    index to the surviving versions. Remaining version numbers are untouched.
+    A naive `now` is taken to be UTC. Returns (versions_removed, blobs_removed).
+    """
+    keep_hours, granularity = get_retention_policy(project_id)
+    if granularity is None:
+        return 0, 0
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc)
+    # created_at is CURRENT_TIMESTAMP, i.e. UTC 'YYYY-MM-DD HH:MM:SS'
+    cutoff = (now - timedelta(hours=keep_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    bucket = GRANULARITY_FORMATS[granularity]
+    query = '''SELECT version, blob_hash FROM flowcharts
+        WHERE project_id=? AND created_at<? AND name IS NULL AND source='autosave'
+        AND version<(SELECT MAX(version) FROM flowcharts WHERE project_id=?)
+        AND version NOT IN (
+            SELECT MAX(version) FROM flowcharts WHERE project_id=? AND created_at<?
+            GROUP BY strftime(?, created_at))
+        ORDER BY version'''
+    params = [project_id, cutoff, project_id, project_id, cutoff, bucket]
+    if batch_size is not None:
+        query += ' LIMIT ?'
+        params.append(batch_size)
+    with get_connection() as conn:
+        _begin_write(conn)
+        rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return 0, 0
+        conn.executemany('DELETE FROM flowcharts WHERE project_id=? AND version=?', [(project_id, v) for v, _ in rows])
+        _clamp_node_index(conn, project_id, [v for v, _ in rows])
+        blobs_removed = _collect_garbage(conn, {blob_hash for _, blob_hash in rows})
+        conn.commit()
+    _compactions[project_id] = _compactions.get(project_id, 0) + 1
+    log_info("Compacted project %s: removed %s versions, %s blobs", project_id, len(rows), blobs_removed)
+    return len(rows), blobs_removed
+
+def compaction_count(project_id):
+    """Number of compactions in this process that removed versions of the project."""
+    return _compactions.get(project_id, 0)
+
+def _clamp_node_index(conn, project_id, removed):
+    # Pull node_index ranges that start or end on a removed version in to the
+    # nearest surviving versions; a range with none left inside it is dropped
+    removed_set = set(removed)
+    versions = [v for (v,) in conn.execute('SELECT version FROM flowcharts WHERE project_id=? ORDER BY version', (project_id,))]
+    rows = conn.execute('''SELECT id, version_from, version_to FROM node_index WHERE project_id=?
+        AND (version_from BETWEEN ? AND ? OR version_to BETWEEN ? AND ?)''',
+        (project_id, removed[0], removed[-1], removed[0], removed[-1])).fetchall()
+    updates, deletes = [], []
+    for row_id, version_from, version_to in rows:
+        if version_from not in removed_set and version_to not in removed_set:
+            continue
+        first = bisect.bisect_left(versions, version_from)
+        last = len(versions) - 1 if version_to is None else bisect.bisect_right(versions, version_to) - 1
+        if first > last:
+            deletes.append((row_id,))
+        else:
+            updates.append((versions[first], None if version_to is None else versions[last], row_id))
+    conn.executemany('UPDATE node_index SET version_from=?, version_to=? WHERE id=?', updates)
+    conn.executemany('DELETE FROM node_index WHERE id=?', deletes)
+
+def _collect_garbage(conn, candidates):
+    # A blob is dead once no version points at it and no live blob is a delta
+    # against it. Live deltas whose base dies are re-encoded first.
+    dead = set()
+    stack = list(candidates)
+    while stack:
+        blob_hash = stack.pop()
+        if blob_hash in dead or conn.execute('SELECT 1 FROM flowcharts WHERE blob_hash=? LIMIT 1', (blob_hash,)).fetchone():
+            continue
+        dead.add(blob_hash)
+        stack.extend(row[0] for row in conn.execute('SELECT hash FROM flowchart_blobs WHERE base_hash=?', (blob_hash,)))
+    for blob_hash in dead:
+        for (child,) in conn.execute('SELECT hash FROM flowchart_blobs WHERE base_hash=?', (blob_hash,)).fetchall():
+            if child not in dead:
+                _rebase_blob(conn, child, dead)
+    conn.executemany('DELETE FROM flowchart_blobs WHERE hash=?', [(h,) for h in dead])
+    return len(dead)
+
+def _rebase_blob(conn, blob_hash, dead):
+    # Re-encode a delta against its nearest surviving ancestor (or as a
+    # keyframe). The content, and so the hash, doesn't change; the depth can
+    # only shrink, so chains built on top of this blob stay within bounds.
+    rows = _chain_rows(conn, blob_hash)
+    snapshot, head = None, None
+    for i, (h, depth, encoding, data) in enumerate(rows):
+        payload = decode_payload(encoding, data)
+        snapshot = payload if i == 0 else apply_delta(snapshot, payload)
+        if h != blob_hash and h not in dead:
+            head = (snapshot, h, depth)
+    storage, base_hash, depth, encoding, data = _encode_blob(snapshot, head)
+    conn.execute('''UPDATE flowchart_blobs SET storage=?, base_hash=?, depth=?, encoding=?, data=? WHERE hash=?''',
+                 (storage, base_hash, depth, encoding, data, blob_hash))
@@ -0,0 +1,118 @@
+"""
+Structural deltas between flowchart snapshots.
+
+A delta describes how to turn one snapshot ({'nodes': [...]}) into the next:
+nodes removed (by id), nodes modified (only the fields that changed, so a
+move is just the new 'pos' and a new edge is the changed connectsTo/connectsFrom
+lists), and nodes added. Node order is preserved exactly.
+"""
+
+def _node_map(snapshot):
+    return {n['id']: n for n in snapshot.get('nodes', [])}
+
+
+def can_diff(old, new):
+    # Deltas are keyed by node id, so ids have to be unique on both sides
+    for snapshot in (old, new):
+        if not isinstance(snapshot, dict) or not isinstance(snapshot.get('nodes', []), list):
+            return False
+        ids = [n.get('id') if isinstance(n, dict) else None for n in snapshot.get('nodes', [])]
+        if None in ids or len(set(ids)) != len(ids):
+            return False
+    return True
+
+
+def make_delta(old, new):
+    """Return the delta turning snapshot `old` into snapshot `new`."""
+    old_nodes = _node_map(old)
+    new_nodes = _node_map(new)
+    delta = {}
+
+    removed = [nid for nid in old_nodes if nid not in new_nodes]
+    if removed:
+        delta['removed'] = removed
+
+    modified = []
+    added = []
+    for nid, node in new_nodes.items():
+        prev = old_nodes.get(nid)
+        if prev is None:
+            added.append(node)
+            continue
+        # Snapshots rebuilt with apply_delta share untouched node dicts, so identity settles those
+        if prev is node or prev == node:
+            continue
+        changed = {k: v for k, v in node.items() if k not in prev or prev[k] != v}
+        unset = [k for k in prev if k not in node]
+        modified.append([nid, changed, unset] if unset else [nid, changed])
+    if modified:
+        delta['modified'] = modified
+    if added:
+        delta['added'] = added
+
+    # apply_delta keeps surviving nodes in place and appends new ones; only
+    # spell out the order when the new snapshot differs from that
+    removed_ids = set(removed)
+    replayed = [nid for nid in old_nodes if nid not in removed_ids] + [n['id'] for n in added]
+    new_order = [n['id'] for n in new.get('nodes', [])]
+    if replayed != new_order:
+        delta['order'] = new_order
+
+    old_meta = {k: v for k, v in old.items() if k != 'nodes'}
+    new_meta = {k: v for k, v in new.items() if k != 'nodes'}
+    if old_meta != new_meta or ('nodes' in old) != ('nodes' in new):
+        delta['meta'] = new_meta
+        delta['has_nodes'] = 'nodes' in new
+    return delta
+
+
+def apply_delta(base, delta):
+    """Apply `delta` to snapshot `base` and return the resulting snapshot.
+
+    `base` is not modified; untouched node dicts are shared with the result.
+    """
+    nodes = _node_map(base)
+    for nid in delta.get('removed', []):
+        nodes.pop(nid, None)
+    for entry in delta.get('modified', []):
+        nid, changed = entry[0], entry[1]
+        node = dict(nodes[nid])
+        node.update(changed)
+        for k in entry[2] if len(entry) > 2 else []:
+            node.pop(k, None)
+        nodes[nid] = node
+    for node in delta.get('added', []):
+        nodes[node['id']] = node
+
+    if 'order' in delta:
+        node_list = [nodes[nid] for nid in delta['order']]
+    else:
+        node_list = list(nodes.values())
+
+    if 'meta' in delta:
+        result = dict(delta['meta'])
+        if delta.get('has_nodes', True):
+            result['nodes'] = node_list
+    else:
+        result = {k: v for k, v in base.items() if k != 'nodes'}
+        if 'nodes' in base or node_list:
+            result['nodes'] = node_list
+    return result
+
+
+def delta_size(delta):
+    # Rough number of node records touched, used to decide when a keyframe is cheaper
+    return (len(delta.get('removed', [])) + len(delta.get('modified', []))
+            + len(delta.get('added', [])) + (len(delta['order']) if 'order' in delta else 0))
+
+
+def copy_snapshot(snapshot):
+    # Node values are scalars or flat lists, so copying one level down is enough
+    # to detach a snapshot from later mutation by the caller
+    result = {k: v for k, v in snapshot.items() if k != 'nodes'}
+    if 'nodes' in snapshot:
+        result['nodes'] = [
+            {k: list(v) if isinstance(v, list) else v for k, v in n.items()}
+            for n in snapshot['nodes']
+        ]
+    return result
@@ -0,0 +1,121 @@
+"""
+Structural diff between two flowchart versions.
+
+Nodes are matched by id, and edges are only compared around nodes whose links
+changed, so a diff is linear in the number of nodes. Either side can be a snapshot dict ({'nodes': [...]}) or
+a FlowchartModel. Snapshots decoded from the same delta chain share the dicts
+of unchanged nodes, which are skipped with an identity check.
+"""
+
+from promptperfector.logic.flowchart import FlowchartModel
+
+# Position changes smaller than this (in scene units) don't count as a move
+MOVE_TOLERANCE = 0.5
+
+
+class FlowchartDiff:
+    def __init__(self, added, removed, moved, edited, added_edges, removed_edges):
+        self.added = added
+        self.removed = removed
+        self.moved = moved
+        self.edited = edited
+        self.added_edges = added_edges
+        self.removed_edges = removed_edges
+
+    def is_empty(self):
+        return not (self.added or self.removed or self.moved or self.edited
+                    or self.added_edges or self.removed_edges)
+
+    def summary(self):
+        return (f"+{len(self.added)} -{len(self.removed)} nodes, {len(self.edited)} edited, "
+                f"{len(self.moved)} moved, +{len(self.added_edges)} -{len(self.removed_edges)} edges")
+
+    def __repr__(self):
+        return f"FlowchartDiff({self.summary()})"
+
+
+def _index(flowchart):
+    if isinstance(flowchart, FlowchartModel):
+        return {n.id: (n.subject or '', n.text, n.pos, flowchart.successors(n.id),
+                       flowchart.predecessors(n.id)) for n in flowchart}
+    return {n['id']: n for n in flowchart.get('nodes') or []}
+
+
+def _fields(node):
+    if isinstance(node, tuple):
+        return node[:3]
+    return node.get('subject') or '', node.get('text'), node.get('pos')
+
+
+def _links(node):
+    if isinstance(node, tuple):
+        return node[3], node[4]
+    return node.get('connectsTo') or (), node.get('connectsFrom') or ()
+
+
+def _has_edge(nodes, from_id, to_id):
+    # An edge exists if either end lists it and both ends exist
+    source = nodes.get(from_id)
+    target = nodes.get(to_id)
+    if source is None or target is None:
+        return False
+    return to_id in _links(source)[0] or from_id in _links(target)[1]
+
+
+def _moved(old_pos, new_pos, tolerance):
+    if old_pos is None or new_pos is None:
+        return old_pos is not new_pos
+    return abs(old_pos[0] - new_pos[0]) > tolerance or abs(old_pos[1] - new_pos[1]) > tolerance
+
+
+def diff_flowcharts(old, new, move_tolerance=MOVE_TOLERANCE):
+    """Return the FlowchartDiff that takes version `old` to version `new`."""
+    old_nodes = _index(old)
+    new_nodes = _index(new)
+    added = [node_id for node_id in new_nodes if node_id not in old_nodes]
+    removed = [node_id for node_id in old_nodes if node_id not in new_nodes]
+    moved = []
+    edited = []
+    # Only nodes whose links changed (or that link to an added/removed node)
+    # can contribute a changed edge, so edges are only compared around them
+    touched = added + removed
+    for node_id, node in new_nodes.items():
+        prev = old_nodes.get(node_id)
+        if prev is None or prev is node:
+            continue
+        old_subject, old_text, old_pos = _fields(prev)
+        subject, text, pos = _fields(node)
+        if old_subject != subject or old_text != text:
+            edited.append(node_id)
+        if _moved(old_pos, pos, move_tolerance):
+            moved.append(node_id)
+        if _links(prev) != _links(node):
+            touched.append(node_id)
+    if added or removed:
+        changed_ids = set(touched)
+        for node_id, node in new_nodes.items():
+            if node_id in changed_ids:
+                continue
+            links_to, links_from = _links(node)
+            if any(other in changed_ids for other in links_to) or any(other in changed_ids for other in links_from):
+                touched.append(node_id)
+
+    candidates = set()
+    for nodes in (old_nodes, new_nodes):
+        for node_id in touched:
+            node = nodes.get(node_id)
+            if node is None:
+                continue
+            links_to, links_from = _links(node)
+            candidates.update((node_id, other) for other in links_to)
+            candidates.update((other, node_id) for other in links_from)
+    added_edges = []
+    removed_edges = []
+    for from_id, to_id in sorted(candidates):
+        before = _has_edge(old_nodes, from_id, to_id)
+        after = _has_edge(new_nodes, from_id, to_id)
+        if after and not before:
+            added_edges.append((from_id, to_id))
+        elif before and not after:
+            removed_edges.append((from_id, to_id))
+    return FlowchartDiff(added, removed, moved, edited, added_edges, removed_edges)
@@ -1,26 +1,92 @@
 import uuid
 import json
 
+# Adjacency entries stay as small tuples up to this degree and become
+# insertion-ordered dicts (used as sets) past it, so the common case of a
+# node with one or two links costs a few dozen bytes instead of a dict
+SMALL_DEGREE = 8
+
 class Node:
-    def __init__(self, text, node_id=None, connectsTo=None, connectsFrom=None, subject=None):
+    # Nodes only hold their own fields. Edges live in the owning FlowchartModel;
+    # a node that isn't in a model yet keeps the connections it was created with
+    # until it is added to one.
+    __slots__ = ('id', 'text', 'subject', 'pos', '_model', '_pending')
+
+    def __init__(self, text, node_id=None, connectsTo=None, connectsFrom=None, subject=None, pos=None):
         self.id = node_id or str(uuid.uuid4())
         self.text = text
         self.subject = subject  # New field for node subject/title
-        self.connectsTo = connectsTo or []
-        self.connectsFrom = connectsFrom or []
+        self.pos = tuple(pos) if pos is not None else None
+        self._model = None
+        self._pending = (list(connectsTo or []), list(connectsFrom or [])) if connectsTo or connectsFrom else None
+
+    @property
+    def connectsTo(self):
+        if self._model is not None:
+            return list(self._model._out.get(self.id, ()))
+        return list(self._pending[0]) if self._pending else []
+
+    @property
+    def connectsFrom(self):
+        if self._model is not None:
+            return list(self._model._in.get(self.id, ()))
+        return list(self._pending[1]) if self._pending else []
 
     def to_dict(self):
-        return {
+        connectsTo = self.connectsTo
+        connectsFrom = self.connectsFrom
+        d = {
             'id': self.id,
             'subject': self.subject if self.subject is not None else '',
             'text': self.text,
-            'connectsTo': self.connectsTo if self.connectsTo else None,
-            'connectsFrom': self.connectsFrom if self.connectsFrom else None
+            'connectsTo': connectsTo if connectsTo else None,
+            'connectsFrom': connectsFrom if connectsFrom else None
         }
+        if self.pos is not None:
+            d['pos'] = list(self.pos)
+        return d
 
 class FlowchartModel:
+    """
+    Flowchart graph: nodes indexed by id plus a single directed edge store with
+    forward (_out) and reverse (_in) adjacency, so both directions always agree.
+    Adjacency entries only exist for nodes that have edges (see SMALL_DEGREE).
+    Lookups, edge checks and add/remove of a node or edge are O(1) (removing
+    a node is O(degree)).
+
+    Nodes passed to the constructor whose id is already taken are skipped;
+    insert() and add_node() raise ValueError instead.
+
+    Listeners added with subscribe() are told about every structural change
+    after it is applied: node_added(id), node_removed(id), edge_added(from, to)
+    and edge_removed(from, to). Removing a node reports its edges first.
+    """
     def __init__(self, nodes=None):
-        self.nodes = nodes or []
+        self._nodes = {}
+        self._out = {}
+        self._in = {}
+        self._listeners = []
+        pending = []
+        for node in nodes or []:
+            # A snapshot can list an id more than once; the first node wins, as on the canvas
+            if node.id in self._nodes:
+                continue
+            links = node._pending
+            self.insert(node)
+            if links:
+                pending.append((node.id, links))
+        for node_id, (to_ids, from_ids) in pending:
+            for to_id in to_ids:
+                if to_id in self._nodes:
+                    self.add_edge(node_id, to_id)
+            for from_id in from_ids:
+                if from_id in self._nodes:
+                    self.add_edge(from_id, node_id)
+        # Keep each node's outgoing and incoming order as listed in its
+        # connectsTo/connectsFrom, so to_json() gives back what was loaded
+        for node_id, (to_ids, from_ids) in pending:
+            _reorder(self._out, node_id, to_ids)
+            _reorder(self._in, node_id, from_ids)
 
     @classmethod
     def from_json(cls, json_data):
@@ -30,14 +96,157 @@ class FlowchartModel:
             node_id=n['id'],
             connectsTo=n.get('connectsTo') or [],
             connectsFrom=n.get('connectsFrom') or [],
-            subject=n.get('subject') if 'subject' in n else None
+            subject=n.get('subject') if 'subject' in n else None,
+            pos=n.get('pos')
         ) for n in data.get('nodes', [])]
         return cls(nodes)
 
-    def add_node(self, text, subject=None):
-        node = Node(text, subject=subject)
-        self.nodes.append(node)
+    @property
+    def nodes(self):
+        return list(self._nodes.values())
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self._nodes.values())
+
+    def __contains__(self, node_id):
+        return node_id in self._nodes
+
+    def get(self, node_id):
+        return self._nodes.get(node_id)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add_node(self, text, subject=None, node_id=None, pos=None):
+        node = Node(text, node_id=node_id, subject=subject, pos=pos)
+        self.insert(node)
+        return node
+
+    def insert(self, node):
+        if node.id in self._nodes:
+            raise ValueError(f"Duplicate node id: {node.id}")
+        if node._model is not None:
+            raise ValueError(f"Node {node.id} already belongs to a model")
+        node._model = self
+        node._pending = None
+        self._nodes[node.id] = node
+        for listener in self._listeners:
+            listener.node_added(node.id)
+        return node
+
+    def remove_node(self, node_id):
+        node = self._nodes[node_id]
+        for to_id in tuple(self._out.get(node_id, ())):
+            self.remove_edge(node_id, to_id)
+        for from_id in tuple(self._in.get(node_id, ())):
+            self.remove_edge(from_id, node_id)
+        del self._nodes[node_id]
+        node._model = None
+        for listener in self._listeners:
+            listener.node_removed(node_id)
         return node
 
+    def add_edge(self, from_id, to_id):
+        from_node = self._nodes.get(from_id)
+        to_node = self._nodes.get(to_id)
+        if from_node is None or to_node is None:
+            raise KeyError(f"Unknown node in edge {from_id} -> {to_id}")
+        # Store the nodes' own id strings so edges don't keep duplicates alive
+        if not _add(self._out, from_node.id, to_node.id):
+            return False
+        _add(self._in, to_node.id, from_node.id)
+        for listener in self._listeners:
+            listener.edge_added(from_node.id, to_node.id)
+        return True
+
+    def remove_edge(self, from_id, to_id):
+        if not self.has_edge(from_id, to_id):
+            return False
+        _discard(self._out, from_id, to_id)
+        _discard(self._in, to_id, from_id)
+        for listener in self._listeners:
+            listener.edge_removed(from_id, to_id)
+        return True
+
+    def has_edge(self, from_id, to_id):
+        return to_id in self._out.get(from_id, ())
+
+    # successors/predecessors return the stored adjacency (a tuple or a dict
+    # keys view) without copying; don't mutate the graph while iterating one
+    def successors(self, node_id):
+        return _view(self._out.get(node_id, ()))
+
+    def predecessors(self, node_id):
+        return _view(self._in.get(node_id, ()))
+
+    def out_degree(self, node_id):
+        return len(self._out.get(node_id, ()))
+
+    def in_degree(self, node_id):
+        return len(self._in.get(node_id, ()))
+
+    def edges(self):
+        for from_id, out in self._out.items():
+            for to_id in out:
+                yield from_id, to_id
+
+    def edge_count(self):
+        return sum(len(out) for out in self._out.values())
+
     def to_json(self):
-        return {'nodes': [n.to_dict() for n in self.nodes]}
+        return {'nodes': [n.to_dict() for n in self._nodes.values()]}
+
+
+def _reorder(adjacency, key, listed):
+    # Put the entries of adjacency[key] that appear in `listed` first, in that order
+    entries = adjacency.get(key)
+    if not entries or not listed:
+        return
+    canonical = {v: v for v in entries}
+    ordered = dict.fromkeys(canonical[v] for v in listed if v in canonical)
+    ordered.update(dict.fromkeys(entries))
+    adjacency[key] = ordered if isinstance(entries, dict) else tuple(ordered)
+
+
+def _view(entries):
+    return entries.keys() if isinstance(entries, dict) else entries
+
+
+def _add(adjacency, key, value):
+    entries = adjacency.get(key)
+    if entries is None:
+        adjacency[key] = (value,)
+    elif value in entries:
+        return False
+    elif isinstance(entries, dict):
+        entries[value] = None
+    elif len(entries) < SMALL_DEGREE:
+        adjacency[key] = entries + (value,)
+    else:
+        entries = dict.fromkeys(entries)
+        entries[value] = None
+        adjacency[key] = entries
+    return True
+
+
+def _discard(adjacency, key, value):
+    entries = adjacency.get(key)
+    if entries is None or value not in entries:
+        return
+    if isinstance(entries, dict):
+        del entries[value]
+        if len(entries) <= SMALL_DEGREE // 2:
+            adjacency[key] = tuple(entries)
+    else:
+        entries = tuple(v for v in entries if v != value)
+        if entries:
+            adjacency[key] = entries
+        else:
+            del adjacency[key]
@@ -0,0 +1,488 @@
+"""
+Automatic layout of flowcharts.
+
+Two layouts, both taking a list of node ids and a list of (from_id, to_id)
+edges and returning one (x, y) per node:
+
+- layered_layout: Sugiyama-style, top to bottom. Cycles are broken by
+  reversing DFS back edges, nodes get longest-path layers, long edges are
+  split with dummy nodes, crossings are reduced with barycenter sweeps and
+  x coordinates are pulled towards the neighbours' barycenters.
+- force_layout: Fruchterman-Reingold spring embedder. Vectorized with NumPy
+  when it is installed (repulsion computed in row blocks), otherwise a pure
+  Python version that only repels nodes in neighbouring grid cells. Nodes can
+  be pinned, which incremental_layout uses to move only the nodes within a
+  few hops of a change.
+
+LayoutJob runs a layout in a worker process (spawned, so it is safe next to
+Qt) and streams intermediate positions back through a queue for the canvas
+to animate; the GUI polls it and never waits on it.
+"""
+
+import math
+import multiprocessing
+import queue
+import random
+from collections import deque
+
+# Distance between neighbouring nodes in layered layouts (x, y)
+LAYER_SPACING = (200.0, 150.0)
+# Preferred edge length of force layouts
+SPRING_LENGTH = 200.0
+# Crossing reduction passes (one down and one up sweep each)
+SWEEPS = 4
+# Edges spanning more layers than this get no dummy nodes
+MAX_DUMMY_SPAN = 4
+# Incremental layouts move the nodes this many hops around a change
+INCREMENTAL_HOPS = 2
+# A short, cool run: only nudges the nodes around a change apart
+INCREMENTAL_ITERATIONS = 15
+# Force layouts report positions every this many iterations
+REPORT_EVERY = 5
+METHODS = ('layered', 'force', 'incremental')
+
+
+def _numpy():
+    # NumPy is optional; without it force layouts fall back to pure Python
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _adjacency(nodes, edges):
+    index = {node_id: i for i, node_id in enumerate(nodes)}
+    out = [[] for _ in nodes]
+    seen = set()
+    for from_id, to_id in edges:
+        u = index.get(from_id)
+        v = index.get(to_id)
+        if u is None or v is None or u == v or (u, v) in seen:
+            continue
+        seen.add((u, v))
+        out[u].append(v)
+    return index, out
+
+
+# --- Layered layout ---
+
+def _acyclic(out):
+    # Iterative DFS; edges back into the stack are reversed
+    n = len(out)
+    state = [0] * n  # 0 new, 1 on stack, 2 done
+    edges = []
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(out[root]))]
+        while stack:
+            u, it = stack[-1]
+            for v in it:
+                if state[v] == 1:
+                    edges.append((v, u))
+                else:
+                    edges.append((u, v))
+                    if state[v] == 0:
+                        state[v] = 1
+                        stack.append((v, iter(out[v])))
+                        break
+            else:
+                state[u] = 2
+                stack.pop()
+    return edges
+
+
+def _layers(n, edges):
+    # Longest path from the sources, in topological (Kahn) order
+    succ = [[] for _ in range(n)]
+    indegree = [0] * n
+    for u, v in set(edges):
+        succ[u].append(v)
+        indegree[v] += 1
+    degree_in = list(indegree)
+    layer = [0] * n
+    topological = []
+    ready = deque(i for i in range(n) if indegree[i] == 0)
+    while ready:
+        u = ready.popleft()
+        topological.append(u)
+        for v in succ[u]:
+            layer[v] = max(layer[v], layer[u] + 1)
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                ready.append(v)
+    # Longest path leaves sources (and other nodes with more edges out than in)
+    # far above their successors; sink them as low as their successors allow,
+    # which shortens more edges than it stretches
+    for u in reversed(topological):
+        if succ[u] and len(succ[u]) >= degree_in[u]:
+            layer[u] = max(layer[u], min(layer[v] for v in succ[u]) - 1)
+    return layer
+
+
+def _barycenter(neighbours, position, fallback):
+    if not neighbours:
+        return fallback
+    return sum(position[w] for w in neighbours) / len(neighbours)
+
+
+def layered_layout(nodes, edges, spacing=LAYER_SPACING, sweeps=SWEEPS):
+    """Top-down layered layout; returns [(x, y), ...] in the order of `nodes`."""
+    n = len(nodes)
+    if not n:
+        return []
+    _, out = _adjacency(nodes, edges)
+    dag = _acyclic(out)
+    layer = _layers(n, dag)
+    # Split edges spanning a few layers with dummy nodes (ids >= n); longer
+    # edges link their ends directly rather than filling every layer in between
+    up = [[] for _ in range(n)]
+    down = [[] for _ in range(n)]
+    for u, v in set(dag):
+        prev = u
+        span = layer[v] - layer[u]
+        for step in range(layer[u] + 1, layer[v] if span <= MAX_DUMMY_SPAN else layer[u] + 1):
+            dummy = len(layer)
+            layer.append(step)
+            up.append([prev])
+            down.append([])
+            down[prev].append(dummy)
+            prev = dummy
+        down[prev].append(v)
+        up[v].append(prev)
+    rows = [[] for _ in range(max(layer) + 1)]
+    for i, l in enumerate(layer):
+        rows[l].append(i)
+
+    # Crossing reduction
+    order = [0.0] * len(layer)
+    for row in rows:
+        for k, i in enumerate(row):
+            order[i] = k
+    for _ in range(sweeps):
+        for row_range, neighbours in ((range(1, len(rows)), up), (range(len(rows) - 2, -1, -1), down)):
+            for l in row_range:
+                row = rows[l]
+                row.sort(key=lambda i: _barycenter(neighbours[i], order, order[i]))
+                for k, i in enumerate(row):
+                    order[i] = k
+
+    # x coordinates: start packed and centred, then pull each layer towards its
+    # neighbours' barycenters while keeping the spacing
+    gap, layer_gap = spacing
+    x = [0.0] * len(layer)
+    for row in rows:
+        offset = (len(row) - 1) * gap / 2
+        for k, i in enumerate(row):
+            x[i] = k * gap - offset
+    for _ in range(2):
+        for row_range, neighbours in ((range(1, len(rows)), up), (range(len(rows) - 2, -1, -1), down)):
+            for l in row_range:
+                row = rows[l]
+                wanted = [_barycenter(neighbours[i], x, x[i]) for i in row]
+                placed = []
+                for want in wanted:
+                    placed.append(want if not placed else max(want, placed[-1] + gap))
+                # Packing only pushes right; shift back so the layer keeps its centre
+                shift = (sum(wanted) - sum(placed)) / len(row)
+                for i, value in zip(row, placed):
+                    x[i] = value + shift
+    return [(x[i], layer[i] * layer_gap) for i in range(n)]
+
+
+# --- Force-directed layout ---
+
+def _initial_positions(nodes, positions, spring_length, rng):
+    # Missing or stacked positions are spread over a square that fits the graph
+    side = spring_length * math.sqrt(max(len(nodes), 1))
+    placed = []
+    seen = set()
+    for i in range(len(nodes)):
+        pos = positions[i] if positions is not None else None
+        if pos is None or tuple(pos) in seen:
+            pos = (rng.uniform(-side / 2, side / 2), rng.uniform(-side / 2, side / 2))
+        pos = (float(pos[0]), float(pos[1]))
+        seen.add(pos)
+        placed.append(pos)
+    return placed
+
+
+def _iterations(n, free_count):
+    # All-pairs repulsion costs free_count * n per iteration; keep the total bounded
+    return max(15, min(80, int(4e8 / max(free_count * n, 1))))
+
+
+def force_layout(nodes, edges, positions=None, fixed=None, iterations=None, spring_length=SPRING_LENGTH,
+                 callback=None, seed=0):
+    """
+    Spring embedder; returns [(x, y), ...] in the order of `nodes`. `positions`
+    (aligned with `nodes`, entries may be None) is the starting point and
+    `fixed` a set of node ids that keep theirs. `callback(positions, fraction)`
+    is called every REPORT_EVERY iterations and may return True to stop early.
+    """
+    n = len(nodes)
+    if not n:
+        return []
+    rng = random.Random(seed)
+    _, out = _adjacency(nodes, edges)
+    start = _initial_positions(nodes, positions, spring_length, rng)
+    free = [i for i in range(n) if not fixed or nodes[i] not in fixed]
+    if not free:
+        return start
+    if iterations is None:
+        iterations = _iterations(n, len(free))
+    pairs = [(u, v) for u in range(n) for v in out[u]]
+    np = _numpy()
+    step = _force_numpy if np is not None else _force_python
+    return step(np, start, pairs, free, iterations, spring_length, callback)
+
+
+def _temperatures(iterations, spring_length, free_count):
+    # Maximum step per iteration, cooling linearly; fewer moving nodes need less room
+    t0 = spring_length * math.sqrt(free_count) / 10
+    return [t0 * (1 - k / iterations) + spring_length * 0.05 for k in range(iterations)]
+
+
+def _force_numpy(np, start, pairs, free, iterations, spring_length, callback):
+    pos = np.array(start, dtype=np.float64)
+    n = len(pos)
+    k2 = spring_length * spring_length
+    free_idx = np.array(free, dtype=np.intp)
+    movable = np.zeros(n, dtype=bool)
+    movable[free_idx] = True
+    src = np.array([u for u, _ in pairs], dtype=np.intp)
+    dst = np.array([v for _, v in pairs], dtype=np.intp)
+    # Edges with a movable end are the only ones that matter
+    keep = movable[src] | movable[dst]
+    src, dst = src[keep], dst[keep]
+    # Repulsion is all pairs, computed in float32 blocks of rows to bound memory
+    block = max(1, min(len(free_idx), 4_000_000 // max(n, 1)))
+    k2_32 = np.float32(k2)
+    eps = np.float32(1e-2)
+    for it, temperature in enumerate(_temperatures(iterations, spring_length, len(free))):
+        disp = np.zeros((n, 2))
+        x = pos[:, 0].astype(np.float32)
+        y = pos[:, 1].astype(np.float32)
+        for first in range(0, len(free_idx), block):
+            rows = free_idx[first:first + block]
+            dx = x[rows, None] - x[None, :]
+            dy = y[rows, None] - y[None, :]
+            strength = dx * dx
+            strength += dy * dy
+            strength += eps
+            np.divide(k2_32, strength, out=strength)
+            disp[rows, 0] = np.einsum('ij,ij->i', dx, strength)
+            disp[rows, 1] = np.einsum('ij,ij->i', dy, strength)
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt((delta * delta).sum(axis=1)) + 1e-9
+            pull = delta * (dist / spring_length)[:, None]
+            np.subtract.at(disp, src, pull)
+            np.add.at(disp, dst, pull)
+        disp[~movable] = 0.0
+        length = np.sqrt((disp * disp).sum(axis=1)) + 1e-9
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        if callback and (it + 1) % REPORT_EVERY == 0 and it + 1 < iterations:
+            if callback([tuple(p) for p in pos.tolist()], (it + 1) / iterations):
+                break
+    return [tuple(p) for p in pos.tolist()]
+
+
+def _force_python(np, start, pairs, free, iterations, spring_length, callback):
+    # Repulsion only within 2 spring lengths, found through a grid of that cell size
+    pos = [list(p) for p in start]
+    n = len(pos)
+    k2 = spring_length * spring_length
+    cell = 2 * spring_length
+    free_set = set(free)
+    pairs = [(u, v) for u, v in pairs if u in free_set or v in free_set]
+    for it, temperature in enumerate(_temperatures(iterations, spring_length, len(free))):
+        grid = {}
+        for i, (px, py) in enumerate(pos):
+            grid.setdefault((int(px // cell), int(py // cell)), []).append(i)
+        disp = {i: [0.0, 0.0] for i in free}
+        for i in free:
+            px, py = pos[i]
+            cx, cy = int(px // cell), int(py // cell)
+            fx = fy = 0.0
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for j in grid.get((gx, gy), ()):
+                        if j == i:
+                            continue
+                        dx = px - pos[j][0]
+                        dy = py - pos[j][1]
+                        strength = k2 / (dx * dx + dy * dy + 1e-2)
+                        fx += dx * strength
+                        fy += dy * strength
+            disp[i][0] += fx
+            disp[i][1] += fy
+        for u, v in pairs:
+            dx = pos[u][0] - pos[v][0]
+            dy = pos[u][1] - pos[v][1]
+            dist = math.sqrt(dx * dx + dy * dy) + 1e-9
+            scale = dist / spring_length
+            if u in disp:
+                disp[u][0] -= dx * scale
+                disp[u][1] -= dy * scale
+            if v in disp:
+                disp[v][0] += dx * scale
+                disp[v][1] += dy * scale
+        for i, (dx, dy) in disp.items():
+            length = math.sqrt(dx * dx + dy * dy) + 1e-9
+            scale = min(length, temperature) / length
+            pos[i][0] += dx * scale
+            pos[i][1] += dy * scale
+        if callback and (it + 1) % REPORT_EVERY == 0 and it + 1 < iterations:
+            if callback([tuple(p) for p in pos], (it + 1) / iterations):
+                break
+    return [tuple(p) for p in pos]
+
+
+# --- Incremental layout ---
+
+def neighbourhood(nodes, edges, changed, hops=INCREMENTAL_HOPS):
+    """Node ids within `hops` edges (either direction) of the ids in `changed`."""
+    links = {node_id: [] for node_id in nodes}
+    for from_id, to_id in edges:
+        if from_id in links and to_id in links:
+            links[from_id].append(to_id)
+            links[to_id].append(from_id)
+    found = {node_id for node_id in changed if node_id in links}
+    frontier = list(found)
+    for _ in range(hops):
+        next_frontier = []
+        for node_id in frontier:
+            for other in links[node_id]:
+                if other not in found:
+                    found.add(other)
+                    next_frontier.append(other)
+        frontier = next_frontier
+    return found
+
+
+def free_position(positions, near=None, spacing=LAYER_SPACING):
+    """A spot that doesn't overlap `positions`: below `near` if given, else below everything."""
+    if not positions:
+        return (0.0, 0.0)
+    gap, layer_gap = spacing
+    taken = {(round(x / gap), round(y / layer_gap)) for x, y in positions}
+    if near is None:
+        near = (sum(x for x, _ in positions) / len(positions), max(y for _, y in positions))
+    col, row = round(near[0] / gap), round(near[1] / layer_gap) + 1
+    # Walk outwards along the row below until a free slot turns up
+    for offset in range(len(positions) + 1):
+        for c in (col + offset, col - offset):
+            if (c, row) not in taken:
+                return (c * gap, row * layer_gap)
+    return (col * gap, row * layer_gap)
+
+
+def incremental_layout(nodes, edges, positions, changed, hops=INCREMENTAL_HOPS, callback=None):
+    """
+    Re-layout only the nodes within `hops` of the `changed` ids; the rest stay
+    put. Nodes without a position start at their placed neighbours' centre.
+    """
+    moving = neighbourhood(nodes, edges, changed, hops)
+    index = {node_id: i for i, node_id in enumerate(nodes)}
+    start = list(positions)
+    links = {}
+    for from_id, to_id in edges:
+        links.setdefault(from_id, []).append(to_id)
+        links.setdefault(to_id, []).append(from_id)
+    rng = random.Random(0)
+    for i, node_id in enumerate(nodes):
+        if start[i] is not None:
+            continue
+        placed = [start[index[o]] for o in links.get(node_id, ()) if o in index and start[index[o]] is not None]
+        if placed:
+            cx = sum(p[0] for p in placed) / len(placed)
+            cy = sum(p[1] for p in placed) / len(placed)
+            start[i] = (cx + rng.uniform(-20, 20), cy + LAYER_SPACING[1] / 2 + rng.uniform(-20, 20))
+        else:
+            start[i] = free_position([p for p in start if p is not None])
+    fixed = {node_id for node_id in nodes if node_id not in moving}
+    return force_layout(nodes, edges, start, fixed=fixed, iterations=INCREMENTAL_ITERATIONS, callback=callback)
+
+
+def run_layout(method, nodes, edges, positions=None, changed=None, callback=None):
+    """Run one of METHODS synchronously; returns [(x, y), ...] in the order of `nodes`."""
+    if method == 'layered':
+        return layered_layout(nodes, edges)
+    if method == 'force':
+        return force_layout(nodes, edges, positions, callback=callback)
+    if method == 'incremental':
+        return incremental_layout(nodes, edges, positions, changed or (), callback=callback)
+    raise ValueError(f"Unknown layout method {method!r}, expected one of {METHODS}")
+
+
+# --- Worker process ---
+
+def _worker(results, cancelled, method, nodes, edges, positions, changed):
+    def report(partial, fraction):
+        results.put(('positions', partial, fraction))
+        return cancelled.is_set()
+    try:
+        results.put(('done', run_layout(method, nodes, edges, positions, changed, callback=report), 1.0))
+    except Exception as e:
+        results.put(('error', f"{type(e).__name__}: {e}", 1.0))
+
+
+class LayoutJob:
+    """
+    A layout running in a worker process. poll() returns the messages that
+    arrived since the last call: ('positions', [(x, y), ...], fraction) while
+    running, then ('done', [(x, y), ...], 1.0) or ('error', message, 1.0).
+    """
+    def __init__(self, method, nodes, edges, positions=None, changed=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown layout method {method!r}, expected one of {METHODS}")
+        self.method = method
+        self.nodes = list(nodes)
+        self.finished = False
+        # Set by the first poll that finds the worker gone with nothing queued
+        self._exited = False
+        # Spawned rather than forked: forking a process that runs Qt is unsafe
+        context = multiprocessing.get_context('spawn')
+        self._results = context.Queue()
+        self._cancelled = context.Event()
+        self._process = context.Process(target=_worker, daemon=True,
+                                        args=(self._results, self._cancelled, method, self.nodes, list(edges),
+                                              positions, list(changed) if changed else None))
+
+    def start(self):
+        self._process.start()
+        return self
+
+    def poll(self):
+        messages = []
+        while not self.finished:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                if self._process.is_alive():
+                    break
+                # The worker has exited, but its last message may still be in the
+                # pipe; give it until the next poll before reporting a crash
+                if not self._exited:
+                    self._exited = True
+                    break
+                messages.append(('error', f"Layout worker exited with code {self._process.exitcode}", 1.0))
+                self.finished = True
+                break
+            messages.append(message)
+            if message[0] != 'positions':
+                self.finished = True
+                self._process.join(timeout=1)
+        return messages
+
+    def cancel(self):
+        if self.finished:
+            return
+        self.finished = True
+        self._cancelled.set()
+        self._process.join(timeout=0.5)
+        if self._process.is_alive():
+            self._process.terminate()
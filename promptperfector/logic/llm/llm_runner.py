@@ -13,7 +13,7 @@ class LlamaCppRunner:
     def start(self):
         from promptperfector.logic.logger import log_debug
         import time
-        log_debug(f"LlamaCppRunner.start() called for model: {self.model_path}, n_ctx={self.n_ctx}, n_threads={self.n_threads}")
+        log_debug("LlamaCppRunner.start() called for model: %s, n_ctx=%s, n_threads=%s", self.model_path, self.n_ctx, self.n_threads)
         if self.llm:
             log_debug("LlamaCppRunner: Existing model found, stopping before reload.")
             self.stop()
@@ -21,9 +21,9 @@ class LlamaCppRunner:
             t0 = time.perf_counter()
             self.llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads, verbose=False)
             t1 = time.perf_counter()
-            log_debug(f"LlamaCppRunner: Model loaded successfully in {t1-t0:.2f} seconds.")
+            log_debug("LlamaCppRunner: Model loaded successfully in %.2f seconds.", t1 - t0)
         except Exception as e:
-            log_debug(f"LlamaCppRunner: Error loading model: {e}")
+            log_debug("LlamaCppRunner: Error loading model: %s", e)
             raise
 
     def stop(self):
@@ -38,14 +38,15 @@ class LlamaCppRunner:
                     log_debug("LlamaCppRunner: Calling llm.__del__().")
                     self.llm.__del__()
             except Exception as e:
-                log_debug(f"LlamaCppRunner: Exception during close: {e}")
+                log_debug("LlamaCppRunner: Exception during close: %s", e)
         self.llm = None
         log_debug("LlamaCppRunner: Model set to None.")
 
     def prompt(self, prompt_text, max_tokens=64, stop=None):
         from promptperfector.logic.logger import log_debug
         import time
-        log_debug(f"LlamaCppRunner.prompt() called. Prompt: {prompt_text!r}, max_tokens: {max_tokens}, stop: {stop}, n_ctx={self.n_ctx}, n_threads={self.n_threads}")
+        log_debug("LlamaCppRunner.prompt() called. Prompt: %r, max_tokens: %s, stop: %s, n_ctx=%s, n_threads=%s",
+                  prompt_text, max_tokens, stop, self.n_ctx, self.n_threads)
         if not self.llm:
             log_debug("LlamaCppRunner: Model not started!")
             raise RuntimeError('llama-cpp-python model not started')
@@ -53,9 +54,11 @@ class LlamaCppRunner:
             t0 = time.perf_counter()
             output = self.llm(prompt_text, max_tokens=max_tokens, stop=stop or ["\n"])
             t1 = time.perf_counter()
-            log_debug(f"LlamaCppRunner: Model output: {output}")
-            log_debug(f"LlamaCppRunner: Prompt completed in {t1-t0:.2f} seconds.")
-            return output["choices"][0]["text"]
+            text = output["choices"][0]["text"]
+            # Only the size of the output; the text itself is returned to the UI
+            log_debug("LlamaCppRunner: Model output: %d chars, usage: %s", len(text), output.get("usage"))
+            log_debug("LlamaCppRunner: Prompt completed in %.2f seconds.", t1 - t0)
+            return text
         except Exception as e:
-            log_debug(f"LlamaCppRunner: Exception during prompt: {e}")
+            log_debug("LlamaCppRunner: Exception during prompt: %s", e)
             raise
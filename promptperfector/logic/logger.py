@@ -1,18 +1,195 @@
+"""
+Application log (debug.log).
+
+Records below the current level are dropped after a single comparison, and
+arguments are only %-formatted into the message when the record is kept:
+
+    log_debug("Moved node %s to %s", node_id, pos)
+
+Kept records are queued for a background writer thread, which appends them
+to LOG_FILE in batches and rotates the file past LOG_MAX_BYTES. Ship builds
+(frozen, without a console) log at INFO, so debug logging is off; the
+PROMPTPERFECTOR_LOG_LEVEL environment variable (DEBUG, INFO, ERROR or OFF)
+overrides the default, and set_level() changes it at runtime.
+"""
+import atexit
 import os
-from datetime import datetime
+import sys
+import threading
+import time
+from collections import deque
 
 LOG_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'debug.log')
 
-def log(msg, level='INFO'):
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(f"[{timestamp}] [{level}] {msg}\n")
+DEBUG = 10
+INFO = 20
+ERROR = 40
+OFF = 100
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'ERROR': ERROR, 'OFF': OFF}
+# The writer wakes up this often, or as soon as BATCH_SIZE records (or an error) are waiting
+FLUSH_INTERVAL_S = 0.5
+BATCH_SIZE = 1000
+# Past LOG_MAX_BYTES debug.log is renamed to debug.log.1, older files shift
+# up and the oldest beyond LOG_BACKUPS is dropped
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+
+def _default_level():
+    name = os.environ.get('PROMPTPERFECTOR_LOG_LEVEL')
+    if name:
+        return LEVELS.get(name.upper(), DEBUG)
+    # Ship builds are made with --noconsole
+    if getattr(sys, 'frozen', False) and sys.stderr is None:
+        return INFO
+    return DEBUG
+
+
+_level = _default_level()
+
+
+class _Writer:
+    """Background thread appending queued (time, level, message) records to the log file."""
+    def __init__(self):
+        self._pending = deque()
+        self._wake = threading.Event()
+        # Held while writing, so flush() and the thread never interleave batches
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._size = 0
+        self._stamp_second = None
+        self._stamp = ''
+
+    def put(self, record, urgent=False):
+        self._pending.append(record)
+        if self._thread is None:
+            self._start()
+        if urgent or len(self._pending) >= BATCH_SIZE:
+            self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(FLUSH_INTERVAL_S)
+            self._wake.clear()
+            self.flush()
+
+    def _timestamp(self, created):
+        second = int(created)
+        if second != self._stamp_second:
+            self._stamp_second = second
+            self._stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+        return self._stamp
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            lines = []
+            while self._pending:
+                created, level, msg = self._pending.popleft()
+                lines.append(f"[{self._timestamp(created)}] [{level}] {msg}\n")
+            data = ''.join(lines).encode('utf-8')
+            try:
+                if self._file is None:
+                    self._open()
+                if self._size and self._size + len(data) > LOG_MAX_BYTES:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+            except OSError:
+                # Logging must never take the app down; the batch is lost
+                self.close()
+
+    def _open(self):
+        self._file = open(LOG_FILE, 'ab')
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{LOG_FILE}.{i}"):
+                os.replace(f"{LOG_FILE}.{i}", f"{LOG_FILE}.{i + 1}")
+        os.replace(LOG_FILE, f"{LOG_FILE}.1")
+        self._open()
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+_writer = _Writer()
+atexit.register(_writer.flush)
+
+
+def set_level(level):
+    """Set the lowest level written, as a number or a name ('DEBUG', 'INFO', 'ERROR', 'OFF')."""
+    global _level
+    _level = LEVELS[level.upper()] if isinstance(level, str) else level
+
+
+def get_level():
+    return _level
+
+
+def is_enabled(level=DEBUG):
+    # For guarding work that only exists to build a log message
+    return _level <= level
+
+
+def set_log_file(path):
+    """Write to `path` from now on; records queued so far still go to the old file."""
+    global LOG_FILE
+    flush()
+    with _writer._lock:
+        _writer.close()
+        LOG_FILE = path
+
+
+def flush():
+    """Write all queued records now."""
+    _writer.flush()
+
+
+def _emit(level, msg, args):
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    _writer.put((time.time(), level, msg), urgent=level == 'ERROR')
+
+
+def log(msg, *args, level='INFO'):
+    if LEVELS.get(level, INFO) < _level:
+        return
+    _emit(level, msg, args)
+
+
+def log_debug(msg, *args):
+    if _level > DEBUG:
+        return
+    _emit('DEBUG', msg, args)
+
 
-def log_debug(msg):
-    log(msg, 'DEBUG')
+def log_info(msg, *args):
+    if _level > INFO:
+        return
+    _emit('INFO', msg, args)
 
-def log_info(msg):
-    log(msg, 'INFO')
 
-def log_error(msg):
-    log(msg, 'ERROR')
+def log_error(msg, *args):
+    if _level > ERROR:
+        return
+    _emit('ERROR', msg, args)
@@ -0,0 +1,348 @@
+"""
+Compact binary encoding of flowchart snapshots.
+
+JSON stays the interchange format; this codec is for storage and loading. A
+snapshot is written as a header, the non-node keys as JSON, then blocks of up
+to BLOCK_SIZE nodes laid out column by column:
+
+    MAGIC  u8 format version
+    u32 length + header JSON  ({'meta': {...}, 'keys': [...], 'has_nodes': bool})
+    per block:
+        u32 node count (0 ends the snapshot)
+        new strings for the intern table: u32 count, u32 char lengths, u32 byte length + UTF-8
+        u8 flags per node
+        u32 id index per node
+        subjects, then texts: u32 char lengths, u32 byte length + UTF-8
+        f64 x, y for each node with a position
+        connectsTo, then connectsFrom: u32 count per node, u32 string indexes
+        u32 length + JSON for each node that doesn't fit the layout above
+
+Ids and connection targets go through a string table that grows block by
+block, so each id is stored once and every decoded reference to it is the same
+str object. All integers are little-endian. Nodes whose keys, key order or value
+types differ from what the canvas writes are kept verbatim as JSON, so the
+round trip is lossless for any snapshot.
+
+decode_snapshot() rebuilds the snapshot dict; iter_nodes() and decode_model()
+read one block at a time from bytes or a binary file, the latter building
+FlowchartModel nodes directly without an intermediate dict tree.
+"""
+
+import io
+import json
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+from promptperfector.logic.flowchart import FlowchartModel, Node
+
+MAGIC = b'PPSN'
+FORMAT_VERSION = 1
+BLOCK_SIZE = 4096
+
+# Node flags
+HAS_SUBJECT = 0x01
+HAS_TEXT = 0x02
+HAS_CONNECTS_TO = 0x04
+CONNECTS_TO_LIST = 0x08
+HAS_CONNECTS_FROM = 0x10
+CONNECTS_FROM_LIST = 0x20
+HAS_POS = 0x40
+RAW_JSON = 0x80
+
+# Key order of nodes written by the canvas; other orders are stored as JSON
+NODE_KEYS = ('id', 'subject', 'text', 'connectsTo', 'connectsFrom', 'pos')
+# Every key present, as in canvas exports
+ALL_KEYS = HAS_SUBJECT | HAS_TEXT | HAS_CONNECTS_TO | HAS_CONNECTS_FROM | HAS_POS
+
+_U32 = struct.Struct('<I')
+_SWAP = sys.byteorder != 'little'
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+def is_binary_snapshot(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+# --- Encoding ---
+
+def _pack_array(typecode, values):
+    packed = array(typecode, values)
+    if _SWAP:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _pack_strings(strings, out):
+    blob = ''.join(strings).encode('utf-8', 'surrogatepass')
+    out.append(_pack_array('I', [len(s) for s in strings]))
+    out.append(_U32.pack(len(blob)))
+    out.append(blob)
+
+
+def _is_id_list(value):
+    return type(value) is list and all(type(v) is str for v in value)
+
+
+def _node_flags(node):
+    # Flags for a node in the canvas layout, or RAW_JSON if it has to be kept verbatim
+    if type(node) is not dict or type(node.get('id')) is not str:
+        return RAW_JSON
+    keys = tuple(node)
+    if keys != NODE_KEYS and keys != tuple(k for k in NODE_KEYS if k in node):
+        return RAW_JSON
+    flags = 0
+    for key, flag in (('subject', HAS_SUBJECT), ('text', HAS_TEXT)):
+        if key in node:
+            if type(node[key]) is not str:
+                return RAW_JSON
+            flags |= flag
+    for key, present, is_list in (('connectsTo', HAS_CONNECTS_TO, CONNECTS_TO_LIST),
+                                  ('connectsFrom', HAS_CONNECTS_FROM, CONNECTS_FROM_LIST)):
+        if key in node:
+            value = node[key]
+            if value is None:
+                flags |= present
+            elif _is_id_list(value):
+                flags |= present | is_list
+            else:
+                return RAW_JSON
+    if 'pos' in node:
+        pos = node['pos']
+        if type(pos) is not list or len(pos) != 2 or type(pos[0]) is not float or type(pos[1]) is not float:
+            return RAW_JSON
+        flags |= HAS_POS
+    return flags
+
+
+def encode_snapshot(snapshot, block_size=BLOCK_SIZE):
+    """Encode a snapshot dict to bytes."""
+    nodes = snapshot.get('nodes')
+    has_nodes = type(nodes) is list
+    # Everything but the node list goes in the header, along with the key order
+    meta = {k: v for k, v in snapshot.items() if k != 'nodes' or not has_nodes}
+    header = json.dumps({'meta': meta, 'keys': list(snapshot), 'has_nodes': has_nodes}).encode('utf-8')
+    out = [MAGIC, bytes([FORMAT_VERSION]), _U32.pack(len(header)), header]
+    table = {}
+    nodes = nodes if has_nodes else []
+    for start in range(0, len(nodes), block_size):
+        _encode_block(nodes[start:start + block_size], table, out)
+    out.append(_U32.pack(0))
+    return b''.join(out)
+
+
+def _encode_block(nodes, table, out):
+    new_strings = []
+
+    def intern(s):
+        index = table.get(s)
+        if index is None:
+            index = table[s] = len(table)
+            new_strings.append(s)
+        return index
+
+    flags = []
+    ids = []
+    subjects = []
+    texts = []
+    coords = []
+    to_counts = []
+    to_refs = []
+    from_counts = []
+    from_refs = []
+    raw = []
+    for node in nodes:
+        f = _node_flags(node)
+        flags.append(f)
+        if f & RAW_JSON:
+            ids.append(0)
+            subjects.append('')
+            texts.append('')
+            to_counts.append(0)
+            from_counts.append(0)
+            raw.append(json.dumps(node, ensure_ascii=False).encode('utf-8', 'surrogatepass'))
+            continue
+        ids.append(intern(node['id']))
+        subjects.append(node['subject'] if f & HAS_SUBJECT else '')
+        texts.append(node['text'] if f & HAS_TEXT else '')
+        if f & HAS_POS:
+            coords.extend(node['pos'])
+        for flag, key, counts, refs in ((CONNECTS_TO_LIST, 'connectsTo', to_counts, to_refs),
+                                        (CONNECTS_FROM_LIST, 'connectsFrom', from_counts, from_refs)):
+            if f & flag:
+                value = node[key]
+                counts.append(len(value))
+                refs.extend(map(intern, value))
+            else:
+                counts.append(0)
+
+    out.append(_U32.pack(len(nodes)))
+    out.append(_U32.pack(len(new_strings)))
+    _pack_strings(new_strings, out)
+    out.append(bytes(flags))
+    out.append(_pack_array('I', ids))
+    _pack_strings(subjects, out)
+    _pack_strings(texts, out)
+    out.append(_pack_array('d', coords))
+    for counts, refs in ((to_counts, to_refs), (from_counts, from_refs)):
+        out.append(_pack_array('I', counts))
+        out.append(_pack_array('I', refs))
+    for data in raw:
+        out.append(_U32.pack(len(data)))
+        out.append(data)
+
+
+# --- Decoding ---
+
+class _Reader:
+    def __init__(self, source):
+        self._file = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
+    def read(self, size):
+        data = self._file.read(size)
+        if len(data) != size:
+            raise SnapshotFormatError("Truncated snapshot")
+        return data
+
+    def u32(self):
+        return _U32.unpack(self.read(4))[0]
+
+    def array(self, typecode, count):
+        values = array(typecode)
+        values.frombytes(self.read(count * values.itemsize))
+        if _SWAP:
+            values.byteswap()
+        return values
+
+    def strings(self, count):
+        lengths = self.array('I', count)
+        text = self.read(self.u32()).decode('utf-8', 'surrogatepass')
+        ends = list(accumulate(lengths))
+        return [text[start:end] for start, end in zip([0] + ends, ends)]
+
+
+def _read_header(reader):
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise SnapshotFormatError("Not a binary flowchart snapshot")
+    version = reader.read(1)[0]
+    if version != FORMAT_VERSION:
+        raise SnapshotFormatError(f"Unsupported snapshot format version: {version}")
+    return json.loads(reader.read(reader.u32()).decode('utf-8'))
+
+
+def _read_blocks(reader):
+    # Yields one block at a time as (count, flags, ids, subjects, texts, coords,
+    # to_counts, to_refs, from_counts, from_refs, raw, table)
+    table = []
+    while True:
+        count = reader.u32()
+        if not count:
+            return
+        table.extend(reader.strings(reader.u32()))
+        flags = reader.read(count)
+        ids = reader.array('I', count)
+        subjects = reader.strings(count)
+        texts = reader.strings(count)
+        coords = reader.array('d', 2 * sum(1 for f in flags if f & HAS_POS))
+        to_counts = reader.array('I', count)
+        to_refs = reader.array('I', sum(to_counts))
+        from_counts = reader.array('I', count)
+        from_refs = reader.array('I', sum(from_counts))
+        raw = [json.loads(reader.read(reader.u32()).decode('utf-8', 'surrogatepass'))
+               for f in flags if f & RAW_JSON]
+        yield count, flags, ids, subjects, texts, coords, to_counts, to_refs, from_counts, from_refs, raw, table
+
+
+def _split(values, counts):
+    result = []
+    offset = 0
+    for n in counts:
+        result.append(values[offset:offset + n])
+        offset += n
+    return result
+
+
+def _iter_fields(reader):
+    # Per node: (flags, id, subject, text, pos, connectsTo, connectsFrom) or
+    # (RAW_JSON, node_dict)
+    for (count, flags, ids, subjects, texts, coords, to_counts, to_refs,
+         from_counts, from_refs, raw, table) in _read_blocks(reader):
+        # Resolve the whole block's columns at once, then hand out nodes
+        ids = [None if f & RAW_JSON else table[i] for f, i in zip(flags, ids)]
+        coords = coords.tolist()
+        to_lists = _split([table[i] for i in to_refs], to_counts)
+        from_lists = _split([table[i] for i in from_refs], from_counts)
+        raw_nodes = iter(raw)
+        coord = 0
+        for f, node_id, subject, text, connects_to, connects_from in zip(flags, ids, subjects, texts, to_lists, from_lists):
+            if f & RAW_JSON:
+                yield RAW_JSON, next(raw_nodes)
+                continue
+            pos = None
+            if f & HAS_POS:
+                pos = coords[coord:coord + 2]
+                coord += 2
+            yield (f, node_id, subject, text, pos,
+                   connects_to if f & CONNECTS_TO_LIST else None,
+                   connects_from if f & CONNECTS_FROM_LIST else None)
+
+
+def iter_nodes(source):
+    """Yield the node dicts of an encoded snapshot (bytes or binary file) one at a time."""
+    reader = _Reader(source)
+    _read_header(reader)
+    for fields in _iter_fields(reader):
+        yield fields[1] if fields[0] & RAW_JSON else _node_dict(fields)
+
+
+def decode_snapshot(source):
+    """Decode bytes (or a binary file) written by encode_snapshot back to the snapshot dict."""
+    reader = _Reader(source)
+    header = _read_header(reader)
+    meta = header['meta']
+    if header['has_nodes']:
+        meta['nodes'] = [fields[1] if fields[0] & RAW_JSON else _node_dict(fields)
+                         for fields in _iter_fields(reader)]
+    return {k: meta[k] for k in header['keys']}
+
+
+def _node_dict(fields):
+    f, node_id, subject, text, pos, connects_to, connects_from = fields
+    if f & ALL_KEYS == ALL_KEYS:
+        return {'id': node_id, 'subject': subject, 'text': text, 'connectsTo': connects_to,
+                'connectsFrom': connects_from, 'pos': pos}
+    node = {'id': node_id}
+    if f & HAS_SUBJECT:
+        node['subject'] = subject
+    if f & HAS_TEXT:
+        node['text'] = text
+    if f & HAS_CONNECTS_TO:
+        node['connectsTo'] = connects_to
+    if f & HAS_CONNECTS_FROM:
+        node['connectsFrom'] = connects_from
+    if f & HAS_POS:
+        node['pos'] = pos
+    return node
+
+
+def decode_model(source):
+    """Build a FlowchartModel straight from an encoded snapshot, a block at a time."""
+    reader = _Reader(source)
+    _read_header(reader)
+    nodes = []
+    for fields in _iter_fields(reader):
+        if fields[0] & RAW_JSON:
+            n = fields[1]
+            nodes.append(Node(n['text'], node_id=n['id'], connectsTo=n.get('connectsTo') or [],
+                              connectsFrom=n.get('connectsFrom') or [], subject=n.get('subject'),
+                              pos=n.get('pos')))
+            continue
+        f, node_id, subject, text, pos, connects_to, connects_from = fields
+        nodes.append(Node(text if f & HAS_TEXT else None, node_id=node_id, connectsTo=connects_to,
+                          connectsFrom=connects_from, subject=subject if f & HAS_SUBJECT else None,
+                          pos=pos))
+    return FlowchartModel(nodes)
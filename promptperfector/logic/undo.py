@@ -0,0 +1,198 @@
+"""
+Undo/redo as a log of small, invertible commands.
+
+Each edit on the canvas (add/remove/move/edit a node, add/remove an edge) is a
+Command that knows how to apply itself to a target (the canvas) and how to
+build its inverse. UndoStack applies commands and keeps them; a command holds
+only what it changed, so a deep undo stack grows with the size of the edits,
+not of the graph, and undo/redo apply one (inverse) command each.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+# --- Commands ---
+
+class Command(ABC):
+    label = ''
+
+    @abstractmethod
+    def apply(self, target):
+        """Make the change on `target` (the canvas)."""
+
+    @abstractmethod
+    def inverse(self):
+        """The command that undoes this one."""
+
+
+class AddNode(Command):
+    label = 'Add Node'
+
+    def __init__(self, node_id, subject, text, pos, color=None):
+        self.node_id = node_id
+        self.subject = subject
+        self.text = text
+        self.pos = tuple(pos)
+        self.color = color
+
+    def apply(self, target):
+        target.create_node(self.node_id, self.subject, self.text, self.pos, self.color)
+
+    def inverse(self):
+        return RemoveNode(self.node_id, self.subject, self.text, self.pos, self.color)
+
+
+class RemoveNode(Command):
+    # Edges attached to the node have to be removed first (see remove_node_commands)
+    label = 'Delete Node'
+
+    def __init__(self, node_id, subject, text, pos, color=None):
+        self.node_id = node_id
+        self.subject = subject
+        self.text = text
+        self.pos = tuple(pos)
+        self.color = color
+
+    def apply(self, target):
+        target.delete_node(self.node_id)
+
+    def inverse(self):
+        return AddNode(self.node_id, self.subject, self.text, self.pos, self.color)
+
+
+class MoveNode(Command):
+    label = 'Move Node'
+
+    def __init__(self, node_id, old_pos, new_pos):
+        self.node_id = node_id
+        self.old_pos = tuple(old_pos)
+        self.new_pos = tuple(new_pos)
+
+    def apply(self, target):
+        target.move_node(self.node_id, self.new_pos)
+
+    def inverse(self):
+        return MoveNode(self.node_id, self.new_pos, self.old_pos)
+
+
+class EditNode(Command):
+    label = 'Edit Node'
+
+    def __init__(self, node_id, old_subject, old_text, subject, text):
+        self.node_id = node_id
+        self.old_subject = old_subject
+        self.old_text = old_text
+        self.subject = subject
+        self.text = text
+
+    def apply(self, target):
+        target.set_node_content(self.node_id, self.subject, self.text)
+
+    def inverse(self):
+        return EditNode(self.node_id, self.subject, self.text, self.old_subject, self.old_text)
+
+
+class AddEdge(Command):
+    label = 'Add Connector'
+
+    def __init__(self, from_id, to_id):
+        self.from_id = from_id
+        self.to_id = to_id
+
+    def apply(self, target):
+        target.add_connector(self.from_id, self.to_id)
+
+    def inverse(self):
+        return RemoveEdge(self.from_id, self.to_id)
+
+
+class RemoveEdge(Command):
+    label = 'Delete Connector'
+
+    def __init__(self, from_id, to_id):
+        self.from_id = from_id
+        self.to_id = to_id
+
+    def apply(self, target):
+        target.remove_connector(self.from_id, self.to_id)
+
+    def inverse(self):
+        return AddEdge(self.from_id, self.to_id)
+
+
+class CommandGroup(Command):
+    """Several commands undone and redone as one step."""
+
+    def __init__(self, commands, label=None):
+        self.commands = list(commands)
+        self.label = label or (self.commands[0].label if self.commands else '')
+
+    def apply(self, target):
+        for command in self.commands:
+            command.apply(target)
+
+    def inverse(self):
+        return CommandGroup([c.inverse() for c in reversed(self.commands)], self.label)
+
+
+def remove_node_commands(node_id, subject, text, pos, edges, color=None):
+    """Delete a node together with its edges, as one undoable step."""
+    return CommandGroup([RemoveEdge(f, t) for f, t in edges] + [RemoveNode(node_id, subject, text, pos, color)],
+                        RemoveNode.label)
+
+
+class UndoStack:
+    """
+    Applies commands to a target and keeps them for undo/redo; stepping
+    through history applies one command (or its inverse) to the target.
+    """
+    def __init__(self, limit=1000):
+        self.limit = limit
+        self._undo = deque(maxlen=limit or None)
+        self._redo = []
+
+    def reset(self):
+        """Forget all history."""
+        self._undo.clear()
+        self._redo.clear()
+
+    def push(self, command, target=None):
+        """Apply `command` to `target` (if given) and record it."""
+        if target is not None:
+            command.apply(target)
+        self._undo.append(command)
+        self._redo.clear()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else ''
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else ''
+
+    def undo(self, target=None):
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        if target is not None:
+            command.inverse().apply(target)
+        self._redo.append(command)
+        return command
+
+    def redo(self, target=None):
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        if target is not None:
+            command.apply(target)
+        self._undo.append(command)
+        return command
+
+    def __len__(self):
+        return len(self._undo)
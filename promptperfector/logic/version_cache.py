@@ -0,0 +1,108 @@
+from collections import OrderedDict
+
+from promptperfector.logic import db
+from promptperfector.logic.logger import log_debug, is_enabled, DEBUG
+
+
+def approximate_size(snapshot):
+    # Rough in-memory footprint of a decoded snapshot, in bytes
+    size = 200
+    for node in snapshot.get('nodes', []) if isinstance(snapshot, dict) else []:
+        size += 400
+        for value in node.values():
+            if isinstance(value, str):
+                size += len(value)
+            elif isinstance(value, list):
+                size += 64 + 72 * len(value)
+    return size
+
+
+class VersionCache:
+    """
+    Bounded LRU cache of decoded flowchart versions, keyed by (project_id, version).
+
+    A miss loads the requested version together with `prefetch` neighbours on
+    either side in one db call (twice as many in the direction the user has
+    been stepping), so moving back and forth through history mostly hits
+    memory. A version never changes once saved, but compaction can delete it,
+    so a project's entries are dropped whenever it has been compacted since
+    they were loaded. Cached snapshots are shared; treat them as read-only.
+    """
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024, prefetch=3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.evictions = 0
+        self._last_requested = {}
+        self._compactions = {}
+
+    def get(self, project_id, version):
+        compactions = db.compaction_count(project_id)
+        if self._compactions.setdefault(project_id, compactions) != compactions:
+            self.invalidate(project_id)
+            self._compactions[project_id] = compactions
+        key = (project_id, version)
+        last = self._last_requested.get(project_id)
+        self._last_requested[project_id] = version
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        before = after = self.prefetch
+        if last is not None and last > version:
+            before *= 2
+        elif last is not None and last < version:
+            after *= 2
+        loaded = db.get_flowchart_versions(project_id, version - before, version + after)
+        for v, snapshot in loaded.items():
+            if v != version and (project_id, v) not in self._entries:
+                self.prefetched += 1
+                self.put(project_id, v, snapshot)
+        snapshot = loaded.get(version)
+        if snapshot is not None:
+            # Insert the requested version last so it is the most recently used
+            self.put(project_id, version, snapshot)
+        if is_enabled(DEBUG):
+            log_debug("Version cache miss for %s v%s: %s", project_id, version, self.stats())
+        return snapshot
+
+    def put(self, project_id, version, snapshot):
+        key = (project_id, version)
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        size = approximate_size(snapshot)
+        self._entries[key] = (snapshot, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            if len(self._entries) == 1:
+                # Always keep the entry just added, even if it alone exceeds max_bytes
+                break
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, project_id):
+        for key in [key for key in self._entries if key[0] == project_id]:
+            self._bytes -= self._entries.pop(key)[1]
+        self._last_requested.pop(project_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'prefetched': self.prefetched,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+        }
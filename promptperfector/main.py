@@ -1,12 +1,17 @@
+import multiprocessing
 import sys
 from PySide6.QtWidgets import QApplication
 from .ui.main_window import MainWindow
+from .logic.db import init_db
 
 def main():
+    init_db()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Layout workers are spawned processes; frozen builds need this to start them
+    multiprocessing.freeze_support()
     main()
@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton
 from ..logic.llm import llm
 from ..logic import db
+from ..logic.analysis import execution_order
 
 class FinalPromptWidget(QWidget):
     def __init__(self, project_id=None, back_callback=None):
@@ -24,6 +25,9 @@ class FinalPromptWidget(QWidget):
     def generate_prompt(self, flow_json=None):
         if self.project_id:
             flow_json = db.get_latest_flowchart(self.project_id)
+        if flow_json:
+            # Hand the nodes to the LLM in the order the flow runs
+            flow_json = execution_order(flow_json)
         return self.llm.generate_prompt(flow_json)
 
     def set_prompt(self, prompt):
@@ -1,7 +1,59 @@
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsTextItem, QGraphicsRectItem, QGraphicsItem, QGraphicsLineItem, QMenu, QInputDialog, QGraphicsEllipseItem, QDialog, QFormLayout, QLineEdit, QDialogButtonBox
-from PySide6.QtGui import QPen, QBrush, QColor, QFont, QMouseEvent, QPainter, QAction, QPolygonF
-from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QStyleOptionGraphicsItem, QGraphicsRectItem, QGraphicsItem, QGraphicsLineItem, QMenu, QInputDialog, QDialog, QFormLayout, QLineEdit, QDialogButtonBox
+from PySide6.QtGui import QPen, QBrush, QColor, QFont, QMouseEvent, QPainter, QAction, QPolygonF, QPainterPath, QTextDocument, QAbstractTextDocumentLayout, QPalette
+from PySide6.QtCore import Qt, QPointF, QRectF, QTimer
+import math
+import time
+from collections import deque, OrderedDict
 from promptperfector.logic.logger import log_debug, log_info, log_error
+from promptperfector.logic.flowchart import FlowchartModel, Node
+from promptperfector.logic.analysis import GraphAnalysis
+from promptperfector.logic.layout import LayoutJob, free_position
+from promptperfector.logic.undo import UndoStack, AddNode, MoveNode, EditNode, AddEdge, RemoveEdge, CommandGroup, remove_node_commands
+
+CONNECTOR_COLOR = QColor(Qt.black)
+# Connector geometry of dragged nodes is refreshed at most once per frame
+FRAME_INTERVAL_MS = 16
+# Level of detail (scale of the view): below ARROW_LOD connectors get a single
+# arrowhead, below LABEL_LOD node labels are hidden, below LOW_DETAIL_LOD
+# nodes and connectors are drawn as flat shapes without arrows or antialiasing
+ARROW_LOD = 0.5
+LABEL_LOD = 0.4
+LOW_DETAIL_LOD = 0.15
+ARROW_SPACING = 60
+# Frame time the FPS counter is measured against
+TARGET_FRAME_MS = 33
+# Imports larger than this are built over several event loop ticks of about
+# LOAD_BATCH_MS each
+PROGRESSIVE_MIN_NODES = 1000
+LOAD_BATCH_MS = 12
+# Auto layout: how often the worker is polled, and the share of the remaining
+# distance nodes travel towards their new position per tick
+LAYOUT_TICK_MS = 30
+LAYOUT_EASE = 0.35
+# Node sizes measured for distinct (label, font, width bounds); least recently
+# used entries are dropped beyond this
+TEXT_MEASURE_CACHE_SIZE = 4096
+# Connector handles, drawn by the node itself on its box edges
+HANDLE_RADIUS = 8
+HANDLE_COLOR = QColor("#00ccff")
+HANDLE_ACTIVE_COLOR = QColor("#ffcc00")
+# Connectors that lie on a cycle
+CYCLE_COLOR = QColor("#cc0000")
+# Outlines used by the version comparison view
+DIFF_COLORS = {
+    'added': QColor("#2e9d3a"),
+    'edited': QColor("#e08a00"),
+    'moved': QColor("#2f6fd6"),
+    'removed': QColor("#888888"),
+}
+
+# (display text, font key, default width, max width, margin) ->
+# (width, height, text width, text height, laid out label document)
+_text_measures = OrderedDict()
+
+
+def _lod(painter):
+    return QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
 
 # Custom line with arrowhead for connectors
 class ArrowLineItem(QGraphicsLineItem):
@@ -9,46 +61,124 @@ class ArrowLineItem(QGraphicsLineItem):
         super().__init__(x1, y1, x2, y2, *args, **kwargs)
         self.setZValue(-1)
         self.arrow_size = 16
+        # Arrowhead triangles and their combined path for the current line, keyed by 'full'/'single'
+        self._arrow_line = None
+        self._arrow_heads = {}
+        self._arrow_paths = {}
+        # Long connectors are mostly off screen when zoomed in; exposedRect
+        # lets paint() skip the arrowheads that can't be seen
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        # Arrowheads stick out of the line by half their size
+        margin = self.arrow_size / 2
+        return super().boundingRect().adjusted(-margin, -margin, margin, margin)
+
+    def _arrow_polygons(self, mode):
+        line = self.line()
+        if line != self._arrow_line:
+            self._arrow_line = line
+            self._arrow_heads = {}
+            self._arrow_paths = {}
+        heads = self._arrow_heads.get(mode)
+        if heads is None:
+            heads = []
+            length = line.length()
+            # Unit vector along the line and its normal; every arrowhead is the
+            # same triangle shifted along the line
+            ux, uy = line.dx() / length, line.dy() / length
+            half = self.arrow_size * 0.5
+            back = QPointF((-ux - uy) * half, (-uy + ux) * half)
+            side = QPointF((-ux + uy) * half, (-uy - ux) * half)
+            arrow_count = max(1, int(length // ARROW_SPACING)) if mode == 'full' else 1
+            for i in range(arrow_count):
+                p = line.pointAt((i + 1) / (arrow_count + 1))
+                heads.append((p, QPolygonF([p, p + back, p + side, p])))
+            self._arrow_heads[mode] = heads
+        return heads
+
+    def _arrow_path(self, mode, exposed=None):
+        heads = self._arrow_polygons(mode)
+        if exposed is not None:
+            margin = self.arrow_size
+            visible = exposed.adjusted(-margin, -margin, margin, margin)
+            path = QPainterPath()
+            for p, polygon in heads:
+                if visible.contains(p):
+                    path.addPolygon(polygon)
+            return path
+        path = self._arrow_paths.get(mode)
+        if path is None:
+            path = QPainterPath()
+            for _, polygon in heads:
+                path.addPolygon(polygon)
+            self._arrow_paths[mode] = path
+        return path
+
     def paint(self, painter, option, widget=None):
-        super().paint(painter, option, widget)
         line = self.line()
+        lod = _lod(painter)
+        if lod < LOW_DETAIL_LOD:
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.setPen(QPen(self.pen().color(), 0))
+            painter.drawLine(line)
+            return
+        super().paint(painter, option, widget)
         if line.length() == 0:
             return
-        # Draw multiple arrowheads along the line
-        arrow_count = max(1, int(line.length() // 60))  # At least 1, more if long
-        for i in range(arrow_count):
-            t = (i + 1) / (arrow_count + 1)
-            p = QPointF(
-                line.x1() + (line.x2() - line.x1()) * t,
-                line.y1() + (line.y2() - line.y1()) * t
-            )
-            angle = line.angle()
-            # Arrow points
-            arrow_p1 = p + QPointF(-self.arrow_size * 0.5, self.arrow_size * 0.5)
-            arrow_p2 = p + QPointF(-self.arrow_size * 0.5, -self.arrow_size * 0.5)
-            def rotate_point(pt, center, angle_deg):
-                from math import radians, cos, sin
-                angle_rad = radians(angle_deg)
-                dx = pt.x() - center.x()
-                dy = pt.y() - center.y()
-                x_new = dx * cos(angle_rad) - dy * sin(angle_rad)
-                y_new = dx * sin(angle_rad) + dy * cos(angle_rad)
-                return QPointF(center.x() + x_new, center.y() + y_new)
-            arrow_p1 = rotate_point(arrow_p1, p, -angle)
-            arrow_p2 = rotate_point(arrow_p2, p, -angle)
-            arrow_head = QPolygonF([p, arrow_p1, arrow_p2])
-            painter.setBrush(QBrush(Qt.black))
-            painter.drawPolygon(arrow_head)
+        # Draw multiple arrowheads along the line, or one when zoomed out
+        painter.setBrush(QBrush(self.pen().color()))
+        exposed = option.exposedRect
+        if exposed.contains(self.boundingRect()):
+            exposed = None
+        painter.drawPath(self._arrow_path('full' if lod >= ARROW_LOD else 'single', exposed))
+
+
+def measure_node_text(display, font, default_width, max_width, margin):
+    """
+    Return (width, height, text_width, text_height, document) of a node box showing `display`.
+
+    The box keeps `default_width` unless the text needs more, up to `max_width`.
+    Results are shared by all nodes, so repeated labels are only laid out once;
+    the returned document is the laid out label, which nodes paint directly and
+    must not modify.
+    """
+    key = (display, font.key(), default_width, max_width, margin)
+    size = _text_measures.get(key)
+    if size is not None:
+        _text_measures.move_to_end(key)
+        return size
+    doc = QTextDocument()
+    doc.setDefaultFont(font)
+    doc.setPlainText(display)
+    # Try to fit in default width, then max width
+    doc.setTextWidth(default_width - 2*margin)
+    if doc.idealWidth() < max_width - 2*margin:
+        width = max(default_width, int(doc.idealWidth()) + 2*margin)
+    else:
+        width = max_width
+    text_width = width - 2*margin
+    doc.setTextWidth(text_width)
+    text_height = doc.size().height()
+    size = (width, int(text_height) + 2*margin, text_width, text_height, doc)
+    _text_measures[key] = size
+    if len(_text_measures) > TEXT_MEASURE_CACHE_SIZE:
+        _text_measures.popitem(last=False)
+    return size
 
 
 class FlowchartNode(QGraphicsRectItem):
     def update_text_item(self):
-        log_debug(f'Showing subject/text in node update_text_item ${self.node_id}, ${self.subject}, ${self.text}')
         display = self.subject.strip() if len(self.subject.strip()) > 0 else self.text
-        log_debug(f'Computed display text: "{display}"')
-        self.text_item.setPlainText(display)
-        log_debug(f'Set text item plain text to: "{self.text_item.toPlainText()}"')
-        self.update_text_box_size()
+        if display == self._display:
+            return
+        self._display = display
+        width, height, text_width, text_height, self._label = measure_node_text(
+            display, self.label_font, self.default_width, self.max_width, self.margin)
+        self.setRect(-width//2, -height//2, width, height)
+        # Center text
+        self._label_pos = QPointF(-text_width//2, -text_height/2)
+        self.update()
 
     def get_text(self):
         return self.text
@@ -56,8 +186,11 @@ class FlowchartNode(QGraphicsRectItem):
     def set_text(self, text):
         self.text = text
         self.update_text_item()
+        if self.canvas_ref:
+            self.canvas_ref.mark_dirty(self.node_id)
+        # Only autosave if this is a text modification (not node creation)
         if self.canvas_ref and hasattr(self.canvas_ref, 'on_update') and text.strip():
-            log_info(f"Node text updated: id={self.node_id}, new_text='{text}'")
+            log_info("Node text updated: id=%s, new_text=%r", self.node_id, text)
             self.canvas_ref.on_update()
 
     def get_subject(self):
@@ -66,8 +199,10 @@ class FlowchartNode(QGraphicsRectItem):
     def set_subject(self, subject):
         self.subject = subject
         self.update_text_item()
+        if self.canvas_ref:
+            self.canvas_ref.mark_dirty(self.node_id)
         if self.canvas_ref and hasattr(self.canvas_ref, 'on_update'):
-            log_info(f"Node subject updated: id={self.node_id}, new_subject='{subject}'")
+            log_info("Node subject updated: id=%s, new_subject=%r", self.node_id, subject)
             self.canvas_ref.on_update()
 
     def edit_subject_and_text(self):
@@ -85,28 +220,19 @@ class FlowchartNode(QGraphicsRectItem):
         buttons.accepted.connect(dialog.accept)
         buttons.rejected.connect(dialog.reject)
         if dialog.exec() == QDialog.Accepted:
+            if self.canvas_ref:
+                self.canvas_ref.edit_node(self.node_id, subject_edit.text(), text_edit.text())
+                return
             self.set_subject(subject_edit.text())
             self.set_text(text_edit.text())
     def itemChange(self, change, value):
         if change == QGraphicsItem.ItemPositionHasChanged:
-            # Update all connectors attached to this node
+            # The canvas updates the connectors attached to this node on the next frame
             if self.canvas_ref:
-                for from_id, to_id, connector in getattr(self.canvas_ref, "connectors", []):
-                    if from_id == self.node_id or to_id == self.node_id:
-                        start_node = self.canvas_ref.nodes.get(from_id)
-                        end_node = self.canvas_ref.nodes.get(to_id)
-                        if start_node and end_node:
-                            connector.setLine(
-                                start_node.scenePos().x(), start_node.scenePos().y(),
-                                end_node.scenePos().x(), end_node.scenePos().y()
-                            )
+                self.canvas_ref.node_moved(self.node_id)
         return super().itemChange(change, value)
-    def mousePressEvent(self, event):
-        log_debug(f"[Node {getattr(self, 'node_id', None)}] mousePressEvent: button={event.button()}, modifiers={event.modifiers()}, pos={event.pos()}")
-        super().mousePressEvent(event)
-
     def contextMenuEvent(self, event):
-        log_debug(f"[Node {getattr(self, 'node_id', None)}] contextMenuEvent at {event.pos()} (scene: {event.scenePos()})")
+        log_debug("[Node %s] contextMenuEvent at %s (scene: %s)", self.node_id, event.pos(), event.scenePos())
         menu = QMenu()
         edit_both_action = QAction("Edit Node (Subject/Text)", menu)
         delete_action = QAction("Delete", menu)
@@ -115,40 +241,18 @@ class FlowchartNode(QGraphicsRectItem):
         action = menu.exec(event.screenPos())
         if action == edit_both_action:
             self.edit_subject_and_text()
-        elif action == delete_action:
-            scene = self.scene()
-            to_remove = []
-            for item in list(scene.items()):
-                if isinstance(item, QGraphicsLineItem):
-                    log_info(f"Checking item in scene for deletion: {type(item).__name__} and  if it has a from_id or to_id. From_id={getattr(item, 'from_id', None)}, to_id={getattr(item, 'to_id', None)}")
-                    if hasattr(item, 'from_id') and (item.from_id == self.node_id or item.to_id == self.node_id):
-                        log_info(f"Deleting connector attached to node: node_id={self.node_id}, connector=({getattr(item, 'from_id', None)}->{getattr(item, 'to_id', None)})")
-                        to_remove.append(item)
-            for item in to_remove:
-                scene.removeItem(item)
-            if self.canvas_ref:
-                self.canvas_ref.connectors = [c for c in self.canvas_ref.connectors if c[0] != self.node_id and c[1] != self.node_id]
-            log_info(f"Deleting node: id={self.node_id}")
-            scene.removeItem(self)
-        if self.canvas_ref and hasattr(self.canvas_ref, 'on_update'):
-            self.canvas_ref.on_update()
+        elif action == delete_action and self.canvas_ref:
+            # The canvas records the deletion (with the node's connectors) for undo
+            self.canvas_ref.remove_node(self.node_id)
         return
 
-    def hoverEnterEvent(self, event):
-        log_debug(f"[Node {getattr(self, 'node_id', None)}] hoverEnterEvent")
-        self.show_connector_buttons(True)
-        super().hoverEnterEvent(event)
-
-    def hoverLeaveEvent(self, event):
-        log_debug(f"[Node {getattr(self, 'node_id', None)}] hoverLeaveEvent")
-        if not getattr(self.scene(), '_show_all_connectors', False):
-            self.show_connector_buttons(False)
-        super().hoverLeaveEvent(event)
     # Reference to parent canvas for autosave
     canvas_ref = None
+    # Shared by all nodes; created with the first node, once Qt is running
+    label_font = None
+    label_context = None
     def __init__(self, text, node_id, pos=QPointF(0,0), color=QColor("#ffc0cb"), subject=None):
         self.node_id = node_id
-        log_debug(f"Creating node: id={node_id}, text='{text}', pos=({pos.x()}, {pos.y()})")
         # Dynamic sizing: initial size
         self.default_width = 120
         self.max_width = 240
@@ -161,97 +265,79 @@ class FlowchartNode(QGraphicsRectItem):
         self.setFlag(QGraphicsItem.ItemIsFocusable, True)
         self.setAcceptHoverEvents(True)
         self.setAcceptedMouseButtons(Qt.AllButtons)
-        log_debug(f"FlowchartNode created: id={node_id}, focusable={self.flags() & QGraphicsItem.ItemIsFocusable != 0}")
-        self.text_item = QGraphicsTextItem(self)
-        self.text_item.setTextInteractionFlags(Qt.NoTextInteraction)
-        self.text_item.setDefaultTextColor(Qt.black)
-        self.text_item.setFont(QFont("Arial", 12))
+        # The node is a single scene item: label and connector handles are
+        # painted by it, and the rendering is cached per zoom level
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        if FlowchartNode.label_font is None:
+            FlowchartNode.label_font = QFont("Arial", 12)
+            context = QAbstractTextDocumentLayout.PaintContext()
+            palette = context.palette
+            palette.setColor(QPalette.Text, Qt.black)
+            context.palette = palette
+            FlowchartNode.label_context = context
 
-        # log_debug for subject/text/pos already above
         self.text = text
         self.subject = subject if subject is not None else ''
+        self._display = None
+        self._label = None
+        self._label_pos = QPointF()
+        # Connector handles are shown on hover; the active one starts a pending connector
+        self._handles_visible = False
+        self._active_handle = None
         self.setPos(pos)
+        # The only sizing pass during construction
+        self.update_text_item()
 
-        # Connector buttons (hidden by default)
-        self.connector_buttons = {}
-        for name, (dx, dy) in {
-            'top': (0, -30),
-            'bottom': (0, 30),
-            'left': (-self.default_width//2, 0),
-            'right': (self.default_width//2, 0)
-        }.items():
-            btn = QGraphicsEllipseItem(-8, -8, 16, 16, self)
-            btn.setPos(dx, dy)
-            btn.setBrush(QBrush(QColor("#00ccff")))
-            btn.setPen(QPen(Qt.black, 1))
-            btn.setZValue(2)
-            btn.setVisible(False)
-            btn.setData(0, name)
-            btn.setAcceptedMouseButtons(Qt.LeftButton)
-            btn.setFlag(QGraphicsItem.ItemIsSelectable, True)
-            btn.setFlag(QGraphicsItem.ItemIsFocusable, True)
-            # installSceneEventFilter will be called after node is added to scene
-            log_debug(f"Connector button '{name}' for node {node_id} set to accept left button only and selectable/focusable.")
-            self.connector_buttons[name] = btn
-        self.set_text(text)
-        self.subject = subject if subject is not None else ''
+    # --- Connector handles ---
+    def handle_centers(self):
+        rect = self.rect()
+        return {
+            'top': QPointF(0, rect.top()),
+            'bottom': QPointF(0, rect.bottom()),
+            'left': QPointF(rect.left(), 0),
+            'right': QPointF(rect.right(), 0),
+        }
 
-    def update_text_box_size(self):
-        # Calculate required width/height for text
-        doc = self.text_item.document()
-        doc.setDefaultFont(self.text_item.font())
-        # Try to fit in default width, then max width
-        doc.setTextWidth(self.default_width - 2*self.margin)
-        if doc.idealWidth() < self.max_width - 2*self.margin:
-            width = max(self.default_width, int(doc.idealWidth()) + 2*self.margin)
-            text_width = width - 2*self.margin
-        else:
-            width = self.max_width
-            text_width = width - 2*self.margin
-        self.text_item.setTextWidth(text_width)
-        height = int(doc.size().height()) + 2*self.margin
-        # Update rect
-        self.setRect(-width//2, -height//2, width, height)
-        # Center text
-        self.text_item.setPos(-text_width//2, -doc.size().height()/2)
-        # Move connector buttons
-        self.connector_buttons['left'].setPos(-width//2, 0)
-        self.connector_buttons['right'].setPos(width//2, 0)
-        self.connector_buttons['top'].setPos(0, -height//2)
-        self.connector_buttons['bottom'].setPos(0, height//2)
-
-
-    def install_connector_event_filters(self):
-        for btn in self.connector_buttons.values():
-            btn.installSceneEventFilter(self)
-
-    # --- Connector button event filter ---
-    def sceneEventFilter(self, watched, event):
-        from PySide6.QtCore import QEvent
-        from promptperfector.logic.logger import log_debug
-        if isinstance(watched, QGraphicsEllipseItem):
-            log_debug(f"[ConnectorButton] sceneEventFilter: event={event.type()}, button={getattr(event, 'button', lambda: None)() if hasattr(event, 'button') else None}, node_id={self.node_id}, btn={watched.data(0)}")
-            if event.type() == QEvent.GraphicsSceneMousePress and event.button() == Qt.LeftButton:
-                log_debug(f"[ConnectorButton] MousePress detected on node {self.node_id} btn {watched.data(0)}")
-                if self.canvas_ref:
-                    return self.canvas_ref.handle_connector_button_click(self, watched)
-        return False
+    def handle_at(self, pos):
+        # Name of the shown connector handle under `pos` (item coordinates), if any
+        if not self._handles_visible:
+            return None
+        for name, center in self.handle_centers().items():
+            d = pos - center
+            if d.x() * d.x() + d.y() * d.y() <= HANDLE_RADIUS * HANDLE_RADIUS:
+                return name
+        return None
+
+    def set_active_handle(self, name):
+        self._active_handle = name
+        self.update()
 
     def hoverEnterEvent(self, event):
+        log_debug("[Node %s] hoverEnterEvent", self.node_id)
         self.show_connector_buttons(True)
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event):
+        log_debug("[Node %s] hoverLeaveEvent", self.node_id)
         # Only hide if not in global drag mode
         if not getattr(self.scene(), '_show_all_connectors', False):
             self.show_connector_buttons(False)
         super().hoverLeaveEvent(event)
 
     def show_connector_buttons(self, show):
-        for btn in self.connector_buttons.values():
-            btn.setVisible(show)
+        if show != self._handles_visible:
+            self._handles_visible = show
+            self.update()
 
     def mousePressEvent(self, event):
+        log_debug("[Node %s] mousePressEvent: button=%s, modifiers=%s, pos=%s",
+                  self.node_id, event.button(), event.modifiers(), event.pos())
+        # A press on a connector handle starts or finishes a connector instead of selecting
+        side = self.handle_at(event.pos()) if event.button() == Qt.LeftButton else None
+        if side is not None and self.canvas_ref:
+            self.canvas_ref.handle_connector_button_click(self, side)
+            event.accept()
+            return
         # Only handle selection/movement, not editing
         super().mousePressEvent(event)
 
@@ -262,19 +348,53 @@ class FlowchartNode(QGraphicsRectItem):
             return
         super().mouseDoubleClickEvent(event)
 
-    def get_text(self):
-        return self.text_item.toPlainText()
+    def boundingRect(self):
+        # Handles are centered on the box edges and stick out by their radius
+        return self.rect().adjusted(-HANDLE_RADIUS, -HANDLE_RADIUS, HANDLE_RADIUS, HANDLE_RADIUS)
 
-    def set_text(self, text):
-        self.update_text_item()
-        self.update_text_box_size()
-        # Only autosave if this is a text modification (not node creation)
-        if self.canvas_ref and hasattr(self.canvas_ref, 'on_update') and text.strip():
-            log_info(f"Node text updated: id={self.node_id}, new_text='{text}'")
-            self.canvas_ref.on_update()
+    def shape(self):
+        path = QPainterPath()
+        path.addRect(self.rect())
+        if self._handles_visible:
+            for center in self.handle_centers().values():
+                handle = QPainterPath()
+                handle.addEllipse(center, HANDLE_RADIUS, HANDLE_RADIUS)
+                path = path.united(handle)
+        return path
 
-    def boundingRect(self):
-        return self.rect()
+    def paint(self, painter, option, widget=None):
+        lod = _lod(painter)
+        if lod < LOW_DETAIL_LOD:
+            # Flat box when zoomed far out; selection as a plain outline
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.fillRect(self.rect(), self.brush())
+            if self.isSelected():
+                painter.setPen(QPen(Qt.black, 0))
+                painter.drawRect(self.rect())
+            return
+        painter.setPen(self.pen())
+        painter.setBrush(self.brush())
+        painter.drawRect(self.rect())
+        if self.isSelected():
+            painter.setPen(QPen(Qt.black, 0, Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self.rect())
+        # Text is the most expensive part of a node; it is skipped when too small to read
+        if lod >= LABEL_LOD and self._label is not None:
+            painter.save()
+            painter.translate(self._label_pos)
+            self._label.documentLayout().draw(painter, self.label_context)
+            painter.restore()
+        if self._handles_visible or self._active_handle:
+            painter.setPen(QPen(Qt.black, 1))
+            for name, center in self.handle_centers().items():
+                if name == self._active_handle:
+                    painter.setBrush(HANDLE_ACTIVE_COLOR)
+                elif self._handles_visible:
+                    painter.setBrush(HANDLE_COLOR)
+                else:
+                    continue
+                painter.drawEllipse(center, HANDLE_RADIUS, HANDLE_RADIUS)
 
     def get_position(self):
         return self.scenePos()
@@ -282,136 +402,212 @@ class FlowchartNode(QGraphicsRectItem):
     def set_position(self, pos):
         self.setPos(pos)
 
-    def clip_text(self, text):
-        # Clip text to fit in box, add ellipsis if too long
-        max_chars = 30
-        return text if len(text) <= max_chars else text[:max_chars-3] + '...'
 
-    # contextMenuEvent is defined later in the file; remove this duplicate.
+class _ExportCache:
+    """
+    The canvas as exported node dicts, re-serialized only for nodes marked
+    dirty since the last export. Listens to the canvas graph so edge changes
+    mark both ends. Unchanged nodes keep the same dict between exports, which
+    autosave deltas and version diffs skip by identity; treat them as read-only.
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.graph = canvas.graph
+        self._nodes = {}
+        self._dirty = set(canvas.nodes)
+        self._order = None
+        self.graph.subscribe(self)
+
+    def close(self):
+        self.graph.unsubscribe(self)
+
+    def mark(self, node_id):
+        self._dirty.add(node_id)
+
+    def node_added(self, node_id):
+        self._dirty.add(node_id)
+        self._order = None
+
+    def node_removed(self, node_id):
+        self._nodes.pop(node_id, None)
+        self._dirty.discard(node_id)
+        self._order = None
+
+    def edge_added(self, from_id, to_id):
+        self._dirty.add(from_id)
+        self._dirty.add(to_id)
+
+    edge_removed = edge_added
+
+    def _serialize(self, node_id, node):
+        pos = node.get_position()
+        return {
+            'id': node_id,
+            'subject': node.get_subject(),
+            'text': node.get_text(),
+            'connectsTo': list(self.graph.successors(node_id)) or None,
+            'connectsFrom': list(self.graph.predecessors(node_id)) or None,
+            'pos': [pos.x(), pos.y()]
+        }
+
+    def export(self):
+        nodes = self.canvas.nodes
+        if self._dirty:
+            for node_id in self._dirty:
+                node = nodes.get(node_id)
+                if node is not None:
+                    self._nodes[node_id] = self._serialize(node_id, node)
+            self._dirty.clear()
+            self._order = None
+        if self._order is None:
+            self._order = [self._nodes[node_id] for node_id in nodes]
+        return {'nodes': list(self._order)}
 
 
 class FlowchartCanvas(QGraphicsView):
     # --- Connector creation logic ---
-    def handle_connector_button_click(self, node, btn):
+    def handle_connector_button_click(self, node, side):
         # If not currently dragging, start a new connector
         if not hasattr(self, '_pending_connector') or self._pending_connector is None:
-            self._pending_connector = (node, btn)
-            btn.setBrush(QBrush(QColor("#ffcc00")))  # Highlight active
-            log_debug(f"[Canvas] Started connector from node {node.node_id} side {btn.data(0)}")
+            self._pending_connector = (node, side)
+            node.set_active_handle(side)  # Highlight active
+            log_debug("[Canvas] Started connector from node %s side %s", node.node_id, side)
             return True
         # If already dragging, finish connector if valid
-        start_node, start_btn = self._pending_connector
-        if node is not start_node:
-            # Draw connector
-            start_pos = start_node.scenePos()
-            end_pos = node.scenePos()
-            connector = ArrowLineItem(start_pos.x(), start_pos.y(), end_pos.x(), end_pos.y())
-            connector.setPen(QPen(Qt.black, 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-            connector.from_id = start_node.node_id
-            connector.to_id = node.node_id
-            self.scene().addItem(connector)
-            self.connectors.append((start_node.node_id, node.node_id, connector))
-            log_info(f"Created connector: {start_node.node_id} -> {node.node_id}")
-            if hasattr(self, 'on_update'):
-                self.on_update()
+        start_node, start_side = self._pending_connector
+        if node is not start_node and not self.graph.has_edge(start_node.node_id, node.node_id):
+            self.push_command(AddEdge(start_node.node_id, node.node_id))
+            log_info("Created connector: %s -> %s", start_node.node_id, node.node_id)
         # Reset highlight
-        start_btn.setBrush(QBrush(QColor("#00ccff")))
+        start_node.set_active_handle(None)
         self._pending_connector = None
         return True
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setScene(QGraphicsScene(self))
-        self.setRenderHint(QPainter.Antialiasing)
-        self.setDragMode(QGraphicsView.RubberBandDrag)
-        self.setSceneRect(-2000, -2000, 4000, 4000)
-        self.nodes = {}
-        self.connectors = []
-        self._dragging_connector = None
-        self._drag_start_node = None
-        self._drag_start_btn = None
-        self._node_colors = [QColor("#ffc0cb"), QColor("#ff6666"), QColor("#ffff66")]
-        self._color_idx = 0
-        self.setMouseTracking(True)
-        self.on_update = lambda: None
-    def contextMenuEvent(self, event):
-        item = self.itemAt(event.pos())
-        log_debug(f"[Canvas] contextMenuEvent at {event.pos()} on {type(item).__name__ if item else 'None'}")
-        if isinstance(item, QGraphicsLineItem):
-            menu = QMenu()
-            delete_action = QAction("Delete Connector", menu)
-            menu.addAction(delete_action)
-            action = menu.exec(event.globalPos())
-            if action == delete_action:
-                log_info(f"Deleted connector via context menu: {getattr(item, 'from_id', None)} -> {getattr(item, 'to_id', None)}")
-                self.scene().removeItem(item)
-                # Remove from connectors list
-                self.connectors = [c for c in self.connectors if c[2] is not item]
-            return
-        if isinstance(item, FlowchartNode):
-            log_debug(f"[Canvas] contextMenuEvent: node under mouse (id={getattr(item, 'node_id', None)}), but event not routed to node. Node flags: {item.flags()}")
-            return
-        log_debug("[Canvas] contextMenuEvent: calling super() for empty space or unknown item.")
-        super().contextMenuEvent(event)
     # --- Model/DB sync ---
     def export_to_model(self):
-        # Export nodes and connectors to FlowchartModel JSON
-        log_debug(f"Exporting model: {len(self.connectors)} connectors present.")
-        for idx, (from_id, to_id, _) in enumerate(self.connectors):
-            log_debug(f"Connector {idx}: {from_id} -> {to_id}")
-        nodes = []
-        for node_id, node in self.nodes.items():
-            connectsTo = [to_id for from_id, to_id, _ in self.connectors if from_id == node_id]
-            connectsFrom = [from_id for from_id, to_id, _ in self.connectors if to_id == node_id]
-            pos = node.get_position()
-            nodes.append({
-                'id': node_id,
-                'subject': node.get_subject() if hasattr(node, 'get_subject') else '',
-                'text': node.get_text(),
-                'connectsTo': connectsTo if connectsTo else None,
-                'connectsFrom': connectsFrom if connectsFrom else None,
-                'pos': [pos.x(), pos.y()]
-            })
-        return {'nodes': nodes}
-
-    def import_from_model(self, model_json):
+        # Export nodes and connectors to FlowchartModel JSON; only nodes changed
+        # since the last export are serialized again
+        if self._load is not None:
+            # Mid-load the canvas shows exactly the snapshot being loaded
+            return self._load['model']
+        return self._export.export()
+
+    def mark_dirty(self, node_id):
+        self._export.mark(node_id)
+
+    def import_from_model(self, model_json, progressive=True):
+        """
+        Load a flowchart snapshot. Large charts (more than PROGRESSIVE_MIN_NODES
+        nodes, unless `progressive` is False) are built over several event loop
+        ticks, nearest the middle of the view first; loading another snapshot
+        cancels a load in progress.
+        """
+        self._stop_load()
+        self.cancel_layout()
         # Clear scene
         self.scene().clear()
         self.nodes = {}
-        self.connectors = []
+        self.connectors = {}
+        self._incident = {}
+        self._moved_nodes = set()
+        self._cyclic_edges = set()
+        self._diff_items = []
+        self._diff_pens = {}
+        self.analysis.close()
+        self._export.close()
         nodes = model_json.get('nodes', [])
-        log_debug(f"Importing model: {len(nodes)} nodes")
-        # Add nodes
+        log_debug("Importing model: %d nodes", len(nodes))
+        # Structure first: the graph and its analysis don't need scene items,
+        # and connectors pick their cycle colour as they are created
+        # Edges keep the order of each node's connectsTo/connectsFrom, so an
+        # unchanged chart exports exactly as it was stored
+        graph_nodes = {}
         for n in nodes:
-            pos = QPointF(*(n.get('pos', [0, 0])))
-            subject = n.get('subject', '')
-            text = n.get('text', '')
-            # Backward compatibility: if subject is missing or empty, use text as subject for display
-            color = QColor("#ffc0cb")
-            node = FlowchartNode(text, n['id'], pos, color, subject=subject)
+            if n['id'] not in graph_nodes:
+                graph_nodes[n['id']] = Node('', node_id=n['id'], connectsTo=n.get('connectsTo'),
+                                            connectsFrom=n.get('connectsFrom'))
+                self._note_node_id(n['id'])
+        self.graph = FlowchartModel(graph_nodes.values())
+        self.analysis = GraphAnalysis(self.graph)
+        self.refresh_analysis()
+        # A loaded version starts a fresh history
+        self.undo_stack.reset()
+        self._load = {'model': model_json, 'order': nodes, 'index': 0}
+        if not progressive or len(nodes) <= PROGRESSIVE_MIN_NODES:
+            self._load_step(None)
+            self.fit_to_view()
+            return
+        # Fit to where the nodes will be, then build outwards from the middle
+        xs = [(n.get('pos') or [0, 0])[0] for n in nodes]
+        ys = [(n.get('pos') or [0, 0])[1] for n in nodes]
+        self.fitInView(QRectF(min(xs) - 120, min(ys) - 60, max(xs) - min(xs) + 240, max(ys) - min(ys) + 120),
+                       Qt.KeepAspectRatio)
+        center = self.mapToScene(self.viewport().rect().center())
+        cx, cy = center.x(), center.y()
+        self._load['order'] = sorted(nodes, key=lambda n: ((n.get('pos') or [0, 0])[0] - cx) ** 2
+                                                         + ((n.get('pos') or [0, 0])[1] - cy) ** 2)
+        # Items are indexed once at the end instead of one by one
+        self.scene().setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.setInteractive(False)
+        self._load_timer.start()
+
+    def is_loading(self):
+        return self._load is not None
+
+    def finish_load(self):
+        """Build whatever a progressive load hasn't built yet, now."""
+        if self._load is not None:
+            self._load_step(None)
+
+    def _load_step(self, budget_ms=LOAD_BATCH_MS):
+        load = self._load
+        order = load['order']
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+        while load['index'] < len(order):
+            n = order[load['index']]
+            load['index'] += 1
+            node_id = n['id']
+            if node_id in self.nodes:
+                continue
+            pos = QPointF(*(n.get('pos') or [0, 0]))
+            # Backward compatibility: if subject is missing or empty, text is shown instead
+            node = FlowchartNode(n.get('text', ''), node_id, pos, QColor("#ffc0cb"), subject=n.get('subject', ''))
             node.setAcceptHoverEvents(True)
             node.canvas_ref = self
             self.scene().addItem(node)
-            node.install_connector_event_filters()
-            self.nodes[n['id']] = node
-        # Add connectors
-        for n in nodes:
-            from_node = self.nodes[n['id']]
-            for to_id in n.get('connectsTo') or []:
+            self.nodes[node_id] = node
+            # Each connector is created along with the later of its two nodes
+            for to_id in self.graph.successors(node_id):
                 if to_id in self.nodes:
-                    to_node = self.nodes[to_id]
-                    start = from_node.scenePos()
-                    end = to_node.scenePos()
-                    connector = ArrowLineItem(start.x(), start.y(), end.x(), end.y())
-                    connector.setPen(QPen(Qt.black, 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
-                    connector.from_id = from_node.node_id
-                    connector.to_id = to_node.node_id
-                    self.scene().addItem(connector)
-                    self.connectors.append((from_node.node_id, to_node.node_id, connector))
-                    log_info(f"Imported connector: {from_node.node_id} -> {to_node.node_id}")
+                    self._add_connector_item(node_id, to_id)
+            for from_id in self.graph.predecessors(node_id):
+                if from_id in self.nodes and from_id != node_id:
+                    self._add_connector_item(from_id, node_id)
+            if deadline is not None and load['index'] % 32 == 0 and time.perf_counter() > deadline:
+                break
+        self.on_load_progress(load['index'], len(order))
+        if load['index'] < len(order):
+            self._load_timer.start()
+            return
+        self._stop_load()
+        self._export = _ExportCache(self)
+        log_info("Imported %s nodes and %s connectors", len(self.nodes), len(self.connectors))
+
+    def _stop_load(self):
+        if self._load is None:
+            return
+        if self._load['index'] < len(self._load['order']):
+            log_info("Cancelled import after %s of %s nodes", self._load['index'], len(self._load['order']))
+        self._load = None
+        self._load_timer.stop()
+        self.scene().setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.setInteractive(True)
+
+    def fit_to_view(self):
         # Fit view to all items if any exist
         items_rect = self.scene().itemsBoundingRect()
         if not items_rect.isNull():
             self.fitInView(items_rect, Qt.KeepAspectRatio)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setScene(QGraphicsScene(self))
@@ -419,79 +615,456 @@ class FlowchartCanvas(QGraphicsView):
         self.setDragMode(QGraphicsView.RubberBandDrag)
         self.setSceneRect(-2000, -2000, 4000, 4000)
         self.nodes = {}
-        self.connectors = []
+        # connector item -> (from_id, to_id, item), and node id -> its entries
+        self.connectors = {}
+        self._incident = {}
         self._dragging_connector = None
         self._drag_start_node = None
         self._node_colors = [QColor("#ffc0cb"), QColor("#ff6666"), QColor("#ffff66")]
         self._color_idx = 0
+        # Highest N of any node_N id seen, so new ids never reuse one
+        self._last_node_index = 0
+        # Structure-only mirror of the canvas, kept analysed incrementally
+        self.graph = FlowchartModel()
+        self.analysis = GraphAnalysis(self.graph)
+        self._export = _ExportCache(self)
+        self._cyclic_edges = set()
+        self.on_analysis = lambda analysis: None
+        # Version comparison overlay: ghost items for removed nodes/edges and the
+        # original pens of highlighted items
+        self._diff_items = []
+        self._diff_pens = {}
+        # Undo/redo history; node positions are captured on press to record moves
+        self.undo_stack = UndoStack()
+        self._press_positions = None
+        self.on_update = lambda: None
+        # Nodes moved since the last frame whose connectors need new geometry
+        self._moved_nodes = set()
+        self._geometry_timer = QTimer(self)
+        self._geometry_timer.setSingleShot(True)
+        self._geometry_timer.setInterval(FRAME_INTERVAL_MS)
+        self._geometry_timer.timeout.connect(self.update_connector_geometry)
+        # Progressive import state (see import_from_model)
+        self._load = None
+        self._load_timer = QTimer(self)
+        self._load_timer.setSingleShot(True)
+        self._load_timer.setInterval(0)
+        self._load_timer.timeout.connect(self._load_step)
+        self.on_load_progress = lambda done, total: None
+        # Auto layout running in a worker process (see auto_layout)
+        self._layout = None
+        self._layout_timer = QTimer(self)
+        self._layout_timer.setInterval(LAYOUT_TICK_MS)
+        self._layout_timer.timeout.connect(self._layout_tick)
+        # Frame time counter drawn over the canvas (see set_show_fps)
+        self.show_fps = False
+        self._frame_times = deque(maxlen=30)
+
+    # --- Frame time counter ---
+    def set_show_fps(self, show):
+        # Measured frames repaint the whole viewport, so the overlay stays current
+        self.show_fps = show
+        self._frame_times.clear()
+        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate if show else QGraphicsView.MinimalViewportUpdate)
+        self.viewport().update()
+
+    def frame_time_ms(self):
+        """Average time of the last painted frames, in milliseconds (0 if none)."""
+        if not self._frame_times:
+            return 0.0
+        return 1000 * sum(self._frame_times) / len(self._frame_times)
+
+    def paintEvent(self, event):
+        if not self.show_fps:
+            super().paintEvent(event)
+            return
+        t0 = time.perf_counter()
+        super().paintEvent(event)
+        self._frame_times.append(time.perf_counter() - t0)
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        if not self.show_fps:
+            return
+        # The overlay shows the frames before this one
+        frame_ms = self.frame_time_ms()
+        painter.save()
+        painter.resetTransform()
+        painter.setPen(QColor("#cc0000") if frame_ms > TARGET_FRAME_MS else QColor("#2e9d3a"))
+        painter.setFont(QFont("Arial", 10))
+        fps = 1000 / frame_ms if frame_ms else 0
+        painter.drawText(8, 18, f"{frame_ms:.1f} ms/frame ({fps:.0f} fps, target {TARGET_FRAME_MS} ms)")
+        painter.restore()
+
+    # --- Connector index ---
+    def connectors_of(self, node_id):
+        """Connector entries (from_id, to_id, item) attached to a node."""
+        return self._incident.get(node_id, ())
+
+    def _add_connector_item(self, from_id, to_id):
+        start = self.nodes[from_id].scenePos()
+        end = self.nodes[to_id].scenePos()
+        connector = ArrowLineItem(start.x(), start.y(), end.x(), end.y())
+        color = CYCLE_COLOR if (from_id, to_id) in self._cyclic_edges else CONNECTOR_COLOR
+        connector.setPen(QPen(color, 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        connector.from_id = from_id
+        connector.to_id = to_id
+        self.scene().addItem(connector)
+        entry = (from_id, to_id, connector)
+        self.connectors[connector] = entry
+        self._incident.setdefault(from_id, []).append(entry)
+        if to_id != from_id:
+            self._incident.setdefault(to_id, []).append(entry)
+        return connector
+
+    def _remove_connector_item(self, entry):
+        from_id, to_id, connector = entry
+        if self.connectors.pop(connector, None) is None:
+            return
+        for node_id in {from_id, to_id}:
+            incident = self._incident.get(node_id)
+            if incident is not None:
+                incident.remove(entry)
+                if not incident:
+                    del self._incident[node_id]
+        if connector.scene() is self.scene():
+            self.scene().removeItem(connector)
+
+    def node_moved(self, node_id):
+        self.mark_dirty(node_id)
+        self._moved_nodes.add(node_id)
+        if not self._geometry_timer.isActive():
+            self._geometry_timer.start()
+
+    def update_connector_geometry(self):
+        """Redraw the connectors of nodes moved since the last frame, each once."""
+        moved, self._moved_nodes = self._moved_nodes, set()
+        done = set()
+        for node_id in moved:
+            for from_id, to_id, connector in self.connectors_of(node_id):
+                if connector in done:
+                    continue
+                done.add(connector)
+                start = self.nodes[from_id].scenePos()
+                end = self.nodes[to_id].scenePos()
+                connector.setLine(start.x(), start.y(), end.x(), end.y())
+
+    # --- Graph analysis ---
+    def add_graph_node(self, node_id):
+        if node_id not in self.graph:
+            self.graph.add_node('', node_id=node_id)
+
+    def remove_graph_node(self, node_id):
+        if node_id in self.graph:
+            self.graph.remove_node(node_id)
+
+    def remove_graph_edge(self, from_id, to_id):
+        # Duplicate connectors share one edge; keep it while any of them remains
+        if any(t == to_id for f, t, _ in self.connectors_of(from_id) if f == from_id):
+            return
+        self.graph.remove_edge(from_id, to_id)
+
+    # --- Undo/redo ---
+    def push_command(self, command):
+        """Apply a user edit to the canvas and record it for undo."""
+        self.finish_load()
+        self.undo_stack.push(command, self)
+        self.refresh_analysis()
+        self.on_update()
+
+    def undo(self):
+        if self.undo_stack.undo(self) is not None:
+            log_info("Undo: %s", self.undo_stack.redo_label())
+            self.refresh_analysis()
+            self.on_update()
+
+    def redo(self):
+        if self.undo_stack.redo(self) is not None:
+            log_info("Redo: %s", self.undo_stack.undo_label())
+            self.refresh_analysis()
+            self.on_update()
+
+    def _note_node_id(self, node_id):
+        prefix, _, index = node_id.partition('_')
+        if prefix == 'node' and index.isdigit():
+            self._last_node_index = max(self._last_node_index, int(index))
+
+    def _new_node_id(self):
+        # Ids of deleted nodes may still be referenced by the undo history, cycle
+        # warnings or a comparison, so the counter only goes up
+        self._last_node_index += 1
+        return f"node_{self._last_node_index}"
+
+    def _next_color(self):
+        color = self._node_colors[self._color_idx % len(self._node_colors)]
+        self._color_idx += 1
+        return color
+
+    def add_node(self, subject, text, pos, color=None):
+        node_id = self._new_node_id()
+        color = color or self._next_color()
+        self.push_command(AddNode(node_id, subject, text, (pos.x(), pos.y()), color.name()))
+        return node_id
+
+    def remove_node(self, node_id):
+        node = self.nodes.get(node_id)
+        if node is None:
+            return
+        edges = [(node_id, to_id) for to_id in self.graph.successors(node_id)]
+        edges += [(from_id, node_id) for from_id in self.graph.predecessors(node_id) if from_id != node_id]
+        pos = node.get_position()
+        log_info("Deleting node: id=%s", node_id)
+        self.push_command(remove_node_commands(node_id, node.get_subject(), node.text, (pos.x(), pos.y()),
+                                               edges, node.brush().color().name()))
+
+    def edit_node(self, node_id, subject, text):
+        node = self.nodes.get(node_id)
+        if node is None or (node.subject == subject and node.text == text):
+            return
+        log_info("Node edited: id=%s, subject=%r, text=%r", node_id, subject, text)
+        self.push_command(EditNode(node_id, node.subject, node.text, subject, text))
+
+    # Command targets (see logic/undo.py); these change the scene without recording history
+    def create_node(self, node_id, subject, text, pos, color=None):
+        node = FlowchartNode(text, node_id, QPointF(*pos), QColor(color) if color else self._next_color(), subject=subject)
+        node.setAcceptHoverEvents(True)
+        self.scene().addItem(node)
+        node.canvas_ref = self
+        self.nodes[node_id] = node
+        self.add_graph_node(node_id)
+        self._note_node_id(node_id)
+
+    def delete_node(self, node_id):
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            return
+        for entry in list(self.connectors_of(node_id)):
+            self._remove_connector_item(entry)
+        self._moved_nodes.discard(node_id)
+        self.remove_graph_node(node_id)
+        self.scene().removeItem(node)
+
+    def move_node(self, node_id, pos):
+        node = self.nodes.get(node_id)
+        if node is not None:
+            node.set_position(QPointF(*pos))
+
+    def set_node_content(self, node_id, subject, text):
+        node = self.nodes.get(node_id)
+        if node is not None:
+            node.subject = subject
+            node.text = text
+            node.update_text_item()
+            self.mark_dirty(node_id)
+
+    def add_connector(self, from_id, to_id):
+        self._add_connector_item(from_id, to_id)
+        self.graph.add_edge(from_id, to_id)
+
+    def remove_connector(self, from_id, to_id):
+        for entry in self.connectors_of(from_id):
+            if entry[0] == from_id and entry[1] == to_id:
+                self._remove_connector_item(entry)
+                break
+        self.remove_graph_edge(from_id, to_id)
+
+    def mousePressEvent(self, event):
+        super().mousePressEvent(event)
+        if event.button() == Qt.LeftButton:
+            self._press_positions = {item.node_id: item.scenePos() for item in self.scene().selectedItems()
+                                     if isinstance(item, FlowchartNode)}
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        pressed, self._press_positions = self._press_positions, None
+        if event.button() != Qt.LeftButton or not pressed:
+            return
+        moves = []
+        for node_id, old in pressed.items():
+            node = self.nodes.get(node_id)
+            if node is not None and node.scenePos() != old:
+                new = node.scenePos()
+                moves.append(MoveNode(node_id, (old.x(), old.y()), (new.x(), new.y())))
+        if moves:
+            # The nodes are already where the user dropped them; only record the move
+            self.undo_stack.push(CommandGroup(moves, 'Move Node'))
+            self.on_update()
+
+    # --- Version comparison ---
+    def show_diff(self, diff, old_flowchart):
+        """Highlight a FlowchartDiff from `old_flowchart` to what is on the canvas."""
+        self.finish_load()
+        self.clear_diff()
+        marks = {}
+        for kind in ('moved', 'edited', 'added'):
+            for node_id in getattr(diff, kind):
+                marks[node_id] = kind
+        for node_id, kind in marks.items():
+            node = self.nodes.get(node_id)
+            if node is not None and node.scene() is self.scene():
+                self._diff_pens.setdefault(node, node.pen())
+                node.setPen(QPen(DIFF_COLORS[kind], 3))
+        for from_id, to_id in diff.added_edges:
+            for f, t, connector in self.connectors_of(from_id):
+                if f != from_id or t != to_id:
+                    continue
+                self._diff_pens.setdefault(connector, connector.pen())
+                pen = connector.pen()
+                pen.setColor(DIFF_COLORS['added'])
+                connector.setPen(pen)
+        # Removed nodes and edges are drawn as dashed ghosts where they used to be
+        old_nodes = {n['id']: n for n in old_flowchart.get('nodes') or []}
+        ghost_pen = QPen(DIFF_COLORS['removed'], 2, Qt.DashLine)
+        def old_pos(node_id):
+            pos = old_nodes[node_id].get('pos') or [0, 0]
+            return QPointF(*pos)
+        for node_id in diff.removed:
+            pos = old_pos(node_id)
+            ghost = QGraphicsRectItem(-60, -30, 120, 60)
+            ghost.setPos(pos)
+            ghost.setPen(ghost_pen)
+            ghost.setZValue(-2)
+            ghost.setToolTip(f"Removed: {old_nodes[node_id].get('subject') or old_nodes[node_id].get('text', '')}")
+            self.scene().addItem(ghost)
+            self._diff_items.append(ghost)
+        for from_id, to_id in diff.removed_edges:
+            start = self.nodes[from_id].scenePos() if from_id in self.nodes and from_id not in diff.removed else old_pos(from_id)
+            end = self.nodes[to_id].scenePos() if to_id in self.nodes and to_id not in diff.removed else old_pos(to_id)
+            ghost = QGraphicsLineItem(start.x(), start.y(), end.x(), end.y())
+            ghost.setPen(ghost_pen)
+            ghost.setZValue(-2)
+            self.scene().addItem(ghost)
+            self._diff_items.append(ghost)
+
+    def clear_diff(self):
+        for item, pen in self._diff_pens.items():
+            if item.scene() is self.scene():
+                if isinstance(item, ArrowLineItem):
+                    # Cycle colouring may have changed while the comparison was shown
+                    pen.setColor(CYCLE_COLOR if (item.from_id, item.to_id) in self._cyclic_edges else CONNECTOR_COLOR)
+                item.setPen(pen)
+        self._diff_pens = {}
+        for item in self._diff_items:
+            if item.scene() is self.scene():
+                self.scene().removeItem(item)
+        self._diff_items = []
+
+    def refresh_analysis(self):
+        # Recolour connectors only when the set of edges on cycles changes
+        cyclic = self.analysis.cyclic_edges() if self.analysis.has_cycles() else set()
+        if cyclic != self._cyclic_edges:
+            changed = cyclic ^ self._cyclic_edges
+            for from_id, to_id in changed:
+                for f, t, connector in self.connectors_of(from_id):
+                    if f == from_id and t == to_id:
+                        pen = connector.pen()
+                        pen.setColor(CYCLE_COLOR if (from_id, to_id) in cyclic else CONNECTOR_COLOR)
+                        connector.setPen(pen)
+            self._cyclic_edges = cyclic
+        self.on_analysis(self.analysis)
 
     def mouseDoubleClickEvent(self, event):
         # Only create node if double-clicked on empty canvas
         item = self.itemAt(event.pos())
         if item is None:
             pos = self.mapToScene(event.pos())
-            node_id = f"node_{len(self.nodes)+1}"
-            color = self._node_colors[self._color_idx % len(self._node_colors)]
-            self._color_idx += 1
-            node = FlowchartNode("Editable text box", node_id, pos, color)
-            node.setAcceptHoverEvents(True)
-            node.canvas_ref = self
-            self.scene().addItem(node)
-            node.install_connector_event_filters()
-            self.nodes[node_id] = node
-            log_info(f"User double-clicked to create node: id={node_id}, pos=({pos.x()}, {pos.y()})")
+            node_id = self.add_node('', "Editable text box", pos)
+            log_info("User double-clicked to create node: id=%s, pos=(%s, %s)", node_id, pos.x(), pos.y())
         super().mouseDoubleClickEvent(event)
 
-    def mouseDoubleClickEventFake(self, text):
-        # Add a node with custom text (for LLM simulation)
-        pos = QPointF(0, 0)
-        node_id = f"node_{len(self.nodes)+1}"
-        color = self._node_colors[self._color_idx % len(self._node_colors)]
-        self._color_idx += 1
-        node = FlowchartNode(text, node_id, pos, color)
-        self.scene().addItem(node)
-        node.install_connector_event_filters()
-        self.nodes[node_id] = node
-
     def contextMenuEvent(self, event):
         item = self.itemAt(event.pos())
-        log_debug(f"[Canvas] contextMenuEvent at {event.pos()} on {type(item).__name__ if item else 'None'}")
-        # Handle connector context menu
-        if isinstance(item, QGraphicsLineItem):
+        log_debug("[Canvas] contextMenuEvent at %s on %s", event.pos(), type(item).__name__ if item else 'None')
+        # Handle connector context menu; comparison ghosts are plain lines and not connectors
+        if isinstance(item, ArrowLineItem) and item in self.connectors:
             menu = QMenu()
             delete_action = QAction("Delete Connector", menu)
             menu.addAction(delete_action)
             action = menu.exec(event.globalPos())
             if action == delete_action:
-                log_info(f"Deleted connector via context menu: {getattr(item, 'from_id', None)} -> {getattr(item, 'to_id', None)}")
-                self.scene().removeItem(item)
-                self.connectors = [c for c in self.connectors if c[2] is not item]
-                log_debug(f"After deletion, {len(self.connectors)} connectors remain.")
-                log_debug(f"calling debug on self: {self}")
-                if hasattr(self, 'on_update'):
-                    log_debug("Calling on_update after connector deletion.")
-                    self.on_update()
+                log_info("Deleted connector via context menu: %s -> %s", item.from_id, item.to_id)
+                self.push_command(RemoveEdge(item.from_id, item.to_id))
+                log_debug("After deletion, %d connectors remain.", len(self.connectors))
             return
-        # If right-clicked on a node, let the node handle its own context menu event
+        # If right-clicked on a node (or one of its connector handles), the scene
+        # passes the event on to the node's own context menu
         if isinstance(item, FlowchartNode):
-            log_debug(f"[Canvas] contextMenuEvent: node under mouse (id={getattr(item, 'node_id', None)}), event not handled by canvas.")
-            return
-        # If right-clicked on a connector button, let the parent node handle it
-        if isinstance(item, QGraphicsEllipseItem) and item.parentItem() and isinstance(item.parentItem(), FlowchartNode):
-            log_debug(f"[Canvas] contextMenuEvent: connector button under mouse for node id={getattr(item.parentItem(), 'node_id', None)}, event not handled by canvas.")
-            return
+            log_debug("[Canvas] contextMenuEvent: node under mouse (id=%s), passed to the node.", item.node_id)
         # Otherwise, propagate to default (empty space)
         log_debug("[Canvas] contextMenuEvent: calling super() for empty space or unknown item.")
         super().contextMenuEvent(event)
 
-    # mouseMoveEvent and mouseReleaseEvent are no longer needed for connector creation
-    
     def mouseDoubleClickEventFake(self, text):
-        # Add a node with custom text (for LLM simulation)
-        pos = QPointF(0, 0)
-        node_id = f"node_{len(self.nodes)+1}"
-        color = self._node_colors[self._color_idx % len(self._node_colors)]
-        self._color_idx += 1
-        node = FlowchartNode(text, node_id, pos, color)
-        self.scene().addItem(node)
-        self.nodes[node_id] = node
\ No newline at end of file
+        # Add a node with custom text (for LLM simulation), in a free spot below the chart
+        positions = [(n.scenePos().x(), n.scenePos().y()) for n in self.nodes.values()]
+        self.add_node('', text, QPointF(*free_position(positions)))
+
+    # --- Auto layout ---
+    def auto_layout(self, method='layered', around=None):
+        """
+        Lay the chart out in a worker process ('layered', 'force', or
+        'incremental' to only move the nodes near the ids in `around`). Nodes
+        glide to the positions streamed back; the whole move is one undo step.
+        """
+        self.finish_load()
+        self.cancel_layout()
+        if not self.nodes:
+            return
+        node_ids = list(self.nodes)
+        start = [(self.nodes[i].scenePos().x(), self.nodes[i].scenePos().y()) for i in node_ids]
+        job = LayoutJob(method, node_ids, list(self.graph.edges()), start, around).start()
+        self._layout = {'job': job, 'nodes': node_ids, 'start': start, 'targets': None}
+        self._layout_timer.start()
+        log_info("Started %s layout of %s nodes", method, len(node_ids))
+
+    def is_laying_out(self):
+        return self._layout is not None
+
+    def cancel_layout(self):
+        if self._layout is None:
+            return
+        self._layout['job'].cancel()
+        self._layout = None
+        self._layout_timer.stop()
+
+    def _layout_tick(self):
+        layout = self._layout
+        job = layout['job']
+        for kind, payload, fraction in job.poll():
+            if kind == 'error':
+                log_error("Layout failed: %s", payload)
+                self._layout = None
+                self._layout_timer.stop()
+                return
+            layout['targets'] = payload
+        targets = layout['targets']
+        if targets is None:
+            return
+        settled = True
+        for node_id, (x, y) in zip(layout['nodes'], targets):
+            node = self.nodes.get(node_id)
+            if node is None:
+                continue
+            pos = node.scenePos()
+            dx, dy = x - pos.x(), y - pos.y()
+            if abs(dx) > 1 or abs(dy) > 1:
+                settled = False
+                node.set_position(QPointF(pos.x() + dx * LAYOUT_EASE, pos.y() + dy * LAYOUT_EASE))
+            elif dx or dy:
+                node.set_position(QPointF(x, y))
+        if not (settled and job.finished):
+            return
+        self._layout = None
+        self._layout_timer.stop()
+        # The nodes are already in place; record the whole layout as one move
+        moves = []
+        for node_id, old in zip(layout['nodes'], layout['start']):
+            node = self.nodes.get(node_id)
+            if node is not None:
+                new = (node.scenePos().x(), node.scenePos().y())
+                if new != old:
+                    moves.append(MoveNode(node_id, old, new))
+        log_info("Layout finished: %s nodes moved", len(moves))
+        if moves:
+            self.undo_stack.push(CommandGroup(moves, 'Auto Layout'))
+            self.on_update()
\ No newline at end of file
@@ -1,16 +1,19 @@
 from PySide6.QtCore import QThread, Signal, QObject
 
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLabel, QTextEdit, QHBoxLayout, QMenuBar, QMenu, QComboBox
-from PySide6.QtGui import QAction
+from PySide6.QtGui import QAction, QKeySequence
 from PySide6.QtCore import Signal
 
 from .flowchart_canvas import FlowchartCanvas
+from .minimap import Minimap
 from ..logic.flowchart import FlowchartModel
 from ..logic import db
-from promptperfector.logic.logger import log_info, log_debug
+from ..logic.version_cache import VersionCache
+from ..logic.diff import diff_flowcharts
+from promptperfector.logic.logger import log_info, log_debug, is_enabled, DEBUG
 
 import functools
-from PySide6.QtWidgets import QSplitter, QPlainTextEdit, QToolButton, QSizePolicy, QStyle
+from PySide6.QtWidgets import QSplitter, QPlainTextEdit, QToolButton, QSizePolicy, QStyle, QProgressBar
 from PySide6.QtCore import Qt, QTimer
 
 class FlowchartWidget(QWidget):
@@ -23,23 +26,46 @@ class FlowchartWidget(QWidget):
         def run(self):
             from promptperfector.logic.logger import log_debug
             try:
-                log_debug(f"LLMWorker: Running prompt on model: {getattr(self.llm_runner, 'model_path', None)}")
-                log_debug(f"LLMWorker: Prompt: {self.prompt!r}")
+                log_debug("LLMWorker: Running prompt on model: %s", getattr(self.llm_runner, 'model_path', None))
+                log_debug("LLMWorker: Prompt: %r", self.prompt)
                 output = self.llm_runner.prompt(self.prompt)
                 self.finished.emit(output, None)
             except Exception as e:
-                log_debug(f"LLMWorker: Exception: {e}")
+                log_debug("LLMWorker: Exception: %s", e)
                 self.finished.emit('', e)
     goto_final_prompt = Signal()
     switch_project = Signal()
     new_project = Signal()
-
-    def __init__(self, model, project_id, parent=None):
-        log_info(f"Opening project: {project_id}")
+    # Emitted (via a queued connection) when the autosave writer has committed a version
+    version_saved = Signal(int)
+
+    # Edits arriving within this window are coalesced into one autosave
+    AUTOSAVE_DELAY_MS = 500
+    # Versions fetched per page of the version dropdown
+    VERSION_PAGE_SIZE = 10
+    # itemData of the trailing "load older" entry in the version dropdown
+    LOAD_OLDER_VERSIONS = 'load-older'
+
+    def __init__(self, model, project_id, autosaver, parent=None, autosave_delay_ms=None):
+        log_info("Opening project: %s", project_id)
         super().__init__(parent)
         self.model = model
         self.project_id = project_id
 
+        # Write-behind autosave: edits restart the debounce timer, the snapshot is
+        # taken once when it fires and committed on the writer thread of
+        # `autosaver`, an AutosaveQueue owned (and closed) by the caller
+        self.autosaver = autosaver
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(self.AUTOSAVE_DELAY_MS if autosave_delay_ms is None else autosave_delay_ms)
+        self._autosave_timer.timeout.connect(self._commit_pending_update)
+        self.version_saved.connect(self.on_version_saved)
+        # Decoded versions for the version dropdown, so scrubbing history stays in memory
+        self.version_cache = VersionCache()
+        self._version_count = 0
+        self._selected_version_idx = 0
+
         # LLM runner state
         self.llm_runner = None
         self.current_model_path = None
@@ -64,9 +90,43 @@ class FlowchartWidget(QWidget):
         file_menu.addAction(switch_action)
         file_menu.addAction(new_action)
         self.menu_bar.addMenu(file_menu)
+        edit_menu = QMenu("Edit", self.menu_bar)
+        undo_action = QAction("Undo", self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        redo_action = QAction("Redo", self)
+        redo_action.setShortcut(QKeySequence.Redo)
+        edit_menu.addAction(undo_action)
+        edit_menu.addAction(redo_action)
+        self.menu_bar.addMenu(edit_menu)
+        view_menu = QMenu("View", self.menu_bar)
+        fit_action = QAction("Fit to View", self)
+        fps_action = QAction("Show Frame Time", self)
+        fps_action.setCheckable(True)
+        minimap_action = QAction("Show Minimap", self)
+        minimap_action.setCheckable(True)
+        minimap_action.setChecked(True)
+        view_menu.addAction(fit_action)
+        view_menu.addAction(fps_action)
+        view_menu.addAction(minimap_action)
+        view_menu.addSeparator()
+        layered_action = QAction("Auto Layout (Layered)", self)
+        force_action = QAction("Auto Layout (Force-directed)", self)
+        tidy_action = QAction("Tidy Around Selection", self)
+        view_menu.addAction(layered_action)
+        view_menu.addAction(force_action)
+        view_menu.addAction(tidy_action)
+        self.menu_bar.addMenu(view_menu)
         self.left_layout.setMenuBar(self.menu_bar)
         switch_action.triggered.connect(self.switch_project.emit)
         new_action.triggered.connect(self.new_project.emit)
+        undo_action.triggered.connect(lambda: self.canvas.undo())
+        redo_action.triggered.connect(lambda: self.canvas.redo())
+        fit_action.triggered.connect(lambda: self.canvas.fit_to_view())
+        fps_action.toggled.connect(lambda checked: self.canvas.set_show_fps(checked))
+        minimap_action.toggled.connect(lambda checked: self.minimap.setVisible(checked))
+        layered_action.triggered.connect(lambda: self.canvas.auto_layout('layered'))
+        force_action.triggered.connect(lambda: self.canvas.auto_layout('force'))
+        tidy_action.triggered.connect(self.tidy_selection)
 
         # Version and Model dropdowns (top right)
         version_layout = QHBoxLayout()
@@ -82,6 +142,17 @@ class FlowchartWidget(QWidget):
         self.version_dropdown.currentIndexChanged.connect(self.on_version_changed)
         version_layout.addWidget(QLabel("Version:"))
         version_layout.addWidget(self.version_dropdown)
+        self.name_version_btn = QToolButton()
+        self.name_version_btn.setText("Name...")
+        self.name_version_btn.setToolTip("Name the selected version (named versions are never thinned)")
+        self.name_version_btn.clicked.connect(self.name_current_version)
+        version_layout.addWidget(self.name_version_btn)
+        self.compare_btn = QToolButton()
+        self.compare_btn.setText("Compare...")
+        self.compare_btn.setToolTip("Highlight what changed on the canvas since another version")
+        self.compare_btn.setCheckable(True)
+        self.compare_btn.clicked.connect(self.toggle_compare)
+        version_layout.addWidget(self.compare_btn)
         self.left_layout.addLayout(version_layout)
         self.refresh_models()
         self.refresh_versions()
@@ -98,12 +169,33 @@ class FlowchartWidget(QWidget):
         self.toggle_json_btn.setChecked(False)
         self.toggle_json_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.toggle_json_btn.clicked.connect(self.toggle_json_box)
+        # Live structure warnings (cycles, unreachable nodes) from the canvas analysis
+        self.analysis_label = QLabel()
+        self.analysis_label.setStyleSheet("color: #cc0000;")
+        self.analysis_label.setVisible(False)
         btn_row = QHBoxLayout()
+        btn_row.addWidget(self.analysis_label)
+        self.compare_label = QLabel()
+        self.compare_label.setVisible(False)
+        btn_row.addWidget(self.compare_label)
         btn_row.addStretch()
+        # Progress of a large import being built in the background
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(160)
+        self.load_progress.setFormat("Loading %p%")
+        self.load_progress.setVisible(False)
+        btn_row.addWidget(self.load_progress)
         btn_row.addWidget(self.toggle_json_btn)
         canvas_layout.addLayout(btn_row)
         self.canvas = FlowchartCanvas()
-        canvas_layout.addWidget(self.canvas, stretch=5)
+        self.canvas.on_analysis = self._update_analysis_warning
+        self.canvas.on_load_progress = self._update_load_progress
+        # Overview of the whole chart next to the canvas, for navigating large flows
+        self.minimap = Minimap(self.canvas)
+        canvas_row = QHBoxLayout()
+        canvas_row.addWidget(self.canvas, stretch=1)
+        canvas_row.addWidget(self.minimap, alignment=Qt.AlignTop)
+        canvas_layout.addLayout(canvas_row, stretch=5)
         self.left_layout.addWidget(canvas_container)
 
         
@@ -157,15 +249,16 @@ class FlowchartWidget(QWidget):
         # Load latest version from DB if available, else use provided model
         latest = db.get_latest_flowchart(self.project_id)
         if latest:
-            log_info(f"Loaded latest flowchart from DB for project {self.project_id} on first render.")
+            log_info("Loaded latest flowchart from DB for project %s on first render.", self.project_id)
             self.canvas.import_from_model(latest)
         else:
-            log_info(f"No flowchart found in DB for project {self.project_id}, using provided model.")
+            log_info("No flowchart found in DB for project %s, using provided model.", self.project_id)
             self.canvas.import_from_model(self.model.to_json())
 
-        # Connect autosave hooks
+        # Connect autosave hooks; opening a project only saves when it has no version yet
         self.canvas.on_update = self._on_flowchart_update
-        self._on_flowchart_update()
+        if not latest:
+            self._on_flowchart_update()
 
     def refresh_models(self):
         """Scan models/ for subfolders with .gguf files and populate the model dropdown."""
@@ -195,24 +288,24 @@ class FlowchartWidget(QWidget):
             try:
                 self.llm_runner.stop()
             except Exception as e:
-                log_info(f"Error stopping previous LLM runner: {e}")
+                log_info("Error stopping previous LLM runner: %s", e)
         # Start new runner
         try:
             from promptperfector.logic.llm.llm_runner import LlamaCppRunner
             self.llm_runner = LlamaCppRunner(model_path)
             self.llm_runner.start()
             self.current_model_path = model_path
-            log_info(f"Started LLM runner for model: {model_path}")
+            log_info("Started LLM runner for model: %s", model_path)
         except Exception as e:
             self.llm_runner = None
             self.current_model_path = None
-            log_info(f"Failed to start LLM runner: {e}")
+            log_info("Failed to start LLM runner: %s", e)
 
     def on_generate_clicked(self):
         # Run a test prompt with the selected model and show output (async)
         idx = self.model_dropdown.currentIndex()
         model_path = self.model_dropdown.itemData(idx)
-        log_debug(f"on_generate_clicked: model_path={model_path}")
+        log_debug("on_generate_clicked: model_path=%s", model_path)
         if not model_path or model_path == "No models found":
             from PySide6.QtWidgets import QMessageBox
             QMessageBox.warning(self, "No Model", "Please select a valid model from the dropdown.")
@@ -224,7 +317,7 @@ class FlowchartWidget(QWidget):
             QMessageBox.critical(self, "LLM Error", "Failed to load the selected model.")
             return
         prompt = "Say hello from " + self.model_dropdown.currentText() + " in spanish!"
-        log_debug(f"on_generate_clicked: Sending prompt to LLM: {prompt!r}")
+        log_debug("on_generate_clicked: Sending prompt to LLM: %r", prompt)
 
         # Start worker thread
         self.llm_thread = QThread()
@@ -250,15 +343,90 @@ class FlowchartWidget(QWidget):
         show = self.toggle_json_btn.isChecked()
         self.json_widget.setVisible(show)
         if show:
+            # The pane isn't refreshed while hidden
+            self._update_json_box(self.get_flow_json())
             self.splitter.setSizes([2, 1])
         else:
             self.splitter.setSizes([1, 0])
 
+    def _update_analysis_warning(self, analysis):
+        if not analysis.has_cycles():
+            self.analysis_label.setVisible(False)
+            return
+        components = analysis.strongly_connected_components()
+        in_cycles = sum(len(c) for c in components)
+        text = f"Warning: {len(components)} cycle{'s' if len(components) != 1 else ''} ({in_cycles} nodes)"
+        unreachable = analysis.unreachable()
+        if unreachable:
+            text += f", {len(unreachable)} unreachable from any start node"
+        self.analysis_label.setText(text)
+        self.analysis_label.setToolTip("Connectors on a cycle are drawn in red")
+        self.analysis_label.setVisible(True)
+
+    def tidy_selection(self):
+        # Re-layout only the selected nodes and their close neighbours
+        selected = [item.node_id for item in self.canvas.scene().selectedItems() if hasattr(item, 'node_id')]
+        if selected:
+            self.canvas.auto_layout('incremental', around=selected)
+
+    def _update_load_progress(self, done, total):
+        self.load_progress.setMaximum(total)
+        self.load_progress.setValue(done)
+        self.load_progress.setVisible(done < total)
+
+    def toggle_compare(self):
+        if not self.compare_btn.isChecked():
+            self.clear_compare()
+            return
+        versions = [(self.version_dropdown.itemText(i), self.version_dropdown.itemData(i))
+                    for i in range(self.version_dropdown.count())
+                    if isinstance(self.version_dropdown.itemData(i), int)]
+        if not versions:
+            self.compare_btn.setChecked(False)
+            return
+        from PySide6.QtWidgets import QInputDialog
+        labels = [label for label, _ in versions]
+        label, ok = QInputDialog.getItem(self, "Compare with Version", "Compare the canvas with:", labels, 0, False)
+        if not ok:
+            self.compare_btn.setChecked(False)
+            return
+        self.compare_with_version(versions[labels.index(label)][1])
+
+    def compare_with_version(self, version):
+        old = self.version_cache.get(self.project_id, version)
+        if old is None:
+            self.compare_btn.setChecked(False)
+            return
+        diff = diff_flowcharts(old, self.get_flow_json())
+        log_info("Comparing project %s with version %s: %s", self.project_id, version, diff.summary())
+        self.canvas.show_diff(diff, old)
+        self.compare_label.setText(f"vs v{version}: " + ("no changes" if diff.is_empty() else diff.summary()))
+        self.compare_label.setVisible(True)
+        self.compare_btn.setChecked(True)
+
+    def clear_compare(self):
+        self.canvas.clear_diff()
+        self.compare_label.setVisible(False)
+        self.compare_btn.setChecked(False)
+
     def _on_flowchart_update(self):
+        # The comparison is against the canvas as it was, so drop it once it changes
+        if self.compare_btn.isChecked():
+            self.clear_compare()
+        # Restart the debounce window; the export and save happen once it expires
+        self._autosave_timer.start()
+
+    def _commit_pending_update(self):
+        flowchart = self.get_flow_json()
+        self._update_json_box(flowchart)
+        self.autosave(flowchart)
+
+    def _update_json_box(self, flowchart):
+        if not self.json_widget.isVisible():
+            return
         import json
-        pretty = json.dumps(self.get_flow_json(), indent=2, ensure_ascii=False)
+        pretty = json.dumps(flowchart, indent=2, ensure_ascii=False)
         self.json_box.setPlainText(pretty)
-        self.autosave()
 
     def _json_mouse_move_event(self, event):
         # Show copy button on hover (top right corner)
@@ -274,50 +442,155 @@ class FlowchartWidget(QWidget):
         from PySide6.QtWidgets import QApplication
         QApplication.clipboard().setText(self.json_box.toPlainText())
 
-    def autosave(self):
-        log_info(f"Autosave triggered for project: {self.project_id}")
-        db.save_flowchart_version(self.project_id, self.get_flow_json())
-        self.refresh_versions()
+    def autosave(self, flowchart=None, source='autosave'):
+        log_debug("Autosave triggered for project: %s", self.project_id)
+        if flowchart is None:
+            flowchart = self.get_flow_json()
+        self.autosaver.submit(self.project_id, flowchart, self.version_saved.emit, source)
+
+    def flush_autosave(self):
+        """Save any pending edit and wait until the writer has committed everything."""
+        if self._autosave_timer.isActive():
+            self._autosave_timer.stop()
+            self._commit_pending_update()
+        self.autosaver.flush()
+        log_debug("Autosave flushed for project: %s", self.project_id)
+
+    def on_version_saved(self, version):
+        log_debug("Autosave committed version %s for project: %s", version, self.project_id)
+        # The list follows the new head only if that is where the user was; a
+        # save flushed on the way to an older version must not move the selection
+        current = self.version_dropdown.currentIndex()
+        selected = self.version_dropdown.itemData(current) if current > 0 else None
+        newest = self.version_dropdown.itemData(0) if self.version_dropdown.count() else None
+        # Only fetch what is newer than the top of the list
+        newer = db.list_flowchart_versions(self.project_id, limit=self.VERSION_PAGE_SIZE, after_version=newest) if isinstance(newest, int) else []
+        if not isinstance(newest, int) or len(newer) == self.VERSION_PAGE_SIZE:
+            self.refresh_versions()
+        else:
+            self.version_dropdown.blockSignals(True)
+            for i, (v, created, name, _) in enumerate(newer):
+                self.version_dropdown.insertItem(i, self._version_label(v, created, name), v)
+            self._version_count += len(newer)
+            self.version_dropdown.setCurrentIndex(0)
+            self._selected_version_idx = 0
+            self.version_dropdown.blockSignals(False)
+            self._update_version_tooltip()
+        if isinstance(selected, int):
+            self._select_version(selected)
+
+    def _select_version(self, version):
+        # Point the dropdown at `version` without loading it, paging back if needed
+        self.version_dropdown.blockSignals(True)
+        idx = self.version_dropdown.findData(version)
+        while idx < 0:
+            last = self.version_dropdown.count() - 1
+            if last < 1 or self.version_dropdown.itemData(last) != self.LOAD_OLDER_VERSIONS:
+                break
+            self._append_version_page(self.version_dropdown.itemData(last - 1))
+            idx = self.version_dropdown.findData(version)
+        if idx >= 0:
+            self.version_dropdown.setCurrentIndex(idx)
+            self._selected_version_idx = idx
+        self.version_dropdown.blockSignals(False)
+        self._update_version_tooltip()
 
     def refresh_versions(self):
-        log_debug(f"Refreshing version list for project: {self.project_id}")
-        versions = db.list_flowchart_versions(self.project_id)
+        log_debug("Refreshing version list for project: %s", self.project_id)
+        self._version_count = db.count_flowchart_versions(self.project_id)
         self.version_dropdown.blockSignals(True)
         self.version_dropdown.clear()
-        # Show only the latest 10 versions
-        for v, created in versions[:10]:
-            self.version_dropdown.addItem(f"v{v} ({created[:19]})", v)
+        self._append_version_page(None)
         self.version_dropdown.blockSignals(False)
-        if versions:
+        if self.version_dropdown.count():
             self.version_dropdown.setCurrentIndex(0)
+        self._selected_version_idx = 0
+        self._update_version_tooltip()
+
+    def _append_version_page(self, before_version):
+        # Caller blocks the dropdown's signals
+        last = self.version_dropdown.count() - 1
+        if last >= 0 and self.version_dropdown.itemData(last) == self.LOAD_OLDER_VERSIONS:
+            self.version_dropdown.removeItem(last)
+        # Fetch one extra row to know whether there is another page
+        versions = db.list_flowchart_versions(self.project_id, limit=self.VERSION_PAGE_SIZE + 1, before_version=before_version)
+        for v, created, name, _ in versions[:self.VERSION_PAGE_SIZE]:
+            self.version_dropdown.addItem(self._version_label(v, created, name), v)
+        if len(versions) > self.VERSION_PAGE_SIZE:
+            self.version_dropdown.addItem("Load older versions...", self.LOAD_OLDER_VERSIONS)
+
+    def _version_label(self, v, created, name):
+        return f"v{v} {name} ({created[:19]})" if name else f"v{v} ({created[:19]})"
+
+    def name_current_version(self):
+        idx = self.version_dropdown.currentIndex()
+        v = self.version_dropdown.itemData(idx)
+        if not isinstance(v, int):
+            return
+        from PySide6.QtWidgets import QInputDialog
+        name, ok = QInputDialog.getText(self, "Name Version", f"Name for version v{v}:")
+        if not ok:
+            return
+        # Make sure the version being named is the one that's on disk
+        self.flush_autosave()
+        db.name_flowchart_version(self.project_id, v, name.strip())
+        created = self.version_dropdown.itemText(idx).rsplit('(', 1)[-1].rstrip(')')
+        self.version_dropdown.setItemText(idx, self._version_label(v, created, name.strip()))
+
+    def _load_older_versions(self, current_idx):
+        oldest = self.version_dropdown.itemData(current_idx - 1)
+        selected = self._selected_version_idx
+        self.version_dropdown.blockSignals(True)
+        self._append_version_page(oldest)
+        self.version_dropdown.setCurrentIndex(selected)
+        self.version_dropdown.blockSignals(False)
+        self._update_version_tooltip()
+        # Keep the list open so the user can carry on scrolling back
+        self.version_dropdown.showPopup()
+
+    def _update_version_tooltip(self):
+        loaded = sum(1 for i in range(self.version_dropdown.count()) if isinstance(self.version_dropdown.itemData(i), int))
+        self.version_dropdown.setToolTip(f"Showing {loaded} of {self._version_count} versions")
 
     def on_version_changed(self, idx):
-        log_info(f"User selected version index: {idx} for project: {self.project_id}")
+        log_debug("User selected version index: %s for project: %s", idx, self.project_id)
         if idx < 0:
             return
         v = self.version_dropdown.itemData(idx)
+        if v == self.LOAD_OLDER_VERSIONS:
+            self._load_older_versions(idx)
+            return
         if v is None:
             return
-        # Load version from DB
-        with db.get_connection() as conn:
-            row = conn.execute('SELECT flowchart_json FROM flowcharts WHERE project_id=? AND version=?', (self.project_id, v)).fetchone()
-            if row:
-                import json
-                log_info(f"Loading version {v} for project {self.project_id}")
-                self.canvas.import_from_model(json.loads(row[0]))
-        # Always update JSON output after version change
-        self._on_flowchart_update()
+        self._selected_version_idx = idx
+        flowchart = self.version_cache.get(self.project_id, v)
+        if flowchart:
+            log_info("Loading version %s for project %s", v, self.project_id)
+            self.clear_compare()
+            # An edit still in the debounce window is saved before the canvas is replaced
+            self.flush_autosave()
+            self.canvas.import_from_model(flowchart)
+        if is_enabled(DEBUG):
+            log_debug("Version cache stats: %s", self.version_cache.stats())
+        # Always update JSON output after version change. Loading a version is
+        # not an edit, so the update the load itself triggered doesn't autosave;
+        # the next edit saves on top of it.
+        self._autosave_timer.stop()
+        self._update_json_box(self.get_flow_json())
 
     def get_flow_json(self):
         # Export from canvas to model/JSON
         return self.canvas.export_to_model()
 
     def modify_with_llm(self):
-        log_info(f"User requested LLM modification for project: {self.project_id}")
+        log_info("User requested LLM modification for project: %s", self.project_id)
         # Stub: Replace with actual LLM call
         user_query = self.llm_edit.toPlainText().strip()
         if not user_query:
             return
         # Simulate LLM modification: just add a node visually
         self.canvas.mouseDoubleClickEventFake(user_query)
-        db.save_flowchart_version(self.project_id, self.get_flow_json())
+        self._autosave_timer.stop()
+        flowchart = self.get_flow_json()
+        self._update_json_box(flowchart)
+        self.autosave(flowchart, source='llm')
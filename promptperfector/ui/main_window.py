@@ -10,6 +10,8 @@ from .project_screen import ProjectScreen
 from .flowchart_widget import FlowchartWidget
 from .final_prompt_widget import FinalPromptWidget
 from ..logic import db, flowchart
+from ..logic.autosave import AutosaveQueue
+from ..logic.compactor import BackgroundCompactor
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -28,15 +30,22 @@ class MainWindow(QMainWindow):
         self.layout.addWidget(self.stacked)
 
         self.current_project_id = None
+        # Shared by all flowchart screens so a project switch can't race the previous project's writes
+        self.autosaver = AutosaveQueue()
+        # Applies the retention policies to old history every few minutes
+        self.compactor = BackgroundCompactor()
+        self.compactor.start()
 
     def on_project_selected(self, project_id):
+        if self.flowchart_screen:
+            self.flowchart_screen.flush_autosave()
         self.current_project_id = project_id
         latest = db.get_latest_flowchart(project_id)
         if latest:
             model = flowchart.FlowchartModel.from_json(latest)
         else:
             model = flowchart.FlowchartModel()
-        self.flowchart_screen = FlowchartWidget(model, project_id, self)
+        self.flowchart_screen = FlowchartWidget(model, project_id, self.autosaver, self)
         # self.final_prompt_screen = FinalPromptWidget(back_callback=self.back_to_flowchart)
         if self.stacked.count() > 1:
             self.stacked.removeWidget(self.stacked.widget(1))
@@ -59,8 +68,18 @@ class MainWindow(QMainWindow):
         self.stacked.setCurrentWidget(self.flowchart_screen)
 
     def switch_project(self):
+        if self.flowchart_screen:
+            self.flowchart_screen.flush_autosave()
         self.stacked.setCurrentWidget(self.project_screen)
 
+    def closeEvent(self, event):
+        # Nothing may be left in the autosave queue when the app exits
+        if self.flowchart_screen:
+            self.flowchart_screen.flush_autosave()
+        self.autosaver.close()
+        self.compactor.stop()
+        super().closeEvent(event)
+
     def create_new_project(self):
         name, ok = QInputDialog.getText(self, "New Project", "Enter project name:")
         if ok and name.strip():
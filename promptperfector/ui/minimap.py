@@ -0,0 +1,172 @@
+import math
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QPainter, QPixmap, QPen, QColor
+from PySide6.QtCore import Qt, QRectF, QPointF, QTimer, QEvent
+
+from promptperfector.logic.logger import log_debug
+
+# Side of the square minimap widget, and of the pixmap tiles it is drawn from
+MINIMAP_SIZE = 180
+TILE_SIZE = 64
+# Changed tiles are re-rendered at most this often
+MINIMAP_REFRESH_MS = 200
+BACKGROUND_COLOR = QColor("#f4f4f4")
+VIEWPORT_COLOR = QColor("#2f6fd6")
+
+
+class Minimap(QWidget):
+    """
+    Overview of the whole canvas with the visible area outlined.
+
+    The scene is drawn from low-resolution pixmap tiles. The scene's `changed`
+    regions mark the tiles they touch, which are rendered again on the next
+    refresh; other tiles are kept, so an edit costs a few small renders no
+    matter how large the chart is. Click to center the canvas there, drag to
+    move the visible area.
+    """
+    def __init__(self, canvas, parent=None):
+        super().__init__(parent)
+        self.canvas = canvas
+        self.setFixedSize(MINIMAP_SIZE, MINIMAP_SIZE)
+        self.setCursor(Qt.PointingHandCursor)
+        # Scene area the minimap covers; grows when items are placed outside it
+        self._world = QRectF(canvas.sceneRect())
+        self._scale = 1.0
+        self._origin = QPointF()
+        # (column, row) -> QPixmap, and the tiles changed since they were rendered
+        self._tiles = {}
+        self._dirty = set()
+        # Offset of the grab point from the visible area's center while dragging
+        self._drag_offset = None
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(MINIMAP_REFRESH_MS)
+        self._refresh_timer.timeout.connect(self.refresh)
+        canvas.scene().changed.connect(self.scene_changed)
+        # The visible area moves with scrolling and zooming, and resizes with the canvas
+        for bar in (canvas.horizontalScrollBar(), canvas.verticalScrollBar()):
+            bar.valueChanged.connect(self.update)
+            bar.rangeChanged.connect(self.update)
+        canvas.viewport().installEventFilter(self)
+        self._update_geometry()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Resize:
+            self.update()
+        return False
+
+    # --- Tiles ---
+    def _update_geometry(self):
+        # Fit the world into the widget, centered
+        world = self._world
+        self._scale = min(self.width() / world.width(), self.height() / world.height())
+        self._origin = QPointF(int((self.width() - world.width() * self._scale) / 2),
+                               int((self.height() - world.height() * self._scale) / 2))
+        self._columns = max(1, math.ceil(world.width() * self._scale / TILE_SIZE))
+        self._rows = max(1, math.ceil(world.height() * self._scale / TILE_SIZE))
+        self._tiles = {}
+        self._dirty = set()
+
+    def to_scene(self, point):
+        return QPointF(self._world.left() + (point.x() - self._origin.x()) / self._scale,
+                       self._world.top() + (point.y() - self._origin.y()) / self._scale)
+
+    def to_minimap(self, rect):
+        return QRectF(self._origin.x() + (rect.left() - self._world.left()) * self._scale,
+                      self._origin.y() + (rect.top() - self._world.top()) * self._scale,
+                      rect.width() * self._scale, rect.height() * self._scale)
+
+    def _tile_source(self, column, row):
+        # Scene rect drawn into a tile
+        size = TILE_SIZE / self._scale
+        return QRectF(self._world.left() + column * size, self._world.top() + row * size, size, size)
+
+    def _render_tile(self, column, row):
+        pixmap = QPixmap(TILE_SIZE, TILE_SIZE)
+        pixmap.fill(BACKGROUND_COLOR)
+        painter = QPainter(pixmap)
+        # At this scale items draw their lowest level of detail
+        self.canvas.scene().render(painter, QRectF(0, 0, TILE_SIZE, TILE_SIZE),
+                                   self._tile_source(column, row), Qt.IgnoreAspectRatio)
+        painter.end()
+        self._tiles[(column, row)] = pixmap
+        return pixmap
+
+    def scene_changed(self, regions):
+        grown = self._world
+        for rect in regions:
+            if not grown.contains(rect):
+                grown = grown.united(rect)
+        if grown != self._world:
+            # Everything moves on the minimap; start over
+            self._world = grown
+            self._update_geometry()
+        else:
+            size = TILE_SIZE / self._scale
+            for rect in regions:
+                first_column = max(0, int((rect.left() - self._world.left()) // size))
+                last_column = min(self._columns - 1, int((rect.right() - self._world.left()) // size))
+                first_row = max(0, int((rect.top() - self._world.top()) // size))
+                last_row = min(self._rows - 1, int((rect.bottom() - self._world.top()) // size))
+                for column in range(first_column, last_column + 1):
+                    for row in range(first_row, last_row + 1):
+                        self._dirty.add((column, row))
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def refresh(self):
+        # A progressive import changes the whole scene with indexing off; wait for it
+        if self.canvas.is_loading():
+            self._refresh_timer.start()
+            return
+        if self._dirty:
+            log_debug("Minimap: re-rendering %d of %d tiles", len(self._dirty), self._columns * self._rows)
+        for tile in self._dirty:
+            self._tiles.pop(tile, None)
+        self._dirty = set()
+        self.update()
+
+    # --- Painting and navigation ---
+    def visible_rect(self):
+        """Scene area currently shown by the canvas."""
+        return self.canvas.mapToScene(self.canvas.viewport().rect()).boundingRect()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), BACKGROUND_COLOR)
+        for column in range(self._columns):
+            for row in range(self._rows):
+                pixmap = self._tiles.get((column, row))
+                if pixmap is None:
+                    pixmap = self._render_tile(column, row)
+                painter.drawPixmap(QPointF(self._origin.x() + column * TILE_SIZE,
+                                           self._origin.y() + row * TILE_SIZE), pixmap)
+        painter.setPen(QPen(VIEWPORT_COLOR, 2))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(self.to_minimap(self.visible_rect()).intersected(QRectF(self.rect())))
+        painter.end()
+
+    def resizeEvent(self, event):
+        self._update_geometry()
+        super().resizeEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            super().mousePressEvent(event)
+            return
+        point = self.to_scene(event.position())
+        visible = self.visible_rect()
+        # Grabbing the outline keeps the grab point under the cursor; a click
+        # elsewhere centers the canvas there first
+        self._drag_offset = point - visible.center() if visible.contains(point) else QPointF()
+        self.canvas.centerOn(point - self._drag_offset)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_offset is not None:
+            self.canvas.centerOn(self.to_scene(event.position()) - self._drag_offset)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_offset = None
+        super().mouseReleaseEvent(event)
@@ -1,4 +1,5 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListWidget, QLineEdit, QLabel, QMessageBox
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem, QLineEdit, QLabel, QMessageBox
+from PySide6.QtCore import Qt, QTimer
 from ..logic import db
 
 class ProjectScreen(QWidget):
@@ -8,6 +9,20 @@ class ProjectScreen(QWidget):
         self.layout = QVBoxLayout(self)
         self.label = QLabel("Select or Create a Project")
         self.layout.addWidget(self.label)
+        # Node search across all projects and versions
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search nodes in all projects")
+        self.search_input.setClearButtonEnabled(True)
+        self.layout.addWidget(self.search_input)
+        self.search_results = QListWidget()
+        self.search_results.setVisible(False)
+        self.layout.addWidget(self.search_results)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self._search_timer.start)
+        self.search_results.itemDoubleClicked.connect(self.select_search_result)
         self.project_list = QListWidget()
         self.layout.addWidget(self.project_list)
         self.name_input = QLineEdit()
@@ -37,3 +52,23 @@ class ProjectScreen(QWidget):
         text = item.text()
         pid = text.split('(')[-1][:-1]
         self.on_project_selected(pid)
+
+    def run_search(self):
+        query = self.search_input.text().strip()
+        self.search_results.clear()
+        self.search_results.setVisible(bool(query))
+        if not query:
+            return
+        for pid, name, node_id, subject, snippet, version_from, version_to in db.search_nodes(query):
+            versions = f"v{version_from}+" if version_to is None else f"v{version_from}-v{version_to}"
+            title = subject or node_id
+            item = QListWidgetItem(f"{name} / {title} ({versions}): {snippet}")
+            item.setData(Qt.UserRole, pid)
+            self.search_results.addItem(item)
+        if not self.search_results.count():
+            self.search_results.addItem("No matching nodes")
+
+    def select_search_result(self, item):
+        pid = item.data(Qt.UserRole)
+        if pid:
+            self.on_project_selected(pid)
@@ -0,0 +1,63 @@
+import os
+import random
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic import db, logger
+
+
+@pytest.fixture(autouse=True, scope='session')
+def log_file(tmp_path_factory):
+    # Keep test runs out of the app's debug.log
+    original = logger.LOG_FILE
+    logger.set_log_file(str(tmp_path_factory.mktemp('log') / 'debug.log'))
+    yield
+    logger.set_log_file(original)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database file for one test."""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'promptperfector.db'))
+    db._head_cache.clear()
+    db.init_db()
+    yield db
+    db.close_connection()
+    db._head_cache.clear()
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """The QApplication for widget tests, on the offscreen platform; skips without PySide6."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    QtWidgets = pytest.importorskip('PySide6.QtWidgets')
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def edit_history(count, node_count=40, seed=0):
+    """`count` snapshots, each a small random edit of the one before. Edited
+    nodes are new dicts, so earlier snapshots are never mutated."""
+    rng = random.Random(seed)
+    snapshot = generate_flowchart(node_count, seed=seed)
+    next_id = node_count + 1
+    history = [snapshot]
+    for _ in range(count - 1):
+        nodes = list(snapshot['nodes'])
+        action = rng.random()
+        if action < 0.5:
+            i = rng.randrange(len(nodes))
+            nodes[i] = dict(nodes[i], pos=[rng.uniform(0, 1000), rng.uniform(0, 1000)])
+        elif action < 0.75:
+            i = rng.randrange(len(nodes))
+            nodes[i] = dict(nodes[i], text=f'edited {rng.random()}')
+        elif action < 0.9:
+            nodes.append({'id': f'node_{next_id}', 'subject': '', 'text': 'new', 'pos': [0, 0]})
+            next_id += 1
+        elif len(nodes) > 1:
+            removed = nodes.pop(rng.randrange(len(nodes)))['id']
+            nodes = [dict(n, connectsTo=[t for t in n['connectsTo'] if t != removed] or None)
+                     if removed in (n.get('connectsTo') or ()) else n for n in nodes]
+        snapshot = {'nodes': nodes}
+        history.append(snapshot)
+    return history
@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic.analysis import GraphAnalysis, execution_order
+from promptperfector.logic.flowchart import FlowchartModel
+
+
+def reachable(model, start):
+    # Nodes reachable from `start` by one or more edges
+    seen = set()
+    stack = list(model.successors(start))
+    while stack:
+        node = stack.pop()
+        if node not in seen:
+            seen.add(node)
+            stack.extend(model.successors(node))
+    return seen
+
+
+def check(model, analysis):
+    ids = list(model._nodes)
+    closure = {n: reachable(model, n) for n in ids}
+    edges = set(model.edges())
+    order = analysis.topological_order()
+    assert sorted(order) == sorted(ids)
+    position = {n: i for i, n in enumerate(order)}
+    cycle_edges = set(analysis.cycle_edges())
+    for from_id, to_id in edges - cycle_edges:
+        assert position[from_id] < position[to_id]
+    # Every cycle edge closes a real cycle, and only cycles are left out
+    for from_id, to_id in cycle_edges:
+        assert from_id in closure[to_id] or from_id == to_id
+    assert analysis.has_cycles() == any(n in closure[n] for n in ids)
+    assert analysis.cyclic_edges() == {(f, t) for f, t in edges if f in closure[t] or f == t}
+    expected = {frozenset([n] + [m for m in closure[n] if n in closure[m]]) for n in ids if n in closure[n]}
+    assert {frozenset(c) for c in analysis.strongly_connected_components()} == expected
+    assert set(analysis.roots()) == {n for n in ids if not model.in_degree(n)}
+    assert set(analysis.leaves()) == {n for n in ids if not model.out_degree(n)}
+    reached = set(analysis.roots()).union(*(closure[r] for r in analysis.roots()))
+    assert set(analysis.unreachable()) == set(ids) - reached
+    for from_id in ids[:5]:
+        for to_id in ids:
+            assert analysis.reaches(from_id, to_id) == (from_id == to_id or to_id in closure[from_id])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_matches_brute_force(seed):
+    rng = random.Random(seed)
+    model = FlowchartModel()
+    analysis = GraphAnalysis(model)
+    next_id = 0
+    for _ in range(150):
+        ids = list(model._nodes)
+        action = rng.random()
+        if len(ids) < 3 or action < 0.1:
+            model.add_node('', node_id=f'node_{next_id}')
+            next_id += 1
+        elif action < 0.15:
+            model.remove_node(rng.choice(ids))
+        elif action < 0.45 and model.edge_count():
+            model.remove_edge(*rng.choice(sorted(model.edges())))
+        else:
+            model.add_edge(rng.choice(ids), rng.choice(ids))
+        check(model, analysis)
+    analysis.close()
+
+
+def test_removing_an_edge_reopens_its_cycle_edge():
+    model = FlowchartModel()
+    analysis = GraphAnalysis(model)
+    for node_id in 'abcd':
+        model.add_node(node_id, node_id=node_id)
+    model.add_edge('a', 'b')
+    model.add_edge('b', 'c')
+    model.add_edge('c', 'a')
+    model.add_edge('c', 'd')
+    assert analysis.has_cycles()
+    assert {frozenset(c) for c in analysis.strongly_connected_components()} == {frozenset('abc')}
+    model.remove_edge('a', 'b')
+    assert not analysis.has_cycles()
+    assert analysis.topological_order().index('c') < analysis.topological_order().index('a')
+    check(model, analysis)
+
+
+def test_built_from_an_existing_model():
+    model = FlowchartModel.from_json(generate_flowchart(300, shape='cyclic', seed=3))
+    analysis = GraphAnalysis(model)
+    check(model, analysis)
+    assert analysis.has_cycles()
+
+
+def test_execution_order():
+    snapshot = generate_flowchart(100, seed=1)
+    snapshot['nodes'].reverse()
+    ordered = execution_order(snapshot)
+    position = {n['id']: i for i, n in enumerate(ordered['nodes'])}
+    assert sorted(position) == sorted(n['id'] for n in snapshot['nodes'])
+    for node in ordered['nodes']:
+        for to_id in node['connectsTo'] or ():
+            assert position[node['id']] < position[to_id]
+
+
+def test_execution_order_keeps_the_first_of_duplicate_ids():
+    snapshot = generate_flowchart(30, seed=2)
+    first = snapshot['nodes'][5]
+    duplicate = dict(snapshot['nodes'][20], text='duplicate')
+    duplicate['id'] = first['id']
+    snapshot['nodes'].append(duplicate)
+    ordered = execution_order(snapshot)
+    ids = [n['id'] for n in ordered['nodes']]
+    assert sorted(ids) == sorted({n['id'] for n in snapshot['nodes']})
+    assert next(n for n in ordered['nodes'] if n['id'] == first['id']) is first
+    assert FlowchartModel.from_json(snapshot).to_json()['nodes'][5]['text'] == first['text']
@@ -0,0 +1,79 @@
+import io
+import json
+import sys
+
+import pytest
+
+from promptperfector.logic import archive
+
+from conftest import edit_history
+
+
+def fill(db):
+    first = db.create_project('first')
+    for snapshot in edit_history(60):
+        db.save_flowchart_version(first, snapshot)
+    db.name_flowchart_version(first, 10, 'milestone')
+    db.save_flowchart_version(first, {'nodes': [{'id': 'node_1', 'text': 'from the llm'}]}, source='llm')
+    second = db.create_project('second é')
+    db.save_flowchart_version(second, {'nodes': []})
+    return [first, second]
+
+
+def history(db, project_id):
+    rows = db.list_flowchart_versions(project_id, oldest_first=True)
+    return [(row, db.get_flowchart_version(project_id, row[0])) for row in rows]
+
+
+def switch_database(db, monkeypatch, path):
+    monkeypatch.setattr(db, 'DB_PATH', str(path))
+    db._head_cache.clear()
+    db.init_db()
+
+
+@pytest.mark.parametrize('name', ['archive.ndjson', 'archive.ndjson.gz'])
+def test_roundtrip_into_a_new_database(database, monkeypatch, tmp_path, name):
+    project_ids = fill(database)
+    expected = {pid: (name, history(database, pid)) for pid, name in database.list_projects()}
+    path = str(tmp_path / name)
+    assert archive.export_projects(path) == (2, 62)
+    switch_database(database, monkeypatch, tmp_path / 'restored.db')
+    assert archive.import_projects(path) == (2, 62)
+    assert sorted(pid for pid, _ in database.list_projects()) == sorted(project_ids)
+    for pid, name in database.list_projects():
+        assert (name, history(database, pid)) == expected[pid]
+
+
+def test_colliding_project_ids_get_new_ones(database, tmp_path):
+    first, _ = fill(database)
+    path = str(tmp_path / 'archive.ndjson')
+    archive.export_projects(path, project_ids=[first])
+    assert archive.import_projects(path) == (1, 61)
+    projects = database.list_projects()
+    assert len(projects) == 3
+    copy = next(pid for pid, name in projects if name == 'first' and pid != first)
+    assert history(database, copy) == history(database, first)
+
+
+def test_stdout_and_stdin_stay_open(database, monkeypatch, tmp_path):
+    fill(database)
+    out = io.BytesIO()
+    monkeypatch.setattr(sys, 'stdout', io.TextIOWrapper(out, encoding='utf-8'))
+    archive.export_projects('-')
+    assert not sys.stdout.closed
+    data = out.getvalue()
+    assert json.loads(data.splitlines()[0])['format'] == archive.ARCHIVE_FORMAT
+    switch_database(database, monkeypatch, tmp_path / 'restored.db')
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(data), encoding='utf-8'))
+    assert archive.import_projects('-') == (2, 62)
+    assert not sys.stdin.closed
+
+
+def test_rejects_other_files(database, tmp_path):
+    path = tmp_path / 'other.ndjson'
+    path.write_text(json.dumps({'type': 'header', 'format': 'something-else', 'version': 1}) + '\n')
+    with pytest.raises(ValueError):
+        archive.import_projects(str(path))
+    path.write_text(json.dumps({'type': 'mystery'}) + '\n')
+    with pytest.raises(ValueError):
+        archive.import_projects(str(path))
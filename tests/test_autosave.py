@@ -0,0 +1,83 @@
+import threading
+
+from conftest import edit_history
+from promptperfector.logic.autosave import AutosaveQueue
+
+
+def hold_writer(queue, project_id, snapshot):
+    # Submit `snapshot` and keep the writer in its callback until the returned event is set
+    started, release = threading.Event(), threading.Event()
+
+    def hold(version):
+        started.set()
+        release.wait(5)
+
+    queue.submit(project_id, snapshot, on_saved=hold)
+    started.wait(5)
+    return release
+
+
+def record_batches(db, monkeypatch):
+    batches = []
+    save = db.save_flowchart_versions
+
+    def save_and_record(items):
+        batches.append(len(items))
+        return save(items)
+
+    monkeypatch.setattr(db, 'save_flowchart_versions', save_and_record)
+    return batches
+
+
+def test_snapshots_queued_while_the_writer_is_busy_share_a_transaction(database, monkeypatch):
+    batches = record_batches(database, monkeypatch)
+    pid = database.create_project('batch')
+    history = edit_history(5)
+    queue = AutosaveQueue()
+    release = hold_writer(queue, pid, history[0])
+    for snapshot in history[1:]:
+        queue.submit(pid, snapshot)
+    release.set()
+    queue.close()
+    assert batches == [1, 4]
+    assert database.count_flowchart_versions(pid) == 5
+
+
+def test_flush_waits_for_everything_in_submission_order(database):
+    pid = database.create_project('order')
+    history = edit_history(30)
+    saved = []
+    queue = AutosaveQueue()
+    for snapshot in history:
+        queue.submit(pid, snapshot, on_saved=saved.append)
+    queue.flush()
+    assert saved == list(range(1, 31))
+    for version, snapshot in enumerate(history, 1):
+        assert database.get_flowchart_version(pid, version) == snapshot
+    queue.close()
+
+
+def test_close_drains_the_queue_and_stops_the_writer(database):
+    pid = database.create_project('close')
+    history = edit_history(10)
+    queue = AutosaveQueue()
+    for snapshot in history:
+        queue.submit(pid, snapshot)
+    queue.close()
+    assert not queue._thread.is_alive()
+    assert database.count_flowchart_versions(pid) == 10
+
+
+def test_a_failing_snapshot_does_not_take_the_batch_with_it(database):
+    pid = database.create_project('failing')
+    history = edit_history(3)
+    saved = []
+    queue = AutosaveQueue()
+    release = hold_writer(queue, pid, history[0])
+    queue.submit(pid, history[1], on_saved=saved.append)
+    queue.submit('no such project', {'nodes': [{'id': 'x', 'unserializable': object()}]}, on_saved=saved.append)
+    queue.submit(pid, history[2], on_saved=saved.append)
+    release.set()
+    queue.close()
+    assert saved == [2, 3]
+    assert database.get_flowchart_version(pid, 3) == history[2]
@@ -0,0 +1,49 @@
+import copy
+
+from promptperfector.logic.delta import apply_delta, can_diff, copy_snapshot, make_delta
+
+from conftest import edit_history
+
+
+def test_roundtrip_over_history():
+    history = edit_history(200)
+    for old, new in zip(history, history[1:]):
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_unchanged_snapshot_gives_empty_delta():
+    snapshot = edit_history(1)[0]
+    assert make_delta(snapshot, copy.deepcopy(snapshot)) == {}
+
+
+def test_order_meta_and_removed_fields():
+    old = {'nodes': [{'id': 'a', 'text': 'x', 'pos': [0, 0]}, {'id': 'b', 'text': 'y'}], 'title': 'one'}
+    new = {'nodes': [{'id': 'b', 'text': 'y'}, {'id': 'a', 'text': 'x'}], 'title': 'two'}
+    delta = make_delta(old, new)
+    assert delta['order'] == ['b', 'a']
+    assert delta['meta'] == {'title': 'two'}
+    result = apply_delta(old, delta)
+    assert result == new
+
+
+def test_apply_shares_untouched_nodes_and_leaves_base_alone():
+    old = {'nodes': [{'id': 'a', 'text': 'x'}, {'id': 'b', 'text': 'y'}]}
+    before = copy.deepcopy(old)
+    new = {'nodes': [old['nodes'][0], {'id': 'b', 'text': 'z'}]}
+    result = apply_delta(old, make_delta(old, new))
+    assert result['nodes'][0] is old['nodes'][0]
+    assert old == before
+
+
+def test_can_diff_needs_unique_ids():
+    assert can_diff({'nodes': [{'id': 'a'}]}, {'nodes': []})
+    assert not can_diff({'nodes': [{'id': 'a'}, {'id': 'a'}]}, {'nodes': []})
+    assert not can_diff({'nodes': [{'text': 'no id'}]}, {'nodes': []})
+    assert not can_diff([], {'nodes': []})
+
+
+def test_copy_snapshot_detaches_lists():
+    snapshot = {'nodes': [{'id': 'a', 'connectsTo': ['b']}]}
+    copied = copy_snapshot(snapshot)
+    copied['nodes'][0]['connectsTo'].append('c')
+    assert snapshot['nodes'][0]['connectsTo'] == ['b']
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic.diff import diff_flowcharts
+from promptperfector.logic.flowchart import FlowchartModel
+
+
+def edge_set(snapshot):
+    nodes = {n['id']: n for n in snapshot['nodes']}
+    edges = set()
+    for node in snapshot['nodes']:
+        edges.update((node['id'], t) for t in node.get('connectsTo') or () if t in nodes)
+        edges.update((f, node['id']) for f in node.get('connectsFrom') or () if f in nodes)
+    return edges
+
+
+def mutate(snapshot, rng, changes):
+    """Copy of `snapshot` with `changes` random edits, and what they were."""
+    nodes = {n['id']: dict(n, connectsTo=list(n['connectsTo'] or []), connectsFrom=list(n['connectsFrom'] or []))
+             for n in snapshot['nodes']}
+    expected = {'moved': set(), 'edited': set(), 'added': set(), 'removed': set()}
+    for i in range(changes):
+        ids = sorted(nodes)
+        node_id = rng.choice(ids)
+        action = rng.randrange(6)
+        if action == 0:
+            nodes[node_id]['pos'] = [nodes[node_id]['pos'][0] + 100, nodes[node_id]['pos'][1]]
+            expected['moved'].add(node_id)
+        elif action == 1:
+            nodes[node_id]['text'] += ' edited'
+            expected['edited'].add(node_id)
+        elif action == 2:
+            new_id = f'new_{i}'
+            nodes[new_id] = {'id': new_id, 'subject': '', 'text': '', 'connectsTo': [node_id], 'connectsFrom': [],
+                             'pos': [0.0, 0.0]}
+            nodes[node_id]['connectsFrom'].append(new_id)
+            expected['added'].add(new_id)
+        elif action == 3 and len(nodes) > 2:
+            del nodes[node_id]
+            for other in nodes.values():
+                other['connectsTo'] = [t for t in other['connectsTo'] if t != node_id]
+                other['connectsFrom'] = [f for f in other['connectsFrom'] if f != node_id]
+            if node_id in expected['added']:
+                expected['added'].discard(node_id)
+            else:
+                expected['removed'].add(node_id)
+            for kind in ('moved', 'edited'):
+                expected[kind].discard(node_id)
+        elif action == 4:
+            to_id = rng.choice(ids)
+            if to_id not in nodes[node_id]['connectsTo']:
+                nodes[node_id]['connectsTo'].append(to_id)
+                nodes[to_id]['connectsFrom'].append(node_id)
+        elif nodes[node_id]['connectsTo']:
+            to_id = nodes[node_id]['connectsTo'].pop()
+            nodes[to_id]['connectsFrom'].remove(node_id)
+    return {'nodes': list(nodes.values())}, expected
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    old = generate_flowchart(80, shape='cyclic', seed=seed)
+    new, expected = mutate(old, rng, 25)
+    diff = diff_flowcharts(old, new)
+    assert set(diff.added) == expected['added']
+    assert set(diff.removed) == expected['removed']
+    assert set(diff.moved) == expected['moved'] - expected['added']
+    assert set(diff.edited) == expected['edited'] - expected['added']
+    assert set(diff.added_edges) == edge_set(new) - edge_set(old)
+    assert set(diff.removed_edges) == edge_set(old) - edge_set(new)
+
+
+def test_models_and_snapshots_agree():
+    rng = random.Random(7)
+    old = generate_flowchart(60, seed=2)
+    new, _ = mutate(old, rng, 15)
+    from_dicts = diff_flowcharts(old, new)
+    from_models = diff_flowcharts(FlowchartModel.from_json(old), FlowchartModel.from_json(new))
+    for field in ('added', 'removed', 'moved', 'edited', 'added_edges', 'removed_edges'):
+        assert sorted(getattr(from_models, field)) == sorted(getattr(from_dicts, field))
+
+
+def test_identical_and_shared_snapshots():
+    old = generate_flowchart(50)
+    assert diff_flowcharts(old, {'nodes': list(old['nodes'])}).is_empty()
+    assert diff_flowcharts({'nodes': []}, {'nodes': []}).is_empty()
+
+
+def test_small_moves_are_ignored():
+    old = {'nodes': [{'id': 'a', 'text': 'x', 'pos': [0.0, 0.0]}]}
+    nudged = {'nodes': [{'id': 'a', 'text': 'x', 'pos': [0.3, -0.3]}]}
+    assert diff_flowcharts(old, nudged).is_empty()
+    assert diff_flowcharts(old, nudged, move_tolerance=0.1).moved == ['a']
+    assert diff_flowcharts(old, {'nodes': [{'id': 'a', 'text': 'x', 'pos': None}]}).moved == ['a']
@@ -0,0 +1,107 @@
+import json
+import random
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic.flowchart import SMALL_DEGREE, FlowchartModel, Node
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def node_added(self, node_id):
+        self.events.append(('node_added', node_id))
+
+    def node_removed(self, node_id):
+        self.events.append(('node_removed', node_id))
+
+    def edge_added(self, from_id, to_id):
+        self.events.append(('edge_added', from_id, to_id))
+
+    def edge_removed(self, from_id, to_id):
+        self.events.append(('edge_removed', from_id, to_id))
+
+
+def hub(degree):
+    # Node 'hub' links to and from `degree` spokes, listed in a scrambled order
+    spokes = [f's{i}' for i in range(degree)]
+    rng = random.Random(degree)
+    to_ids, from_ids = rng.sample(spokes, degree), rng.sample(spokes, degree)
+    nodes = [{'id': 'hub', 'subject': '', 'text': 'hub', 'connectsTo': to_ids, 'connectsFrom': from_ids}]
+    nodes += [{'id': s, 'subject': '', 'text': s, 'connectsTo': ['hub'], 'connectsFrom': ['hub']} for s in spokes]
+    return {'nodes': nodes}
+
+
+@pytest.mark.parametrize('shape', ['dag', 'cyclic'])
+def test_json_roundtrip_keeps_edge_order(shape):
+    snapshot = generate_flowchart(300, density=3, shape=shape, seed=7)
+    rng = random.Random(7)
+    for node in snapshot['nodes']:
+        for key in ('connectsTo', 'connectsFrom'):
+            if node[key]:
+                rng.shuffle(node[key])
+    model = FlowchartModel.from_json(snapshot)
+    assert model.to_json() == snapshot
+    assert FlowchartModel.from_json(json.dumps(snapshot)).to_json() == snapshot
+
+
+@pytest.mark.parametrize('degree', [SMALL_DEGREE - 1, SMALL_DEGREE, SMALL_DEGREE + 1, 4 * SMALL_DEGREE])
+def test_high_degree_adjacency(degree):
+    snapshot = hub(degree)
+    model = FlowchartModel.from_json(snapshot)
+    assert model.to_json() == snapshot
+    assert isinstance(model._out['hub'], dict) == (degree > SMALL_DEGREE)
+    assert isinstance(model._in['hub'], dict) == (degree > SMALL_DEGREE)
+    assert list(model.successors('hub')) == snapshot['nodes'][0]['connectsTo']
+    assert model.out_degree('hub') == model.in_degree('hub') == degree
+    assert model.edge_count() == 2 * degree
+    assert all(model.has_edge('hub', s) and model.has_edge(s, 'hub') for s in model.successors('hub'))
+    assert not model.add_edge('hub', 's0')
+    assert model.add_edge('s0', 's1') and model.has_edge('s0', 's1')
+
+
+def test_removing_edges_shrinks_back_to_tuples():
+    model = FlowchartModel.from_json(hub(3 * SMALL_DEGREE))
+    spokes = list(model.successors('hub'))
+    for s in spokes[:-SMALL_DEGREE // 2]:
+        assert model.remove_edge('hub', s)
+    assert not model.remove_edge('hub', spokes[0])
+    assert model._out['hub'] == tuple(spokes[-SMALL_DEGREE // 2:])
+    for s in spokes[-SMALL_DEGREE // 2:]:
+        model.remove_edge('hub', s)
+    assert 'hub' not in model._out
+    assert model.out_degree('hub') == 0 and list(model.successors('hub')) == []
+
+
+def test_removing_a_node_removes_its_edges():
+    model = FlowchartModel.from_json(hub(2 * SMALL_DEGREE))
+    recorder = Recorder()
+    model.subscribe(recorder)
+    removed = model.remove_node('s3')
+    assert removed.id == 's3' and 's3' not in model and removed.connectsTo == []
+    assert not model.has_edge('hub', 's3') and not model.has_edge('s3', 'hub')
+    assert 's3' not in model.successors('hub') and 's3' not in model.predecessors('hub')
+    assert model.edge_count() == 2 * (2 * SMALL_DEGREE - 1)
+    assert sorted(recorder.events[:2]) == [('edge_removed', 'hub', 's3'), ('edge_removed', 's3', 'hub')]
+    assert recorder.events[2:] == [('node_removed', 's3')]
+    model.remove_node('hub')
+    assert model.edge_count() == 0 and model._out == {} and model._in == {}
+    assert all(n['connectsTo'] is None and n['connectsFrom'] is None for n in model.to_json()['nodes'])
+
+
+def test_links_to_unknown_nodes_are_dropped():
+    model = FlowchartModel([Node('a', node_id='a', connectsTo=['b', 'ghost']), Node('b', node_id='b', connectsFrom=['ghost'])])
+    assert list(model.edges()) == [('a', 'b')]
+    assert model.get('b').connectsFrom == ['a']
+
+
+def test_insert_rejects_duplicates():
+    model = FlowchartModel()
+    model.add_node('a', node_id='a')
+    with pytest.raises(ValueError):
+        model.add_node('again', node_id='a')
+    node = model.add_node('b', node_id='b')
+    with pytest.raises(ValueError):
+        FlowchartModel().insert(node)
@@ -0,0 +1,104 @@
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic.autosave import AutosaveQueue
+from promptperfector.logic.flowchart import FlowchartModel
+
+
+@pytest.fixture
+def autosaver(database):
+    queue = AutosaveQueue()
+    yield queue
+    queue.close()
+
+
+def open_widget(project_id, autosaver):
+    from promptperfector.ui.flowchart_widget import FlowchartWidget
+    return FlowchartWidget(FlowchartModel(), project_id, autosaver)
+
+
+def settle(qapp, widget):
+    # Let pending timers fire, then wait for the writer and deliver its signals
+    widget.flush_autosave()
+    qapp.processEvents()
+
+
+def test_canvas_exports_what_it_imported(qapp):
+    from promptperfector.ui.flowchart_canvas import FlowchartCanvas
+    snapshot = generate_flowchart(200, shape='cyclic', seed=4)
+    # connectsFrom in an order the edges would not be added in
+    for node in snapshot['nodes']:
+        if node['connectsFrom']:
+            node['connectsFrom'].reverse()
+    canvas = FlowchartCanvas()
+    canvas.import_from_model(snapshot, progressive=False)
+    assert canvas.export_to_model() == snapshot
+    canvas.deleteLater()
+
+
+def test_reopening_an_unchanged_project_saves_nothing(qapp, database, autosaver):
+    pid = database.create_project('reopen')
+    database.save_flowchart_version(pid, generate_flowchart(50, shape='cyclic', seed=5))
+    for _ in range(2):
+        widget = open_widget(pid, autosaver)
+        settle(qapp, widget)
+        widget.deleteLater()
+    assert database.count_flowchart_versions(pid) == 1
+
+
+def test_new_project_gets_a_first_version(qapp, database, autosaver):
+    pid = database.create_project('new')
+    widget = open_widget(pid, autosaver)
+    widget._autosave_timer.setInterval(0)
+    qapp.processEvents()
+    settle(qapp, widget)
+    assert database.count_flowchart_versions(pid) == 1
+    widget.deleteLater()
+
+
+def test_picking_an_old_version_with_an_edit_pending_keeps_it_selected(qapp, database, autosaver):
+    pid = database.create_project('pick')
+    for seed in range(3):
+        database.save_flowchart_version(pid, generate_flowchart(20, seed=seed))
+    widget = open_widget(pid, autosaver)
+    settle(qapp, widget)
+    widget.canvas.mouseDoubleClickEventFake('pending edit')
+    widget._on_flowchart_update()
+    dropdown = widget.version_dropdown
+    oldest = dropdown.itemData(dropdown.count() - 1)
+    dropdown.setCurrentIndex(dropdown.count() - 1)
+    # The flushed edit lands as v4 while v1 is on the canvas
+    qapp.processEvents()
+    assert database.count_flowchart_versions(pid) == 4
+    assert dropdown.itemData(0) == 4
+    assert dropdown.currentData() == oldest
+    assert widget.get_flow_json() == database.get_flowchart_version(pid, oldest)
+    widget.deleteLater()
+
+
+def test_an_edit_on_the_head_version_moves_the_selection_up(qapp, database, autosaver):
+    pid = database.create_project('head')
+    database.save_flowchart_version(pid, generate_flowchart(20, seed=1))
+    widget = open_widget(pid, autosaver)
+    widget.canvas.mouseDoubleClickEventFake('edit')
+    widget._on_flowchart_update()
+    settle(qapp, widget)
+    assert widget.version_dropdown.currentIndex() == 0
+    assert widget.version_dropdown.currentData() == 2
+    widget.deleteLater()
+
+
+def test_edits_within_the_debounce_window_make_one_version(qapp, database, autosaver):
+    pid = database.create_project('debounce')
+    database.save_flowchart_version(pid, generate_flowchart(20, seed=1))
+    widget = open_widget(pid, autosaver)
+    for i in range(5):
+        widget.canvas.mouseDoubleClickEventFake(f'edit {i}')
+        widget._on_flowchart_update()
+        qapp.processEvents()
+    assert widget._autosave_timer.isActive()
+    settle(qapp, widget)
+    assert database.count_flowchart_versions(pid) == 2
+    texts = [n['text'] for n in database.get_flowchart_version(pid, 2)['nodes']]
+    assert [f'edit {i}' for i in range(5)] == texts[-5:]
+    widget.deleteLater()
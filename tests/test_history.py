@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta, timezone
+import threading
+
+import pytest
+
+from conftest import edit_history
+
+
+def save_all(db, history):
+    pid = db.create_project('history')
+    versions = [db.save_flowchart_version(pid, snapshot) for snapshot in history]
+    return pid, versions
+
+
+def blob_rows(db):
+    with db.get_connection() as conn:
+        return conn.execute('SELECT hash, storage, base_hash, depth FROM flowchart_blobs').fetchall()
+
+
+def test_versions_load_back(database):
+    history = edit_history(120)
+    pid, versions = save_all(database, history)
+    assert versions == list(range(1, 121))
+    for version, snapshot in zip(versions, history):
+        assert database.get_flowchart_version(pid, version) == snapshot
+
+
+def test_delta_chains_are_bounded(database):
+    save_all(database, edit_history(150))
+    rows = blob_rows(database)
+    assert any(storage == 'delta' for _, storage, _, _ in rows)
+    assert max(depth for *_, depth in rows) < database.KEYFRAME_INTERVAL
+    depths = {h: depth for h, _, _, depth in rows}
+    for _, storage, base_hash, depth in rows:
+        if storage == 'delta':
+            assert depths[base_hash] == depth - 1
+
+
+def test_cold_load_and_range_load(database):
+    history = edit_history(80)
+    pid, versions = save_all(database, history)
+    database._head_cache.clear()
+    database.close_connection()
+    loaded = database.get_flowchart_versions(pid, 10, 70)
+    assert sorted(loaded) == list(range(10, 71))
+    for version in loaded:
+        assert loaded[version] == history[version - 1]
+    assert database.get_latest_flowchart(pid) == history[-1]
+    # Saving on top of a head read back from the db still chains deltas
+    database.save_flowchart_version(pid, {'nodes': history[-1]['nodes'][:-1]})
+    assert database.get_flowchart_version(pid, 81) == {'nodes': history[-1]['nodes'][:-1]}
+
+
+def test_unchanged_snapshot_is_not_saved_again(database):
+    history = edit_history(3)
+    pid, versions = save_all(database, history)
+    assert database.save_flowchart_version(pid, dict(history[-1])) == versions[-1]
+    assert database.count_flowchart_versions(pid) == 3
+
+
+def spread_history(db, pid, minutes=10):
+    # Version v was saved two days ago plus v * `minutes`
+    with db.get_connection() as conn:
+        conn.execute("UPDATE flowcharts SET created_at=datetime('now', '-2 days', (version * ?) || ' minutes') WHERE project_id=?",
+                     (minutes, pid))
+        conn.commit()
+
+
+def test_compaction_rebases_surviving_deltas(database):
+    history = edit_history(120)
+    pid, versions = save_all(database, history)
+    spread_history(database, pid)
+    database.set_retention_policy(pid, 1, 'hour')
+    removed, blobs_removed = database.compact_project(pid)
+    assert removed > 0 and blobs_removed > 0
+    database._head_cache.clear()
+    survivors = [v for v, *_ in database.list_flowchart_versions(pid, oldest_first=True)]
+    assert len(survivors) == len(versions) - removed
+    assert survivors[-1] == versions[-1]
+    for version in survivors:
+        assert database.get_flowchart_version(pid, version) == history[version - 1]
+    rows = blob_rows(database)
+    hashes = {h for h, *_ in rows}
+    assert all(base_hash in hashes for _, storage, base_hash, _ in rows if storage == 'delta')
+    assert max(depth for *_, depth in rows) < database.KEYFRAME_INTERVAL
+
+
+def test_compaction_clamps_node_index(database):
+    history = edit_history(90)
+    pid, _ = save_all(database, history)
+    spread_history(database, pid)
+    database.set_retention_policy(pid, 1, 'hour')
+    database.compact_project(pid, batch_size=30)
+    database.compact_project(pid)
+    survivors = [v for v, *_ in database.list_flowchart_versions(pid, oldest_first=True)]
+    with database.get_connection() as conn:
+        rows = conn.execute('SELECT node_id, version_from, version_to, text FROM node_index WHERE project_id=?',
+                            (pid,)).fetchall()
+    for _, version_from, version_to, _ in rows:
+        assert version_from in survivors
+        assert version_to is None or version_to in survivors
+    # Every node of every surviving version is covered by exactly one row with its text
+    for version in survivors:
+        for node in history[version - 1]['nodes']:
+            hits = [row for row in rows if row[0] == node['id'] and row[1] <= version
+                    and (row[2] is None or version <= row[2])]
+            assert [row[3] for row in hits] == [node['text']]
+
+
+@pytest.mark.parametrize('now', [None, datetime.now(timezone(timedelta(hours=14)))])
+def test_compaction_cutoff_is_utc(database, now):
+    pid, _ = save_all(database, edit_history(5))
+    database.set_retention_policy(pid, 1, 'hour')
+    # Everything was saved just now, so nothing is old enough to thin
+    assert database.compact_project(pid, now=now) == (0, 0)
+
+
+def test_mutating_a_saved_snapshot_does_not_touch_the_head(database):
+    history = edit_history(2)
+    pid, _ = save_all(database, history)
+    snapshot = history[-1]
+    expected = database.get_flowchart_version(pid, 2)
+    snapshot['nodes'][0]['text'] = 'edited in place'
+    assert database.save_flowchart_version(pid, snapshot) == 3
+    assert database.get_flowchart_version(pid, 2) == expected
+    assert database.get_flowchart_version(pid, 3)['nodes'][0]['text'] == 'edited in place'
+
+
+def test_compaction_waits_for_a_save_that_dedups_against_its_garbage(database, monkeypatch):
+    history = edit_history(3)
+    pid, _ = save_all(database, history)
+    with database.get_connection() as conn:
+        conn.execute("UPDATE flowcharts SET created_at='2020-01-01 00:0' || version || ':00' WHERE project_id=?", (pid,))
+    database.set_retention_policy(pid, 1, 'day')
+    store_blob = database._store_blob
+    threads = []
+
+    def compact():
+        database.compact_project(pid)
+        database.close_connection()
+
+    def store_then_compact(*args, **kwargs):
+        # v1 is compacted away while the save has found, but not yet used, its blob
+        result = store_blob(*args, **kwargs)
+        thread = threading.Thread(target=compact)
+        thread.start()
+        thread.join(0.5)
+        threads.append(thread)
+        return result
+
+    monkeypatch.setattr(database, '_store_blob', store_then_compact)
+    assert database.save_flowchart_version(pid, history[0]) == 4
+    threads[0].join()
+    assert [v for v, *_ in database.list_flowchart_versions(pid, oldest_first=True)] == [3, 4]
+    database._head_cache.clear()
+    assert database.get_flowchart_version(pid, 4) == history[0]
+
+
+@pytest.mark.parametrize('keyframe_format', ['json', 'binary'])
+def test_recompressing_to_each_codec_keeps_every_version(database, monkeypatch, keyframe_format):
+    monkeypatch.setattr(database, 'KEYFRAME_FORMAT', keyframe_format)
+    history = edit_history(120)
+    pid, versions = save_all(database, history)
+    for codec in ('json', 'lzma', 'zlib', 'json'):
+        before, after = database.recompress_blobs(codec)
+        assert before > 0 and after > 0
+        with database.get_connection() as conn:
+            encodings = {row[0] for row in conn.execute('SELECT encoding FROM flowchart_blobs')}
+        plain = {'json', 'snapshot'}
+        assert encodings <= plain | ({codec, 'snapshot+' + codec} if codec != 'json' else set())
+        if codec != 'json':
+            assert encodings - plain
+        database._head_cache.clear()
+        database.close_connection()
+        assert database.get_flowchart_versions(pid, 1, versions[-1]) == dict(zip(versions, history))
+    # New saves still chain onto the recompressed head
+    history.extend(edit_history(125, seed=0)[120:])
+    for snapshot in history[120:]:
+        database.save_flowchart_version(pid, snapshot)
+    for version, snapshot in enumerate(history, 1):
+        assert database.get_flowchart_version(pid, version) == snapshot
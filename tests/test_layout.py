@@ -0,0 +1,125 @@
+import math
+import time
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic import layout
+
+
+def graph(node_count, shape='dag', seed=0):
+    snapshot = generate_flowchart(node_count, density=1.2, shape=shape, seed=seed)
+    nodes = [n['id'] for n in snapshot['nodes']]
+    edges = [(n['id'], t) for n in snapshot['nodes'] for t in n['connectsTo'] or ()]
+    positions = [tuple(n['pos']) for n in snapshot['nodes']]
+    return nodes, edges, positions
+
+
+def test_layered_points_edges_down_and_keeps_spacing():
+    nodes, edges, _ = graph(200)
+    positions = layout.layered_layout(nodes, edges)
+    assert len(positions) == len(nodes)
+    index = {node_id: i for i, node_id in enumerate(nodes)}
+    for from_id, to_id in edges:
+        assert positions[index[from_id]][1] < positions[index[to_id]][1]
+    gap = layout.LAYER_SPACING[0]
+    rows = {}
+    for x, y in positions:
+        rows.setdefault(y, []).append(x)
+    for xs in rows.values():
+        xs.sort()
+        assert all(b - a >= gap - 1e-6 for a, b in zip(xs, xs[1:]))
+
+
+def test_layered_handles_cycles_and_edge_cases():
+    nodes, edges, _ = graph(100, shape='cyclic')
+    assert len(layout.layered_layout(nodes, edges + [(nodes[0], nodes[0])])) == len(nodes)
+    assert layout.layered_layout([], []) == []
+    assert layout.layered_layout(['a'], [('a', 'missing')]) == [(0.0, 0.0)]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_force_layout(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(layout, '_numpy', lambda: None)
+    nodes, edges, positions = graph(120)
+    fixed = set(nodes[:10])
+    result = layout.force_layout(nodes, edges, positions, fixed=fixed, iterations=30)
+    assert len(result) == len(nodes)
+    assert all(math.isfinite(x) and math.isfinite(y) for x, y in result)
+    for i in range(10):
+        assert result[i] == pytest.approx(positions[i])
+    # Same seed, same layout
+    assert layout.force_layout(nodes, edges, positions, fixed=fixed, iterations=30) == result
+
+
+def test_force_layout_reports_and_stops_early():
+    nodes, edges, _ = graph(60)
+    reports = []
+
+    def callback(positions, fraction):
+        reports.append(fraction)
+        return len(reports) == 2
+    layout.force_layout(nodes, edges, iterations=50, callback=callback)
+    assert len(reports) == 2 and 0 < reports[0] < reports[1] < 1
+
+
+def test_incremental_only_moves_the_neighbourhood():
+    nodes, edges, positions = graph(150)
+    changed = [nodes[75]]
+    moving = layout.neighbourhood(nodes, edges, changed, hops=1)
+    assert nodes[75] in moving and len(moving) < len(nodes)
+    start = list(positions)
+    start[75] = None
+    result = layout.incremental_layout(nodes, edges, start, changed, hops=1)
+    for node_id, before, after in zip(nodes, positions, result):
+        if node_id not in moving:
+            assert after == pytest.approx(before)
+    assert result[75] is not None
+
+
+def test_free_position_avoids_taken_slots():
+    taken = [(0.0, 0.0), (200.0, 0.0), (0.0, 150.0)]
+    spot = layout.free_position(taken, near=(0.0, 0.0))
+    assert spot not in taken
+    assert layout.free_position([]) == (0.0, 0.0)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        layout.run_layout('circular', ['a'], [])
+    with pytest.raises(ValueError):
+        layout.LayoutJob('circular', ['a'], [])
+
+
+def wait_for(job, timeout=60):
+    messages = []
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        messages.extend(job.poll())
+        time.sleep(0.01)
+    return messages
+
+
+def test_layout_job_runs_in_a_worker():
+    nodes, edges, positions = graph(80)
+    job = layout.LayoutJob('force', nodes, edges, positions).start()
+    messages = wait_for(job)
+    assert job.finished
+    kind, result, fraction = messages[-1]
+    assert kind == 'done' and fraction == 1.0
+    assert result == layout.run_layout('force', nodes, edges, positions)
+    assert all(kind == 'positions' for kind, *_ in messages[:-1])
+
+
+def test_layout_job_reports_a_dead_worker():
+    job = layout.LayoutJob('layered', ['a'], []).start()
+    job._process.kill()
+    job._process.join()
+    # Even with the worker gone, poll() returns at once
+    start = time.monotonic()
+    messages = wait_for(job)
+    assert time.monotonic() - start < 1
+    assert messages[-1][0] in ('done', 'error')
@@ -0,0 +1,90 @@
+import pytest
+
+
+def node(node_id, text, subject=''):
+    return {'id': node_id, 'subject': subject, 'text': text, 'connectsTo': [], 'connectsFrom': [], 'pos': [0.0, 0.0]}
+
+
+def save_history(db):
+    # Node a reads 'apple pie' in v1, 'banana split' from v2 on; b only exists in v2
+    pid = db.create_project('fruit')
+    db.save_flowchart_version(pid, {'nodes': [node('a', 'apple pie', 'Dessert'), node('c', 'cherry')]})
+    db.save_flowchart_version(pid, {'nodes': [node('a', 'banana split', 'Dessert'), node('b', 'apple juice'), node('c', 'cherry')]})
+    db.save_flowchart_version(pid, {'nodes': [node('a', 'banana split', 'Dessert'), node('c', 'cherry')]})
+    other = db.create_project('other')
+    db.save_flowchart_version(other, {'nodes': [node('x', 'Say "hi" to 100% of users_list', 'quotes')]})
+    return pid, other
+
+
+def hits(db, query, **kwargs):
+    return sorted((project, node_id, version_from, version_to)
+                  for project, _, node_id, _, _, version_from, version_to in db.search_nodes(query, **kwargs))
+
+
+def drop_fts(db):
+    # What a database created by an SQLite without FTS5 looks like
+    with db.get_connection() as conn:
+        for name in ('node_index_ai', 'node_index_ad', 'node_index_au'):
+            conn.execute(f'DROP TRIGGER {name}')
+        conn.execute('DROP TABLE node_search')
+
+
+@pytest.fixture(params=['fts5', 'like'])
+def search_db(request, database):
+    if request.param == 'like':
+        drop_fts(database)
+    return database
+
+
+def test_search_across_versions(search_db):
+    pid, other = save_history(search_db)
+    assert hits(search_db, 'apple') == [(pid, 'a', 1, 1), (pid, 'b', 2, 2)]
+    assert hits(search_db, 'banana split') == [(pid, 'a', 2, None)]
+    assert hits(search_db, 'dessert') == [(pid, 'a', 1, 1), (pid, 'a', 2, None)]
+    assert hits(search_db, 'cherry') == [(pid, 'c', 1, None)]
+    assert hits(search_db, 'cherry', project_id=other) == []
+    assert hits(search_db, 'apple', limit=1) in ([(pid, 'a', 1, 1)], [(pid, 'b', 2, 2)])
+
+
+def test_last_word_is_a_prefix(database):
+    pid, _ = save_history(database)
+    assert hits(database, 'banana spl') == [(pid, 'a', 2, None)]
+    assert hits(database, 'ban split') == []
+
+
+def test_search_keeps_up_with_new_saves(search_db):
+    pid, _ = save_history(search_db)
+    search_db.save_flowchart_version(pid, {'nodes': [node('a', 'banana bread', 'Dessert'), node('c', 'cherry')]})
+    assert hits(search_db, 'banana') == [(pid, 'a', 2, 3), (pid, 'a', 4, None)]
+
+
+@pytest.mark.parametrize('query', ['', '   ', '*', '"', '""', 'a*b', '-x', '^', 'NEAR(', "it's", 'apple OR', 'AND'])
+def test_odd_queries_do_not_raise(search_db, query):
+    save_history(search_db)
+    assert isinstance(search_db.search_nodes(query), list)
+
+
+def test_quotes_are_matched_as_text(search_db):
+    _, other = save_history(search_db)
+    assert hits(search_db, 'say "hi"') == [(other, 'x', 1, None)]
+    assert hits(search_db, '"hi" 100%') == [(other, 'x', 1, None)]
+
+
+def test_like_fallback_escapes_wildcards(database):
+    _, other = save_history(database)
+    drop_fts(database)
+    assert hits(database, 'users_l') == [(other, 'x', 1, None)]
+    # Unescaped, '_' and '%' would match any character(s)
+    assert hits(database, 'user_') == []
+    assert hits(database, 'say%hi') == []
+
+
+def test_existing_database_is_backfilled(database):
+    save_history(database)
+    expected = {query: hits(database, query) for query in ('apple', 'banana', 'cherry', 'hi')}
+    drop_fts(database)
+    with database.get_connection() as conn:
+        conn.execute('DROP TABLE node_index')
+    database.close_connection()
+    database.init_db()
+    assert {query: hits(database, query) for query in expected} == expected
@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from promptperfector.bench.generate import generate_flowchart
+from promptperfector.logic.flowchart import FlowchartModel
+from promptperfector.logic.snapshot_codec import (SnapshotFormatError, decode_model, decode_snapshot,
+                                                  encode_snapshot, is_binary_snapshot, iter_nodes)
+
+ODD_NODES = [
+    {'id': 'a', 'subject': None, 'text': '', 'connectsTo': [], 'connectsFrom': None, 'pos': [0, 0]},
+    {'id': 'b', 'text': 'only text'},
+    {'text': 'id last', 'id': 'c'},
+    {'id': 'd', 'subject': 'extra key', 'text': 't', 'connectsTo': ['a'], 'connectsFrom': None,
+     'pos': [1.5, -2.25], 'color': '#ff0000'},
+    {'id': 'e', 'subject': 'Ünïcödé', 'text': 'emoji \U0001f600 and\nnewline', 'connectsTo': None,
+     'connectsFrom': ['d'], 'pos': None},
+    {'id': 'f', 'subject': 's', 'text': 't', 'connectsTo': 'a', 'connectsFrom': None, 'pos': [3.0, 4.0]},
+]
+
+
+def roundtrip(snapshot, **kwargs):
+    decoded = decode_snapshot(encode_snapshot(snapshot, **kwargs))
+    # Compare the serialized form so key order and value types count too
+    assert json.dumps(decoded) == json.dumps(snapshot)
+    return decoded
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 4096])
+def test_generated_roundtrip(block_size):
+    roundtrip(generate_flowchart(300, shape='cyclic'), block_size=block_size)
+
+
+def test_odd_nodes_roundtrip():
+    roundtrip({'nodes': ODD_NODES}, block_size=2)
+
+
+def test_meta_and_missing_nodes():
+    roundtrip({'title': 'meta first', 'nodes': ODD_NODES[:2], 'zoom': 1.5})
+    roundtrip({'title': 'no nodes key'})
+    roundtrip({'nodes': []})
+
+
+def test_ids_are_interned():
+    decoded = decode_snapshot(encode_snapshot(generate_flowchart(50), block_size=8))
+    ids = {n['id']: n['id'] for n in decoded['nodes']}
+    for node in decoded['nodes']:
+        for target in node['connectsTo'] or ():
+            assert target is ids[target]
+
+
+def test_iter_nodes_from_file():
+    snapshot = generate_flowchart(100)
+    data = encode_snapshot(snapshot, block_size=16)
+    assert list(iter_nodes(io.BytesIO(data))) == snapshot['nodes']
+
+
+def test_decode_model_matches_from_json():
+    snapshot = {'nodes': generate_flowchart(120, shape='cyclic')['nodes'] + ODD_NODES[:2]}
+    model = decode_model(encode_snapshot(snapshot, block_size=32))
+    expected = FlowchartModel.from_json(snapshot)
+    assert model.to_json() == expected.to_json()
+    assert sorted(model.edges()) == sorted(expected.edges())
+
+
+def test_format_errors():
+    data = encode_snapshot(generate_flowchart(20))
+    assert is_binary_snapshot(data)
+    assert not is_binary_snapshot(b'{"nodes": []}')
+    with pytest.raises(SnapshotFormatError):
+        decode_snapshot(b'{"nodes": []}')
+    with pytest.raises(SnapshotFormatError):
+        decode_snapshot(data[:len(data) // 2])
+
+
+@pytest.mark.parametrize('keyframe_format', ['json', 'binary'])
+def test_keyframe_formats_load_back(database, monkeypatch, keyframe_format):
+    monkeypatch.setattr(database, 'KEYFRAME_FORMAT', keyframe_format)
+    pid = database.create_project('keyframes')
+    snapshots = [generate_flowchart(60, seed=seed) for seed in range(3)]
+    for snapshot in snapshots:
+        database.save_flowchart_version(pid, snapshot)
+    with database.get_connection() as conn:
+        encodings = {row[0] for row in conn.execute("SELECT encoding FROM flowchart_blobs WHERE storage='full'")}
+    assert all(e.startswith('snapshot') == (keyframe_format == 'binary') for e in encodings)
+    database._head_cache.clear()
+    for version, snapshot in enumerate(snapshots, 1):
+        assert database.get_flowchart_version(pid, version) == snapshot
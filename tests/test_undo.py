@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from promptperfector.logic.undo import (AddEdge, AddNode, Command, CommandGroup, EditNode, MoveNode, RemoveEdge,
+                                        UndoStack, remove_node_commands)
+
+
+class Target:
+    """The part of the canvas that commands call, over plain dicts."""
+    def __init__(self):
+        self.nodes = {}
+        self.edges = set()
+
+    def create_node(self, node_id, subject, text, pos, color=None):
+        assert node_id not in self.nodes
+        self.nodes[node_id] = (subject, text, tuple(pos), color)
+
+    def delete_node(self, node_id):
+        assert not any(node_id in edge for edge in self.edges)
+        del self.nodes[node_id]
+
+    def move_node(self, node_id, pos):
+        subject, text, _, color = self.nodes[node_id]
+        self.nodes[node_id] = (subject, text, tuple(pos), color)
+
+    def set_node_content(self, node_id, subject, text):
+        _, _, pos, color = self.nodes[node_id]
+        self.nodes[node_id] = (subject, text, pos, color)
+
+    def add_connector(self, from_id, to_id):
+        assert from_id in self.nodes and to_id in self.nodes
+        self.edges.add((from_id, to_id))
+
+    def remove_connector(self, from_id, to_id):
+        self.edges.remove((from_id, to_id))
+
+    def state(self):
+        return dict(self.nodes), set(self.edges)
+
+
+def random_command(target, rng, next_id):
+    ids = list(target.nodes)
+    action = rng.random()
+    if not ids or action < 0.25:
+        return AddNode(f'node_{next_id}', 'subject', 'text', (rng.random(), rng.random()), rng.choice([None, '#fff']))
+    node_id = rng.choice(ids)
+    subject, text, pos, color = target.nodes[node_id]
+    if action < 0.45:
+        return MoveNode(node_id, pos, (rng.random(), rng.random()))
+    if action < 0.6:
+        return EditNode(node_id, subject, text, f's{rng.random()}', f't{rng.random()}')
+    if action < 0.8:
+        to_id = rng.choice(ids)
+        if (node_id, to_id) not in target.edges:
+            return AddEdge(node_id, to_id)
+    if action < 0.9 and target.edges:
+        return RemoveEdge(*rng.choice(sorted(target.edges)))
+    edges = [edge for edge in target.edges if node_id in edge]
+    return remove_node_commands(node_id, subject, text, pos, edges, color)
+
+
+def test_undo_redo_walks_back_and_forth():
+    rng = random.Random(0)
+    target = Target()
+    stack = UndoStack()
+    states = [target.state()]
+    for i in range(300):
+        stack.push(random_command(target, rng, i), target)
+        states.append(target.state())
+    assert len(stack) == 300
+    for expected in reversed(states[:-1]):
+        assert stack.undo(target) is not None
+        assert target.state() == expected
+    assert not stack.can_undo() and stack.undo(target) is None
+    for expected in states[1:]:
+        assert stack.redo(target) is not None
+        assert target.state() == expected
+    assert not stack.can_redo() and stack.redo(target) is None
+
+
+def test_push_clears_redo_and_labels():
+    target = Target()
+    stack = UndoStack()
+    stack.push(AddNode('a', 's', 't', (0, 0)), target)
+    stack.push(MoveNode('a', (0, 0), (5, 5)), target)
+    assert stack.undo_label() == 'Move Node'
+    stack.undo(target)
+    assert stack.redo_label() == 'Move Node' and target.nodes['a'][2] == (0, 0)
+    stack.push(EditNode('a', 's', 't', 'S', 'T'), target)
+    assert not stack.can_redo() and stack.redo_label() == ''
+    stack.reset()
+    assert not stack.can_undo() and len(stack) == 0
+
+
+def test_limit_drops_oldest():
+    target = Target()
+    stack = UndoStack(limit=3)
+    stack.push(AddNode('a', '', '', (0, 0)), target)
+    for i in range(5):
+        stack.push(MoveNode('a', (i, 0), (i + 1, 0)), target)
+    assert len(stack) == 3
+    while stack.can_undo():
+        stack.undo(target)
+    assert target.nodes['a'][2] == (2, 0)
+
+
+def test_remove_node_restores_edges():
+    target = Target()
+    stack = UndoStack()
+    for node_id in 'abc':
+        stack.push(AddNode(node_id, node_id, node_id, (0, 0)), target)
+    stack.push(CommandGroup([AddEdge('a', 'b'), AddEdge('b', 'c')], 'Connect'), target)
+    before = target.state()
+    stack.push(remove_node_commands('b', 'b', 'b', (0, 0), [('a', 'b'), ('b', 'c')]), target)
+    assert 'b' not in target.nodes and not target.edges
+    assert stack.undo_label() == 'Delete Node'
+    stack.undo(target)
+    assert target.state() == before
+
+
+def test_command_is_abstract():
+    with pytest.raises(TypeError):
+        Command()
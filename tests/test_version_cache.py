@@ -0,0 +1,65 @@
+from conftest import edit_history
+from promptperfector.logic.version_cache import VersionCache, approximate_size
+
+
+def save_all(db, count):
+    history = edit_history(count, node_count=20)
+    pid = db.create_project('cache')
+    for snapshot in history:
+        db.save_flowchart_version(pid, snapshot)
+    return pid, history
+
+
+def test_hits_misses_and_prefetch(database):
+    pid, history = save_all(database, 20)
+    cache = VersionCache(prefetch=2)
+    assert cache.get(pid, 10) == history[9]
+    assert cache.stats()['misses'] == 1 and cache.stats()['prefetched'] == 4
+    for version in (8, 9, 11, 12):
+        assert cache.get(pid, version) == history[version - 1]
+    assert cache.stats()['hits'] == 4 and cache.stats()['misses'] == 1
+    # Stepping forward prefetches twice as far ahead
+    assert cache.get(pid, 13) == history[12]
+    assert sorted(v for _, v in cache._entries) == list(range(8, 18))
+    assert cache.get(pid, 99) is None
+
+
+def test_entry_bound_evicts_least_recently_used(database):
+    pid, history = save_all(database, 10)
+    cache = VersionCache(max_entries=3, prefetch=0)
+    for version in (1, 2, 3):
+        cache.get(pid, version)
+    cache.get(pid, 1)
+    cache.get(pid, 4)
+    assert [v for _, v in cache._entries] == [3, 1, 4]
+    assert cache.stats()['evictions'] == 1 and cache.stats()['entries'] == 3
+
+
+def test_byte_bound_keeps_at_least_the_newest_entry(database):
+    pid, history = save_all(database, 6)
+    size = approximate_size(history[0])
+    cache = VersionCache(max_bytes=int(size * 2.5), prefetch=0)
+    for version in range(1, 7):
+        cache.get(pid, version)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= cache.max_bytes
+    tiny = VersionCache(max_bytes=1, prefetch=0)
+    assert tiny.get(pid, 3) == history[2]
+    assert tiny.stats()['entries'] == 1
+
+
+def test_compaction_drops_the_projects_entries(database):
+    pid, history = save_all(database, 12)
+    other, _ = save_all(database, 3)
+    with database.get_connection() as conn:
+        conn.execute("UPDATE flowcharts SET created_at=datetime('2020-01-01', version || ' minutes') WHERE project_id=?", (pid,))
+    cache = VersionCache(prefetch=20)
+    assert cache.get(pid, 5) == history[4]
+    cache.get(other, 1)
+    database.set_retention_policy(pid, 1, 'day')
+    removed, _ = database.compact_project(pid)
+    assert removed == 11
+    # v5 is gone; the cache must not keep serving it
+    assert cache.get(pid, 5) is None
+    assert cache.get(pid, 12) == history[11]
+    assert (other, 2) in cache._entries